@@ -1,91 +1,438 @@
+import csv
+import io
 import os
-from flask import Flask, render_template, request, jsonify, send_file
+import threading
+import zlib
+from array import array
+from itertools import islice
+from flask import Flask, Response, render_template, request, jsonify, send_file
 import pandas as pd
 import tempfile
 from werkzeug.utils import secure_filename
+from chunked_upload import ChunkedUpload, UploadError, file_checksum, remove_stale_uploads
+from column_cache import load_frame, remove_stale_caches
+from columnar import FrameStore
+from dataset_cache import DatasetCache
+from dataset_registry import DatasetRegistry
+from job_queue import JobQueue
+from mmap_reader import mmap_filter, mmap_scan
+from parallel_scan import parallel_offsets, parallel_scan, should_scan_in_parallel
+from expressions import parse_filters
+from records import fill_row, iter_frame_rows, read_header as read_csv_header, read_rows_at
+from row_index import load_row_index, row_indexes
+from schema import sniff_schema
+from sidecar_index import column_indexes, index_scan
+from update_engine import UpdatePlan
+from xlsx_reader import read_column_names as read_excel_header, read_frame as read_excel
+from xlsx_writer import write_xlsx
 
 app = Flask(__name__)
-app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+app.config['UPLOAD_FOLDER'] = os.path.join(tempfile.gettempdir(), 'csveditor-datasets')  # one folder per dataset id
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max request size (single uploads and each chunk)
+app.config['CHUNK_SIZE'] = 50000  # rows per chunk when streaming CSV files
+app.config['DATASET_CACHE_BYTES'] = 1024 * 1024 * 1024  # parsed uploads kept in memory
+app.config['DATASET_CACHE_TTL'] = 30 * 60  # seconds an unused parsed upload stays in memory
+app.config['DATASET_WARM_BYTES'] = 64 * 1024 * 1024  # uploads up to this size are parsed right away
+app.config['DATASET_TTL'] = 6 * 60 * 60  # seconds an unused upload is kept on disk
+app.config['MAX_DATASETS'] = 200  # uploads kept on disk at most
+app.config['PREVIEW_LIMIT'] = 100  # rows per /preview page unless the request asks for fewer
+app.config['PREVIEW_MAX_LIMIT'] = 1000  # largest page a /preview request may ask for
+app.config['MATCH_CACHE_BYTES'] = 256 * 1024 * 1024  # match offsets kept for paging previews of large CSV files
+app.config['SIDECAR_INDEX'] = False  # build on-disk indexes for == and range filters
+app.config['TRIGRAM_INDEX'] = False  # keep trigram posting lists of searched columns of cached uploads
+app.config['COLUMN_CACHE'] = False  # keep columnar copies of parsed uploads, reused for the same content
+app.config['COLUMN_CACHE_FOLDER'] = os.path.join(tempfile.gettempdir(), 'csveditor-columns')
+app.config['COLUMN_CACHE_TTL'] = 7 * 24 * 60 * 60  # seconds an unused columnar copy is kept
+app.config['PARALLEL_WORKERS'] = os.cpu_count() or 1  # processes for scanning large CSV files
+app.config['UPLOAD_CHUNK_SIZE'] = 8 * 1024 * 1024  # bytes per chunk of a resumable upload
+app.config['CHUNKED_UPLOAD_FOLDER'] = os.path.join(tempfile.gettempdir(), 'csveditor-uploads')  # partial uploads
+app.config['JOB_WORKERS'] = 2  # background filter/update jobs run at once
+app.config['JOB_RETENTION'] = 60 * 60  # seconds a finished job's result is kept
+app.config['JOB_MAX_RETAINED'] = 100  # finished jobs kept at most
+app.config['JOB_FOLDER'] = os.path.join(tempfile.gettempdir(), 'csveditor-jobs')  # job results
+
+dataset_cache = DatasetCache(max_bytes=app.config['DATASET_CACHE_BYTES'], ttl=app.config['DATASET_CACHE_TTL'])
+match_offsets = DatasetCache(max_bytes=app.config['MATCH_CACHE_BYTES'], ttl=app.config['DATASET_CACHE_TTL'])
+
+def forget_dataset(dataset):
+    dataset_cache.invalidate(dataset.path)
+    row_indexes.invalidate(dataset.path)
+    match_offsets.invalidate(dataset.path)
+    column_indexes.invalidate(dataset.path)
+
+registry = DatasetRegistry(app.config['UPLOAD_FOLDER'], app.config['DATASET_TTL'],
+                           app.config['MAX_DATASETS'], on_evict=forget_dataset)
+job_queue = JobQueue(app.config['JOB_FOLDER'], app.config['JOB_WORKERS'],
+                     app.config['JOB_RETENTION'], app.config['JOB_MAX_RETAINED'])
 
 ALLOWED_EXTENSIONS = {'csv', 'xlsx'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_headers(file_path):
-    if file_path.endswith('.csv'):
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
-    return df.columns.tolist()
+def load_dataset(file_path):
+    if app.config['COLUMN_CACHE']:
+        # Uploading the same file again reads typed columns instead of
+        # parsing the text; the copy is found by the file's checksum
+        return load_frame(file_path, parse_dataset, app.config['COLUMN_CACHE_FOLDER'], file_checksum(file_path))
+    return parse_dataset(file_path)
 
-def process_filter(file_path, filters, max_records=None):
+def parse_dataset(file_path):
     if file_path.endswith('.csv'):
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
-    
-    for col, condition, value in filters:
-        if not condition or not value:
-            continue
+        # Keep cells as the raw text so comparisons match the Tk GUI exactly
+        return pd.read_csv(file_path, dtype=str, keep_default_na=False)
+    return read_excel(file_path)
+
+def read_dataset(file_path):
+    # The cached frame is shared between requests and must not be modified.
+    # Text indexes built over its columns later count towards its size.
+    def load(path):
+        store = FrameStore(load_dataset(path), app.config['TRIGRAM_INDEX'])
+        store.charge = lambda size: dataset_cache.charge(path, 'frame', store, size)
+        return store
+
+    return dataset_cache.get_or_load(file_path, 'frame', load,
+                                     lambda store: int(store.df.memory_usage(index=True, deep=True).sum()))
+
+def warm_dataset(file_path):
+    # Parses a new upload in the background so the first filter or update
+    # finds it in memory; bigger files are scanned from disk as before
+    if os.path.getsize(file_path) > app.config['DATASET_WARM_BYTES']:
+        return
+
+    def load():
         try:
-            if condition == '==':
-                df = df[df[col].astype(str) == value]
-            elif condition == '>':
-                df = df[df[col].astype(float) > float(value)]
-            elif condition == '<':
-                df = df[df[col].astype(float) < float(value)]
-            elif condition == '>=':
-                df = df[df[col].astype(float) >= float(value)]
-            elif condition == '<=':
-                df = df[df[col].astype(float) <= float(value)]
-            elif condition == 'contains':
-                df = df[df[col].astype(str).str.contains(value, case=False, na=False)]
-            elif condition == 'not contains':
-                df = df[~df[col].astype(str).str.contains(value, case=False, na=False)]
+            read_dataset(file_path)
         except Exception:
-            continue
+            pass  # reported by the request that reads it next
+
+    threading.Thread(target=load, daemon=True).start()
+
+def get_headers(file_path):
+    # Only the header record is read unless the file is already loaded
+    cached = dataset_cache.get(file_path, 'frame')
+    if cached is not None:
+        return cached.df.columns.tolist()
+    if file_path.endswith('.csv'):
+        return pd.read_csv(file_path, nrows=0).columns.tolist()
+    return read_excel_header(file_path)
+
+def process_filter(file_path, filters, max_records=None, offset=0):
+    store = read_dataset(file_path)
+    df = store.df[parse_filters(filters).mask(store.df, store)].iloc[offset:]
     
     if max_records:
         df = df.head(max_records)
     
     return df
 
-def process_update(file_path, updates, max_records=None):
-    if file_path.endswith('.csv'):
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
-    
-    for col, condition, filter_value, new_value in updates:
-        if not condition or not filter_value:
-            continue
-        try:
-            mask = pd.Series(False, index=df.index)
-            if condition == '==':
-                mask = df[col].astype(str) == filter_value
-            elif condition == '>':
-                mask = df[col].astype(float) > float(filter_value)
-            elif condition == '<':
-                mask = df[col].astype(float) < float(filter_value)
-            elif condition == '>=':
-                mask = df[col].astype(float) >= float(filter_value)
-            elif condition == '<=':
-                mask = df[col].astype(float) <= float(filter_value)
-            elif condition == 'contains':
-                mask = df[col].astype(str).str.contains(filter_value, case=False, na=False)
-            elif condition == 'not contains':
-                mask = ~df[col].astype(str).str.contains(filter_value, case=False, na=False)
-            
-            df.loc[mask, col] = new_value
-        except Exception:
-            continue
+def process_update(file_path, updates, max_records=None, offset=0):
+    store = read_dataset(file_path)
+    df = store.df.iloc[offset:]
     
     if max_records:
         df = df.head(max_records)
     
-    return df
+    plan = UpdatePlan(df.columns, updates)
+    return plan.apply_frame(df, lambda col: store.numeric(col).iloc[offset:offset + len(df)])
+
+def preview_page(file_path, filters, offset=0, limit=None):
+    # Returns (columns, rows of the page, total number of matches). Excel
+    # files and CSV files small enough to keep in memory are counted with
+    # one mask over the cached frame. Bigger CSV files are scanned once per
+    # filter for the offsets of the matches, and each page then reads only
+    # its own records. Files the byte-level readers cannot follow are
+    # scanned in chunks for every page, keeping only the rows of the page.
+    limit = limit or app.config['PREVIEW_LIMIT']
+    expression = parse_filters(filters)
+    if (not file_path.endswith('.csv') or dataset_cache.get(file_path, 'frame') is not None
+            or os.path.getsize(file_path) <= app.config['DATASET_WARM_BYTES']):
+        store = read_dataset(file_path)
+        matches = store.df[expression.mask(store.df, store)]
+        return store.df.columns.tolist(), matches.iloc[offset:offset + limit].values.tolist(), len(matches)
+
+    try:
+        columns = pd.read_csv(file_path, nrows=0).columns.tolist()
+        if expression.is_empty():
+            row_index = load_row_index(file_path, app.config['SIDECAR_INDEX'])
+            rows, total = row_index.page(file_path, offset, limit), len(row_index)
+        else:
+            offsets = matching_offsets(file_path, expression)
+            rows, total = list(read_rows_at(file_path, offsets[offset:offset + limit])), len(offsets)
+        # Short records are padded as pandas does
+        return columns, [fill_row(row, len(columns)) for row in rows], total
+    except csv.Error:
+        pass
+
+    columns, chunks = filtered_chunks(file_path, expression)
+    rows = []
+    total = 0
+    for chunk in chunks:
+        if len(rows) < limit and total + len(chunk) > offset:
+            start = max(offset - total, 0)
+            stop = start + limit - len(rows)
+            if isinstance(chunk, pd.DataFrame):
+                rows.extend(chunk.iloc[start:stop].values.tolist())
+            else:
+                rows.extend(chunk[start:stop])
+        total += len(chunk)
+    return list(columns), rows, total
+
+def matching_offsets(file_path, expression):
+    # Byte offsets of the records matching `expression` in a CSV file, kept
+    # per file version and filter. Records are tested as pandas reads them,
+    # short ones padded and blank ones skipped. Raises csv.Error for files
+    # whose records cannot be found by their bytes.
+    def scan(path):
+        filters = expression.as_filters()
+        if filters is not None and same_column_names(path):
+            result = mmap_filter(path, filters, offsets=True, pad=True)
+            workers = app.config['PARALLEL_WORKERS']
+            if result is None and should_scan_in_parallel(path, workers):
+                result = parallel_offsets(path, filters, workers=workers, pad=True)
+            if result is not None:
+                return result[1]
+        # Tested under the names pandas gives the columns
+        columns = pd.read_csv(path, nrows=0).columns
+        test = expression.compile(columns)
+        rows = iter_frame_rows(path, read_csv_header(path)[1], width=len(columns))
+        return array('q', (offset for offset, row in rows if test(row)))
+
+    return match_offsets.get_or_load(file_path, ('matches', expression.key()), scan,
+                                     lambda offsets: offsets.itemsize * len(offsets))
+
+def preview_cell(value):
+    # Cells are sent as display text; empty Excel cells are NaN or NaT
+    if value is None or pd.isna(value):
+        return ""
+    return str(value)
+
+def iter_csv_chunks(file_path, chunksize=None, start_row=0, nrows=None):
+    # Yields FrameStore chunks of the data rows from `start_row` on, reading
+    # at most `nrows` rows when given
+    cached = dataset_cache.get(file_path, 'frame')
+    if cached is not None:
+        # Already parsed by an earlier request, no need to touch the file
+        if not start_row and nrows is None:
+            yield cached
+        else:
+            stop = None if nrows is None else start_row + nrows
+            yield FrameStore(cached.df.iloc[start_row:stop])
+        return
+    chunksize = chunksize or app.config['CHUNK_SIZE']
+    if nrows is not None:
+        chunksize = min(chunksize, nrows)
+    row_index = None
+    if start_row:
+        try:
+            row_index = load_row_index(file_path, app.config['SIDECAR_INDEX'])
+        except csv.Error:
+            pass  # records cannot be found by their bytes; pandas skips the rows instead
+    if row_index is None:
+        with pd.read_csv(file_path, dtype=str, keep_default_na=False, chunksize=chunksize, nrows=nrows,
+                         skiprows=range(1, start_row + 1)) as reader:
+            for chunk in reader:
+                yield FrameStore(chunk)
+        return
+
+    # Seek to the requested row through the row offset index and parse from there
+    if start_row >= len(row_index):
+        return
+    columns = pd.read_csv(file_path, nrows=0).columns
+    with open(file_path, 'rb') as infile:
+        infile.seek(row_index.record_offset(file_path, start_row))
+        with pd.read_csv(infile, header=None, names=columns, dtype=str,
+                         keep_default_na=False, chunksize=chunksize, nrows=nrows) as reader:
+            for chunk in reader:
+                yield FrameStore(chunk)
+
+def csv_chunks(file_path, transform, max_records=None, chunksize=None, offset=0, start_row=0, nrows=None,
+               progress=None):
+    # Returns (columns, chunks) where chunks lazily yields the transformed
+    # DataFrame chunks. `start_row` rows are skipped before reading, `offset`
+    # rows are dropped from the transformed output and at most `nrows` input
+    # rows are read. progress(rows read, rows output) is called per chunk
+    columns = pd.read_csv(file_path, nrows=0).columns
+
+    def chunks(offset):
+        written = 0
+        scanned = start_row
+        for store in iter_csv_chunks(file_path, chunksize, start_row, nrows):
+            chunk = transform(store)
+            scanned += len(store.df)
+            if offset:
+                dropped = min(offset, len(chunk))
+                chunk = chunk.iloc[dropped:]
+                offset -= dropped
+            if max_records:
+                chunk = chunk.head(max_records - written)
+            yield chunk
+            written += len(chunk)
+            if progress is not None:
+                progress(scanned, written)
+            if max_records and written >= max_records:
+                break
+    return columns, chunks(offset)
+
+def row_batches(rows, size=None):
+    # Lists of up to `size` rows, taken lazily from any iterable
+    size = size or app.config['CHUNK_SIZE']
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+def same_column_names(file_path):
+    # Whether the byte-level scans see the column names pandas gives. pandas
+    # renames duplicate and blank names ("a.1", "Unnamed: 2"), and filters
+    # and the output use pandas' names.
+    try:
+        return read_csv_header(file_path)[0] == pd.read_csv(file_path, nrows=0).columns.tolist()
+    except csv.Error:
+        return False
+
+def filtered_chunks(file_path, filters, max_records=None, chunksize=None, offset=0, progress=None):
+    # Returns (columns, chunks) for the matching rows; chunks are DataFrames
+    # or lists of rows depending on which scan was used. Either way rows
+    # are produced as the chunks are consumed. The byte-level scans report
+    # progress once, with None for the rows read
+    stop = max_records and offset + max_records
+    expression = parse_filters(filters)
+    filters = expression.as_filters()  # triples for the scans below, None for OR, NOT and IN
+    cached = dataset_cache.get(file_path, 'frame')
+
+    def parsed(offset, max_records, progress):
+        # Text indexes only pay off on the cached frame that later requests
+        # reuse, not on chunks read once
+        transform = lambda store: store.df[expression.mask(store.df, store, search=store is cached)]
+        if expression.is_empty():
+            return csv_chunks(file_path, transform, max_records, chunksize, start_row=offset, progress=progress)
+        return csv_chunks(file_path, transform, max_records, chunksize, offset=offset, progress=progress)
+
+    def scanned(header, rows):
+        def chunks():
+            sent = 0
+            try:
+                for batch in row_batches(islice(rows, offset, stop), chunksize):
+                    yield batch
+                    sent += len(batch)
+            except csv.Error:
+                # A record further on that the byte-level scan cannot read:
+                # pandas carries on after the rows already sent
+                report = progress and (lambda scanned, written: progress(scanned, sent + written))
+                yield from parsed(offset + sent, max_records and max_records - sent, report)[1]
+                return
+            if progress is not None:
+                progress(None, sent)
+        return header, chunks()
+
+    if cached is None and filters is not None and same_column_names(file_path):
+        try:
+            if app.config['SIDECAR_INDEX']:
+                result = index_scan(file_path, filters, pad=True)
+                if result is not None:
+                    return scanned(*result)
+            # Only anchored byte searches beat pandas' C parser here
+            result = mmap_scan(file_path, filters, require_anchor=True, pad=True)
+            if result is not None:
+                header, matches = result
+                return scanned(header, (row for _, row in matches))
+            workers = app.config['PARALLEL_WORKERS']
+            if should_scan_in_parallel(file_path, workers):
+                return scanned(*parallel_scan(file_path, filters, stop, workers, pad=True))
+        except csv.Error:
+            pass  # literal quotes the byte-level scans cannot follow; pandas reads the file
+    return parsed(offset, max_records, progress)
+
+def updated_chunks(file_path, updates, max_records=None, chunksize=None, offset=0, progress=None):
+    # Updates keep one output row per input row, so reading stops as soon
+    # as max_records rows have been read
+    plan = UpdatePlan(pd.read_csv(file_path, nrows=0).columns, updates)
+    return csv_chunks(file_path, lambda store: plan.apply_frame(store.df, store.numeric),
+                      max_records, chunksize, start_row=offset, nrows=max_records or None, progress=progress)
+
+def csv_text(chunk):
+    # Rows are always written by the csv module's rules (\r\n line ends),
+    # whether they come as a DataFrame or as lists
+    if isinstance(chunk, pd.DataFrame):
+        return chunk.to_csv(header=False, index=False, lineterminator='\r\n')
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(chunk)
+    return buffer.getvalue()
+
+def iter_csv_text(columns, chunks):
+    yield csv_text([list(columns)])
+    for chunk in chunks:
+        yield csv_text(chunk)
+
+def write_csv(output_path, columns, chunks):
+    written = 0
+    with open(output_path, 'w', newline='', encoding='utf-8') as outfile:
+        outfile.write(csv_text([list(columns)]))
+        for chunk in chunks:
+            outfile.write(csv_text(chunk))
+            written += len(chunk)
+    return written
+
+def write_excel(output_path, df):
+    # Streams the frame into the sheet XML row by row instead of building
+    # openpyxl cells for all of it as df.to_excel() does
+    return write_xlsx(output_path, list(df.columns), df.itertuples(index=False, name=None), bold_header=True)
+
+def stream_filter(file_path, filters, output_path, max_records=None, chunksize=None, offset=0):
+    return write_csv(output_path, *filtered_chunks(file_path, filters, max_records, chunksize, offset))
+
+def stream_update(file_path, updates, output_path, max_records=None, chunksize=None, offset=0):
+    return write_csv(output_path, *updated_chunks(file_path, updates, max_records, chunksize, offset))
+
+def gzip_pieces(pieces):
+    # Compresses each piece as soon as it is produced so the client can
+    # start decoding before the last one is ready
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for piece in pieces:
+        yield compressor.compress(piece.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def csv_response(columns, chunks, download_name, compress=False):
+    # Sends the rows as they are produced (chunked transfer encoding), with
+    # no copy of the output written to disk
+    body = iter_csv_text(columns, chunks)
+    response = Response(body, mimetype='text/csv')
+    if compress and 'gzip' in request.accept_encodings:
+        response.response = gzip_pieces(body)
+        response.headers['Content-Encoding'] = 'gzip'
+    response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return response
+
+@app.before_request
+def collect_garbage():
+    # Drops expired datasets with their cached frames and outputs, and
+    # partial uploads nobody has resumed; at most once a minute
+    if registry.collect():
+        remove_stale_uploads(app.config['CHUNKED_UPLOAD_FOLDER'], app.config['DATASET_TTL'])
+        remove_stale_caches(app.config['COLUMN_CACHE_FOLDER'], app.config['COLUMN_CACHE_TTL'])
+
+def read_window(data):
+    # (max_records, offset) of a /filter, /update or job request, or None
+    # when either is not a whole number of at least 0
+    max_records = data.get('max_records')
+    offset = data.get('offset') or 0
+    for value in (offset, max_records or 0):
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            return None
+    return max_records, offset
+
+def find_dataset(data):
+    # The dataset named by the request's "dataset_id", or an error response
+    dataset_id = data.get('dataset_id')
+    if not dataset_id:
+        return None, (jsonify({'error': 'No dataset provided'}), 400)
+    dataset = registry.get(dataset_id)
+    if dataset is None or not os.path.exists(dataset.path):
+        return None, (jsonify({'error': 'File not found'}), 404)
+    return dataset, None
 
 @app.route('/')
 def index():
@@ -103,42 +450,121 @@ def upload_file():
     if not allowed_file(file.filename):
         return jsonify({'error': 'Invalid file type'}), 400
     
-    filename = secure_filename(file.filename)
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(file_path)
+    dataset = registry.create(secure_filename(file.filename))
+    file.save(dataset.path)
     
     try:
-        headers = get_headers(file_path)
-        return jsonify({
-            'success': True,
-            'headers': headers,
-            'filename': filename
-        })
+        return jsonify(upload_result(dataset, request.values.get('schema')))
+    except Exception as e:
+        registry.remove(dataset.id)
+        return jsonify({'error': str(e)}), 500
+
+def upload_result(dataset, schema=False):
+    result = {
+        'success': True,
+        'headers': get_headers(dataset.path),
+        'filename': dataset.filename,
+        'dataset_id': dataset.id
+    }
+    if schema:
+        # Column types and an approximate row count from a small sample
+        result['schema'] = sniff_schema(dataset.path, sheet=0)
+    warm_dataset(dataset.path)
+    return result
+
+@app.route('/datasets/<dataset_id>', methods=['DELETE'])
+def delete_dataset(dataset_id):
+    if not registry.remove(dataset_id):
+        return jsonify({'error': 'File not found'}), 404
+    return jsonify({'success': True})
+
+# Resumable uploads for files above MAX_CONTENT_LENGTH: POST /upload/init,
+# then PUT /upload/<id>/<index> for every chunk (any order, retried as
+# needed, with an optional X-Chunk-Checksum SHA-256), GET /upload/<id> to
+# see which chunks are missing, and POST /upload/<id>/finalize.
+
+@app.route('/upload/init', methods=['POST'])
+def init_upload():
+    data = request.json or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename:
+        return jsonify({'error': 'No selected file'}), 400
+    if not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    try:
+        upload = ChunkedUpload.create(app.config['CHUNKED_UPLOAD_FOLDER'], filename, data.get('size'),
+                                      app.config['UPLOAD_CHUNK_SIZE'], data.get('checksum'))
+        return jsonify(upload.status())
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/upload/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    try:
+        return jsonify(ChunkedUpload.load(app.config['CHUNKED_UPLOAD_FOLDER'], upload_id).status())
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+
+@app.route('/upload/<upload_id>/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    try:
+        upload = ChunkedUpload.load(app.config['CHUNKED_UPLOAD_FOLDER'], upload_id)
+        upload.write_chunk(index, request.stream, request.headers.get('X-Chunk-Checksum'))
+        return jsonify(upload.status())
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/upload/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = ChunkedUpload.load(app.config['CHUNKED_UPLOAD_FOLDER'], upload_id)
+        dataset = registry.create(upload.state['filename'])
+        try:
+            upload.finalize(dataset.path)
+            return jsonify(upload_result(dataset, data.get('schema')))
+        except Exception:
+            registry.remove(dataset.id)
+            raise
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/filter', methods=['POST'])
 def filter_file():
     data = request.json
-    filename = data.get('filename')
-    filters = data.get('filters', [])
-    max_records = data.get('max_records')
-    
-    if not filename:
-        return jsonify({'error': 'No filename provided'}), 400
+    try:
+        filters = parse_filters(data.get('filters', []))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    window = read_window(data)
+    if window is None:
+        return jsonify({'error': 'Offset and max_records must be whole numbers'}), 400
+    max_records, offset = window
     
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    if not os.path.exists(file_path):
-        return jsonify({'error': 'File not found'}), 404
+    dataset, error = find_dataset(data)
+    if error:
+        return error
+    file_path, filename = dataset.path, dataset.filename
     
     try:
-        df = process_filter(file_path, filters, max_records)
-        output_path = os.path.join(app.config['UPLOAD_FOLDER'], f'filtered_{filename}')
+        if filename.endswith('.csv') and data.get('stream'):
+            columns, chunks = filtered_chunks(file_path, filters, max_records, offset=offset)
+            return csv_response(columns, chunks, f'filtered_{filename}', data.get('gzip'))
+
+        output_path = dataset.output_path('filtered')
         
         if filename.endswith('.csv'):
-            df.to_csv(output_path, index=False)
+            stream_filter(file_path, filters, output_path, max_records, offset=offset)
         else:
-            df.to_excel(output_path, index=False)
+            df = process_filter(file_path, filters, max_records, offset)
+            write_excel(output_path, df)
         
         return send_file(
             output_path,
@@ -151,25 +577,29 @@ def filter_file():
 @app.route('/update', methods=['POST'])
 def update_file():
     data = request.json
-    filename = data.get('filename')
     updates = data.get('updates', [])
-    max_records = data.get('max_records')
-    
-    if not filename:
-        return jsonify({'error': 'No filename provided'}), 400
+    window = read_window(data)
+    if window is None:
+        return jsonify({'error': 'Offset and max_records must be whole numbers'}), 400
+    max_records, offset = window
     
-    file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    if not os.path.exists(file_path):
-        return jsonify({'error': 'File not found'}), 404
+    dataset, error = find_dataset(data)
+    if error:
+        return error
+    file_path, filename = dataset.path, dataset.filename
     
     try:
-        df = process_update(file_path, updates, max_records)
-        output_path = os.path.join(app.config['UPLOAD_FOLDER'], f'updated_{filename}')
+        if filename.endswith('.csv') and data.get('stream'):
+            columns, chunks = updated_chunks(file_path, updates, max_records, offset=offset)
+            return csv_response(columns, chunks, f'updated_{filename}', data.get('gzip'))
+
+        output_path = dataset.output_path('updated')
         
         if filename.endswith('.csv'):
-            df.to_csv(output_path, index=False)
+            stream_update(file_path, updates, output_path, max_records, offset=offset)
         else:
-            df.to_excel(output_path, index=False)
+            df = process_update(file_path, updates, max_records, offset)
+            write_excel(output_path, df)
         
         return send_file(
             output_path,
@@ -179,5 +609,105 @@ def update_file():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/preview', methods=['POST'])
+def preview():
+    data = request.json
+    try:
+        filters = parse_filters(data.get('filters', []))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    offset = data.get('offset') or 0
+    limit = data.get('limit') or app.config['PREVIEW_LIMIT']
+    
+    if not isinstance(offset, int) or not isinstance(limit, int) or offset < 0 or limit < 1:
+        return jsonify({'error': 'Offset and limit must be whole numbers'}), 400
+    dataset, error = find_dataset(data)
+    if error:
+        return error
+    
+    try:
+        columns, rows, total = preview_page(dataset.path, filters, offset,
+                                            min(limit, app.config['PREVIEW_MAX_LIMIT']))
+        return jsonify({
+            'columns': columns,
+            'rows': [[preview_cell(value) for value in row] for row in rows],
+            'offset': offset,
+            'total': total
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Background jobs: POST /jobs with the body of a /filter or /update request
+# plus "type", then poll GET /jobs/<id> for progress and fetch the output
+# from GET /jobs/<id>/result once its status is "done". DELETE /jobs/<id>
+# cancels the job or drops its result.
+
+def run_job(job, kind, file_path, rules, max_records, offset):
+    job.total_rows = sniff_schema(file_path, sheet=0)['rows']
+    if file_path.endswith('.csv'):
+        chunked = filtered_chunks if kind == 'filter' else updated_chunks
+        write_csv(job.result_path, *chunked(file_path, rules, max_records, offset=offset, progress=job.update))
+    else:
+        process = process_filter if kind == 'filter' else process_update
+        df = process(file_path, rules, max_records, offset)
+        job.update(matches=len(df))
+        write_excel(job.result_path, df)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    data = request.json or {}
+    kind = data.get('type')
+    
+    if kind not in ('filter', 'update'):
+        return jsonify({'error': 'Job type must be "filter" or "update"'}), 400
+    window = read_window(data)
+    if window is None:
+        return jsonify({'error': 'Offset and max_records must be whole numbers'}), 400
+    dataset, error = find_dataset(data)
+    if error:
+        return error
+    file_path, filename = dataset.path, dataset.filename
+    
+    if kind == 'filter':
+        try:
+            rules, download_name = parse_filters(data.get('filters', [])), f'filtered_{filename}'
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        rules, download_name = data.get('updates', []), f'updated_{filename}'
+    # The upload is kept on disk until the job has finished with it
+    registry.pin(dataset)
+    job = job_queue.submit(kind, download_name, run_job, kind, file_path, rules, *window)
+    job.future.add_done_callback(lambda future: registry.unpin(dataset))
+    return jsonify(job.to_dict()), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    if job.status == 'failed':
+        return jsonify({'error': job.error}), 500
+    if job.status != 'done':
+        return jsonify({'error': 'Job is not finished', 'status': job.status}), 409
+    return send_file(
+        job.result_path,
+        as_attachment=True,
+        download_name=job.download_name
+    )
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    if not job_queue.discard(job_id):
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({'success': True})
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,460 @@
+import argparse
+import csv
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from xlsx_writer import write_xlsx
+
+# Benchmarks for the two engines: "pandas" is the Flask app (app.py) and
+# "python" the pure-Python code behind the Tk GUI (csv_limiter_gui.py).
+# A synthetic dataset is generated once per set of parameters and every
+# operation is timed on it, each run in a fresh process so that nothing is
+# cached from an earlier run and the peak RSS belongs to that operation:
+#
+#   python benchmark.py --rows 200000 --output results.json
+#   python benchmark.py --rows 200000 --compare results.json
+#
+# The second form fails (exit status 1) when an operation got slower than
+# in the saved results by more than --tolerance.
+
+DEFAULT_DATA_FOLDER = os.path.join(tempfile.gettempdir(), 'csveditor-bench')
+RESULTS_VERSION = 1
+
+ENGINES = ["pandas", "python"]
+FORMATS = ["csv", "xlsx"]
+OPERATIONS = ["header", "count", "filter", "update", "export"]
+COLUMN_TYPES = ["int", "float", "text", "date", "bool"]
+
+# Fixed columns every dataset starts with; the filters below run on them
+BASE_COLUMNS = ["id", "group", "score", "name"]
+MATCH = "match"  # group value of the matching rows
+GROUPS = ["alpha", "beta", "gamma", "delta", "epsilon"]  # group values of the other rows
+SCORE_RANGE = 1000  # scores are uniform in [0, SCORE_RANGE)
+NEEDLE = "xyz"  # inserted into the name of the matching rows
+LETTERS = "abcdefghijklmnopqrstuvw "  # random text never contains the needle
+FIRST_DATE = datetime.date(1970, 1, 1)
+DATE_DAYS = 20000
+
+
+def filter_cases(selectivity):
+    # Each filter matches about `selectivity` of the rows
+    return {
+        "equals": [("group", "==", MATCH)],
+        "numeric": [("score", "<", str(selectivity * SCORE_RANGE))],
+        "contains": [("name", "contains", NEEDLE)],
+    }
+
+
+def update_rules(selectivity):
+    return [
+        ("group", "==", MATCH, "matched"),
+        ("score", "<", str(selectivity * SCORE_RANGE), "0"),
+    ]
+
+
+# --- Synthetic data ---
+
+def random_text(rng, length, needle=False):
+    text = "".join(rng.choice(LETTERS) for _ in range(length))
+    if needle:
+        at = rng.randrange(max(length - len(NEEDLE), 0) + 1)
+        text = (text[:at] + NEEDLE + text[at + len(NEEDLE):])[:max(length, len(NEEDLE))]
+    return text
+
+
+def random_value(rng, kind, string_length):
+    if kind == "int":
+        return rng.randrange(1000000)
+    if kind == "float":
+        return round(rng.uniform(-10000, 10000), 3)
+    if kind == "text":
+        return random_text(rng, string_length)
+    if kind == "date":
+        return FIRST_DATE + datetime.timedelta(days=rng.randrange(DATE_DAYS))
+    return rng.random() < 0.5
+
+
+def dataset_header(columns, types):
+    extra = [f"{types[i % len(types)]}_{i + 1}" for i in range(columns - len(BASE_COLUMNS))]
+    return BASE_COLUMNS + extra
+
+
+def generate_rows(rows, columns, types, string_length, selectivity, seed):
+    # Typed rows; the same parameters always give the same rows
+    rng = random.Random(seed)
+    kinds = [types[i % len(types)] for i in range(columns - len(BASE_COLUMNS))]
+    for i in range(rows):
+        row = [
+            i + 1,
+            MATCH if rng.random() < selectivity else rng.choice(GROUPS),
+            round(rng.random() * SCORE_RANGE, 2),
+            random_text(rng, string_length, rng.random() < selectivity),
+        ]
+        row.extend(random_value(rng, kind, string_length) for kind in kinds)
+        yield row
+
+
+def csv_cell(value):
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value)
+
+
+def dataset_path(folder, fmt, rows, columns, types, string_length, selectivity, seed):
+    name = f"bench_{rows}r_{columns}c_{'-'.join(types)}_{string_length}s_{selectivity:g}_{seed}.{fmt}"
+    return os.path.join(folder, name)
+
+
+def generate_dataset(path, fmt, rows, columns, types, string_length, selectivity, seed):
+    # Written under a temporary name first, so an interrupted run never
+    # leaves a truncated file that later runs would reuse
+    header = dataset_header(columns, types)
+    data = generate_rows(rows, columns, types, string_length, selectivity, seed)
+    partial = path + ".partial"
+    if fmt == "csv":
+        with open(partial, 'w', newline='', encoding='utf-8') as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(header)
+            writer.writerows([csv_cell(value) for value in row] for row in data)
+    else:
+        write_xlsx(partial, header, data)
+    os.replace(partial, path)
+    return path
+
+
+# --- Measurement ---
+
+def peak_rss():
+    # Peak resident set size of this process in bytes, None where unknown.
+    # Worker processes of parallel scans are not included.
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class MemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = MemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess
+        process.restype = wintypes.HANDLE
+        memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(MemoryCounters), wintypes.DWORD]
+        if not memory_info(process(), ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # kilobytes on Linux
+
+
+def pandas_case(operation, fmt, path, rules, output):
+    # Returns the timed call for the app's code path; it returns the number
+    # of rows produced. Anything done before the call is not timed.
+    import app as web
+
+    if operation == "header":
+        return lambda: len(web.get_headers(path))
+    if operation == "count":
+        return lambda: web.preview_page(path, [], 0, 1)[2]
+    if operation == "filter":
+        if fmt == "csv":
+            return lambda: sum(len(chunk) for chunk in web.filtered_chunks(path, rules)[1])
+        return lambda: len(web.process_filter(path, rules))
+    if operation == "update":
+        if fmt == "csv":
+            return lambda: sum(len(chunk) for chunk in web.updated_chunks(path, rules)[1])
+        return lambda: len(web.process_update(path, rules))
+    df = web.read_dataset(path).df
+    if output.endswith(".csv"):
+        return lambda: web.write_csv(output, df.columns, [df])
+    return lambda: web.write_excel(output, df)
+
+
+def python_case(operation, fmt, path, rules, output):
+    import csv_limiter_gui as gui
+
+    if operation == "header":
+        return lambda: len(gui.read_header(path))
+    if operation == "count":
+        return lambda: gui.count_rows(path)
+    if operation == "filter":
+        return lambda: len(gui.get_filtered_rows(path, rules)[1])
+    if operation == "update":
+        def update():
+            header, rows = gui.get_updated_rows(path, rules)
+            return sum(1 for _ in rows)
+        return update
+    header, rows = gui.get_filtered_rows(path, [])
+    save = gui.save_csv if output.endswith(".csv") else gui.save_xlsx
+
+    def export():
+        save(header, rows, output)
+        return len(rows)
+    return export
+
+
+ENGINE_CASES = {"pandas": pandas_case, "python": python_case}
+
+
+def measure(case):
+    # Runs one case once; called in a fresh process unless --in-process
+    run = ENGINE_CASES[case["engine"]](case["operation"], case["format"], case["path"], case["rules"],
+                                       case["output"])
+    gc.collect()
+    setup_rss = peak_rss()
+    start = time.perf_counter()
+    rows = run()
+    seconds = time.perf_counter() - start
+    return {"seconds": seconds, "rows": rows, "setup_rss": setup_rss, "peak_rss": peak_rss()}
+
+
+def run_isolated(case):
+    # spawn on every platform, so Linux runs start as cold as Windows ones
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        return pool.submit(measure, case).result()
+
+
+def megabytes(size):
+    return None if size is None else round(size / (1024 * 1024), 1)
+
+
+def benchmark_case(case, repeat, in_process):
+    runs = []
+    output_bytes = None
+    for _ in range(repeat):
+        runs.append(measure(case) if in_process else run_isolated(case))
+        if os.path.exists(case["output"]):
+            output_bytes = os.path.getsize(case["output"])
+            os.remove(case["output"])
+    seconds = [run["seconds"] for run in runs]
+    median = statistics.median(seconds)
+    peaks = [run["peak_rss"] for run in runs if run["peak_rss"] is not None]
+    setups = [run["setup_rss"] for run in runs if run["setup_rss"] is not None]
+
+    # Throughput is over the rows and bytes read, or written for exports
+    if case["operation"] == "export":
+        rows, size = runs[0]["rows"], output_bytes
+    elif case["operation"] == "header":
+        rows, size = None, None
+    else:
+        rows, size = case["dataset_rows"], os.path.getsize(case["path"])
+    return {
+        "engine": case["engine"],
+        "format": case["format"],
+        "operation": case["name"],
+        "output_rows": runs[0]["rows"],
+        "seconds": [round(value, 6) for value in seconds],
+        "best": round(min(seconds), 6),
+        "median": round(median, 6),
+        "rows_per_sec": None if rows is None or not median else round(rows / median),
+        "mb_per_sec": None if size is None or not median else round(size / (1024 * 1024) / median, 2),
+        "peak_rss_mb": megabytes(max(peaks)) if peaks else None,
+        "setup_rss_mb": megabytes(max(setups)) if setups else None,
+    }
+
+
+def build_cases(args, paths, output_folder):
+    filters = filter_cases(args.selectivity)
+    updates = update_rules(args.selectivity)
+    cases = []
+    for fmt in args.formats:
+        for engine in args.engines:
+            for operation in args.operations:
+                if operation == "filter":
+                    variants = [(f"filter:{name}", rules) for name, rules in filters.items()]
+                elif operation == "update":
+                    variants = [("update", updates)]
+                elif operation == "export":
+                    variants = [(f"export:{target}", []) for target in FORMATS]
+                else:
+                    variants = [(operation, [])]
+                for name, rules in variants:
+                    target = name.split(":")[1] if operation == "export" else fmt
+                    cases.append({
+                        "engine": engine,
+                        "format": fmt,
+                        "operation": operation,
+                        "name": name,
+                        "path": paths[fmt],
+                        "rules": rules,
+                        "output": os.path.join(output_folder, f"{engine}_{fmt}_{operation}.{target}"),
+                        "dataset_rows": args.rows,
+                    })
+    return cases
+
+
+# --- Reports ---
+
+def environment():
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+    for module in ("pandas", "numpy"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+
+def print_results(results):
+    print(f"{'engine':<8}{'format':<7}{'operation':<18}{'median s':>10}{'rows/s':>12}{'MB/s':>9}{'peak MB':>9}")
+    for result in results:
+        if "error" in result:
+            print(f"{result['engine']:<8}{result['format']:<7}{result['operation']:<18}  {result['error']}")
+            continue
+        print(f"{result['engine']:<8}{result['format']:<7}{result['operation']:<18}"
+              f"{result['median']:>10.3f}{blank(result['rows_per_sec']):>12}{blank(result['mb_per_sec']):>9}"
+              f"{blank(result['peak_rss_mb']):>9}")
+
+
+def blank(value):
+    return "-" if value is None else value
+
+
+def compare_results(results, baseline, tolerance):
+    # Prints how each median changed against the baseline and returns the
+    # number of operations slower by more than `tolerance` (0.1 = 10%)
+    previous = {(item["engine"], item["format"], item["operation"]): item
+                for item in baseline["results"] if "error" not in item}
+    regressions = 0
+    print(f"\n{'engine':<8}{'format':<7}{'operation':<18}{'baseline s':>11}{'now s':>10}{'change':>9}")
+    for result in results:
+        before = previous.get((result["engine"], result["format"], result["operation"]))
+        if before is None or "error" in result or not before["median"]:
+            continue
+        change = result["median"] / before["median"] - 1
+        slower = change > tolerance
+        regressions += slower
+        print(f"{result['engine']:<8}{result['format']:<7}{result['operation']:<18}"
+              f"{before['median']:>11.3f}{result['median']:>10.3f}{change:>+9.1%}"
+              f"{'  REGRESSION' if slower else ''}")
+    return regressions
+
+
+def comma_list(choices):
+    def parse(text):
+        items = [item.strip() for item in text.split(",") if item.strip()]
+        unknown = [item for item in items if item not in choices]
+        if not items or unknown:
+            raise argparse.ArgumentTypeError(f"choose from {', '.join(choices)}")
+        return items
+    return parse
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time the CSV Editor engines on synthetic data.")
+    parser.add_argument("--rows", type=int, default=100000, help="data rows in the generated files")
+    parser.add_argument("--columns", type=int, default=10,
+                        help=f"columns in the generated files, at least {len(BASE_COLUMNS)}")
+    parser.add_argument("--types", type=comma_list(COLUMN_TYPES), default=COLUMN_TYPES,
+                        help="types of the columns after the fixed ones, used in turn")
+    parser.add_argument("--string-length", type=int, default=12, help="characters in generated text cells")
+    parser.add_argument("--selectivity", type=float, default=0.1, help="share of rows each filter matches")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--engines", type=comma_list(ENGINES), default=ENGINES)
+    parser.add_argument("--formats", type=comma_list(FORMATS), default=FORMATS)
+    parser.add_argument("--operations", type=comma_list(OPERATIONS), default=OPERATIONS)
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each operation; the median is reported")
+    parser.add_argument("--data-folder", default=DEFAULT_DATA_FOLDER, help="where generated files are kept")
+    parser.add_argument("--regenerate", action="store_true", help="write the files even if they exist")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run everything in this process; caches and peak RSS then carry over")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="slowdown against --compare that counts as a regression")
+    args = parser.parse_args(argv)
+    if args.columns < len(BASE_COLUMNS):
+        parser.error(f"--columns must be at least {len(BASE_COLUMNS)}")
+    if args.rows < 1 or args.repeat < 1 or args.string_length < 1:
+        parser.error("--rows, --repeat and --string-length must be positive")
+    if not 0 <= args.selectivity <= 1:
+        parser.error("--selectivity must be between 0 and 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    dataset = {
+        "rows": args.rows,
+        "columns": args.columns,
+        "types": args.types,
+        "string_length": args.string_length,
+        "selectivity": args.selectivity,
+        "seed": args.seed,
+    }
+    os.makedirs(args.data_folder, exist_ok=True)
+    paths = {}
+    for fmt in args.formats:
+        path = dataset_path(args.data_folder, fmt, **dataset)
+        if args.regenerate or not os.path.exists(path):
+            print(f"Generating {path}", file=sys.stderr)
+            generate_dataset(path, fmt, **dataset)
+        paths[fmt] = path
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="csveditor-bench-") as output_folder:
+        for case in build_cases(args, paths, output_folder):
+            print(f"Running {case['engine']} {case['format']} {case['name']}", file=sys.stderr)
+            try:
+                results.append(benchmark_case(case, args.repeat, args.in_process))
+            except Exception as e:
+                results.append({"engine": case["engine"], "format": case["format"], "operation": case["name"],
+                                "error": f"{type(e).__name__}: {e}"})
+
+    report = {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "dataset": dict(dataset, files={fmt: os.path.getsize(path) for fmt, path in paths.items()}),
+        "repeat": args.repeat,
+        "isolated": not args.in_process,
+        "results": results,
+    }
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as outfile:
+            json.dump(report, outfile, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as infile:
+            baseline = json.load(infile)
+        if {key: value for key, value in baseline.get("dataset", {}).items() if key != "files"} != dataset:
+            print("Warning: the baseline was measured on a different dataset", file=sys.stderr)
+        if compare_results(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+from records import TEXT_ENCODING, read_record
+
+CHUNK_SIZE = 8 * 1024 * 1024  # must stay below the server's MAX_CONTENT_LENGTH
+COPY_SIZE = 1024 * 1024
+UPLOAD_ID = re.compile(r'[0-9a-f]{32}')
+
+# Chunks of one upload may arrive on several threads at once; the state file
+# is re-read and rewritten under this lock
+state_lock = threading.Lock()
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ChunkedUpload:
+    # A resumable upload assembled in "<id>.part" inside `folder`. The state
+    # (file name, size, chunk size, optional SHA-256 of the whole file and
+    # the chunks received so far) lives in "<id>.json", so after an
+    # interrupted transfer the client asks which chunks arrived and re-sends
+    # only the missing ones, even across server restarts. Chunks are written
+    # straight to their offset in the part file, so memory use does not
+    # depend on the file size.
+    def __init__(self, folder, upload_id, state):
+        self.folder = folder
+        self.upload_id = upload_id
+        self.state = state
+
+    @property
+    def part_path(self):
+        return os.path.join(self.folder, self.upload_id + '.part')
+
+    @property
+    def state_path(self):
+        return os.path.join(self.folder, self.upload_id + '.json')
+
+    @property
+    def chunk_count(self):
+        size, chunk_size = self.state['size'], self.state['chunk_size']
+        return max(1, -(-size // chunk_size))
+
+    def chunk_length(self, index):
+        start = index * self.state['chunk_size']
+        return min(self.state['chunk_size'], self.state['size'] - start)
+
+    @classmethod
+    def create(cls, folder, filename, size, chunk_size=CHUNK_SIZE, checksum=None):
+        if not isinstance(size, int) or size < 0:
+            raise UploadError("Invalid file size")
+        os.makedirs(folder, exist_ok=True)
+        upload = cls(folder, uuid.uuid4().hex, {
+            'filename': filename,
+            'size': size,
+            'chunk_size': chunk_size,
+            'checksum': checksum.lower() if checksum else None,
+            'received': [],
+            'headers': None,
+        })
+        with open(upload.part_path, 'wb') as outfile:
+            outfile.truncate(size)
+        upload.save()
+        return upload
+
+    @classmethod
+    def load(cls, folder, upload_id):
+        if not UPLOAD_ID.fullmatch(upload_id):
+            raise UploadError("Unknown upload", 404)
+        upload = cls(folder, upload_id, None)
+        upload.reload()
+        return upload
+
+    def reload(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as infile:
+                self.state = json.load(infile)
+        except (OSError, ValueError):
+            raise UploadError("Unknown upload", 404)
+
+    def save(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as outfile:
+            json.dump(self.state, outfile)
+        os.replace(tmp_path, self.state_path)
+
+    def status(self):
+        received = set(self.state['received'])
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.state['filename'],
+            'size': self.state['size'],
+            'chunk_size': self.state['chunk_size'],
+            'chunks': self.chunk_count,
+            'received': sorted(received),
+            'missing': [i for i in range(self.chunk_count) if i not in received],
+            'headers': self.state['headers'],
+        }
+
+    def write_chunk(self, index, stream, checksum=None):
+        # Copies one chunk from `stream` to its place in the part file. The
+        # chunk only counts as received when its length, and the SHA-256
+        # checksum if one is given, match; otherwise it must be sent again.
+        if not 0 <= index < self.chunk_count:
+            raise UploadError("Chunk index out of range")
+        expected = self.chunk_length(index)
+        digest = hashlib.sha256()
+        written = 0
+        with open(self.part_path, 'r+b') as outfile:
+            outfile.seek(index * self.state['chunk_size'])
+            while True:
+                block = stream.read(COPY_SIZE)
+                if not block:
+                    break
+                written += len(block)
+                if written > expected:
+                    raise UploadError("Chunk is larger than expected")
+                digest.update(block)
+                outfile.write(block)
+        if written != expected:
+            raise UploadError(f"Chunk {index} is incomplete: {written} of {expected} bytes")
+        if checksum and digest.hexdigest() != checksum.lower():
+            raise UploadError(f"Checksum mismatch for chunk {index}", 422)
+
+        headers = self.detect_header() if index == 0 else None
+        with state_lock:
+            self.reload()
+            if index not in self.state['received']:
+                self.state['received'].append(index)
+            if headers is not None:
+                self.state['headers'] = headers
+            self.save()
+
+    def detect_header(self):
+        # Column names of a CSV upload, read from the first chunk so the UI
+        # can offer them while the rest is still being sent. Excel files need
+        # the whole archive and are only inspected once finalized.
+        if not self.state['filename'].lower().endswith('.csv'):
+            return None
+        with open(self.part_path, 'rb') as infile:
+            record = read_record(io.BytesIO(infile.read(self.chunk_length(0))))
+        if not record.endswith(b'\n') and self.chunk_count > 1:
+            return None  # the header continues past the first chunk
+        try:
+            return next(csv.reader([record.decode(TEXT_ENCODING)]), [])
+        except UnicodeDecodeError:
+            return None
+
+    def finalize(self, destination):
+        missing = self.status()['missing']
+        if missing:
+            raise UploadError(f"{len(missing)} chunk(s) missing", 409)
+        if self.state['checksum'] and file_checksum(self.part_path) != self.state['checksum']:
+            raise UploadError("Checksum mismatch for the assembled file", 422)
+        os.replace(self.part_path, destination)
+        os.remove(self.state_path)
+
+
+def remove_stale_uploads(folder, max_age):
+    # Deletes the parts and state of uploads not written to for max_age
+    # seconds; an abandoned upload has to be started again
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return
+    now = time.time()
+    for name in names:
+        upload_id, _, ext = name.partition('.')
+        if not UPLOAD_ID.fullmatch(upload_id) or ext not in ('part', 'json', 'json.tmp'):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        while True:
+            block = infile.read(COPY_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
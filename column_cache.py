@@ -0,0 +1,462 @@
+import datetime
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+
+from columnar import ColumnStore
+from predicates import NUMERIC_OPERATORS, cell_text
+from sidecar_index import file_stamp, load_or_build, sidecar_paths
+from text_search import TextIndex
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b'CSVCOL01'
+FORMAT = 1  # bumped whenever the layout below changes
+DECODE_ROWS = 10000  # rows decoded at once when iterating over a store
+ABSENT = 0  # code of the cells missing from rows shorter than the widest
+
+
+# Cell values are kept in each column's dictionary in their JSON form. Text
+# and None are stored as is, other types as [tag, text] so that reading the
+# cache back gives the same types the parsers produced.
+
+def encode_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return ["b", value]
+    if isinstance(value, int):
+        return ["i", str(value)]
+    if isinstance(value, float):
+        return ["f", repr(value)]
+    if isinstance(value, datetime.datetime):
+        return ["d", value.isoformat()]
+    if isinstance(value, datetime.date):
+        return ["D", value.isoformat()]
+    if isinstance(value, datetime.time):
+        return ["t", value.isoformat()]
+    if isinstance(value, datetime.timedelta):
+        return ["td", repr(value.total_seconds())]
+    if np is not None and isinstance(value, np.generic):
+        return encode_value(value.item())
+    return str(value)
+
+
+def decode_value(value):
+    if not isinstance(value, list):
+        return value
+    tag, text = value
+    if tag == "b":
+        return text
+    if tag == "i":
+        return int(text)
+    if tag == "f":
+        return float(text)
+    if tag == "d":
+        return datetime.datetime.fromisoformat(text)
+    if tag == "D":
+        return datetime.date.fromisoformat(text)
+    if tag == "t":
+        return datetime.time.fromisoformat(text)
+    return datetime.timedelta(seconds=float(text))
+
+
+def value_key(value):
+    # 1, 1.0 and True are equal dict keys but must keep their own codes
+    return value if value.__class__ is str else (value.__class__, encode_value(value).__repr__())
+
+
+class ColumnEncoder:
+    # Builds the dictionary and per-row codes of one column. Code 0 is
+    # ABSENT, so the dictionary starts at code 1.
+    def __init__(self, rows_before=0):
+        self.codes = array('I', bytes(4 * rows_before))
+        self.lookup = {}
+        self.values = [None]
+
+    def append(self, value):
+        key = value_key(value)
+        code = self.lookup.get(key)
+        if code is None:
+            code = self.lookup[key] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def finish(self):
+        return compact_codes(self.codes, len(self.values)), self.values
+
+
+def compact_codes(codes, size):
+    # Narrowest unsigned array that holds codes up to `size`
+    for typecode in ('B', 'H'):
+        if size <= 1 << (8 * array(typecode).itemsize):
+            return array(typecode, codes)
+    return codes
+
+
+def dictionary_bytes(values):
+    return json.dumps([encode_value(value) for value in values[1:]], ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8')
+
+
+def read_dictionary(blob):
+    return [None] + [decode_value(value) for value in json.loads(blob.tobytes().decode('utf-8'))]
+
+
+def part_type(part):
+    # array typecodes are one character, NumPy dtype strings are longer
+    return part.typecode if isinstance(part, array) else part.dtype.str
+
+
+def write_column_file(path, stamp, info, parts):
+    info = dict(info, **stamp, byteorder=sys.byteorder,
+                parts=[[part_type(part), len(part)] for part in parts])
+    encoded = json.dumps(info).encode('utf-8')
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as outfile:
+        outfile.write(MAGIC)
+        outfile.write(struct.pack('<I', len(encoded)))
+        outfile.write(encoded)
+        for part in parts:
+            part.tofile(outfile)
+    os.replace(tmp_path, path)
+
+
+def read_column_file(path, stamp):
+    # Returns (info, parts), or None when the file is missing, unreadable
+    # or was written for a different version of the source
+    try:
+        with open(path, 'rb') as infile:
+            if infile.read(len(MAGIC)) != MAGIC:
+                return None
+            size, = struct.unpack('<I', infile.read(4))
+            info = json.loads(infile.read(size).decode('utf-8'))
+            if any(info.get(key) != value for key, value in stamp.items()):
+                return None
+            if info.get('byteorder') != sys.byteorder:
+                return None
+            parts = []
+            for kind, count in info['parts']:
+                if len(kind) == 1:
+                    part = array(kind)
+                    part.fromfile(infile, count)
+                elif np is None:
+                    return None
+                else:
+                    part = np.fromfile(infile, dtype=np.dtype(kind), count=count)
+                    if len(part) != count:
+                        return None
+                parts.append(part)
+    except (OSError, ValueError, EOFError, KeyError, TypeError, struct.error):
+        return None
+    return info, parts
+
+
+class EncodedRows:
+    # Row sequence over dictionary-encoded columns. Rows are decoded only
+    # when asked for; a row ends at its first absent cell.
+    def __init__(self, columns, dictionaries, count):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self.decode(*key.indices(self.count)))
+        if key < 0:
+            key += self.count
+        if not 0 <= key < self.count:
+            raise IndexError("row index out of range")
+        return next(self.decode(key, key + 1, 1))
+
+    def __iter__(self):
+        return self.decode(0, self.count, 1)
+
+    def decode(self, start, stop, step):
+        if step != 1:
+            yield from (self[i] for i in range(start, stop, step))
+            return
+        for first in range(start, stop, DECODE_ROWS):
+            blocks = [codes[first:min(first + DECODE_ROWS, stop)] for codes in self.columns]
+            for codes in zip(*blocks):
+                row = []
+                for code, values in zip(codes, self.dictionaries):
+                    if code == ABSENT:
+                        break
+                    row.append(values[code])
+                yield row
+
+
+class DecodedColumn:
+    # Per-row view of one encoded column: cells are looked up through their
+    # codes, so it takes no more memory than the column's dictionary
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes)
+
+
+class EncodedStore(ColumnStore):
+    # ColumnStore read back from a columnar cache file: every column is a
+    # dictionary of its distinct values plus one small integer code per
+    # row. Conditions are evaluated once per distinct value and mapped to
+    # the rows through the codes, and rows are only decoded for output.
+    def __init__(self, header, columns, dictionaries, count):
+        super().__init__(header, EncodedRows(columns, dictionaries, count))
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.code_views = {}
+
+    @classmethod
+    def build(cls, header, rows):
+        encoders = []
+        count = 0
+        for row in rows:
+            while len(encoders) < len(row):
+                encoders.append(ColumnEncoder(count))
+            for encoder, value in zip(encoders, row):
+                encoder.append(value)
+            for encoder in encoders[len(row):]:
+                encoder.codes.append(ABSENT)
+            count += 1
+        while len(encoders) < len(header):
+            encoders.append(ColumnEncoder(count))
+        columns, dictionaries = zip(*(encoder.finish() for encoder in encoders)) if encoders else ((), ())
+        return cls(header, list(columns), list(dictionaries), count)
+
+    def save(self, path, stamp):
+        parts = []
+        for codes, values in zip(self.columns, self.dictionaries):
+            parts.append(codes)
+            parts.append(array('B', dictionary_bytes(values)))
+        write_column_file(path, stamp, {'header': [encode_value(name) for name in self.header],
+                                        'count': len(self)}, parts)
+
+    @classmethod
+    def load(cls, path, stamp):
+        result = read_column_file(path, stamp)
+        if result is None:
+            return None
+        info, parts = result
+        header = [decode_value(name) for name in info['header']]
+        dictionaries = [read_dictionary(blob) for blob in parts[1::2]]
+        return cls(header, parts[0::2], dictionaries, info['count'])
+
+    def size(self):
+        # Rough memory use for the dataset cache: the codes plus a sample of
+        # the dictionaries
+        total = sum(codes.itemsize * len(codes) for codes in self.columns)
+        for values in self.dictionaries:
+            sample = values[1:1001]
+            if sample:
+                total += int(sum(sys.getsizeof(value) for value in sample) / len(sample) * len(values))
+        return total
+
+    def codes(self, idx):
+        view = self.code_views.get(idx)
+        if view is None:
+            codes = self.columns[idx]
+            view = np.frombuffer(codes, dtype=codes.typecode) if np is not None else codes
+            self.code_views[idx] = view
+        return view
+
+    def text(self, idx):
+        view = self.text_views.get(idx)
+        if view is None:
+            view = DecodedColumn(self.columns[idx], [None] + [cell_text(value) for value in self.dictionaries[idx][1:]])
+            self.text_views[idx] = view
+        return view
+
+    def lower(self, idx):
+        view = self.lower_views.get(idx)
+        if view is None:
+            texts = self.text(idx).values
+            view = DecodedColumn(self.columns[idx], [None] + [text.lower() for text in texts[1:]])
+            self.lower_views[idx] = view
+        return view
+
+    def numeric(self, idx):
+        numbers, valid = self.value_numbers(idx)
+        codes = self.codes(idx)
+        if np is not None:
+            return np.asarray(numbers)[codes], np.asarray(valid, dtype=np.bool_)[codes]
+        return array('d', (numbers[code] for code in codes)), bytearray(valid[code] for code in codes)
+
+    def value_numbers(self, idx):
+        numbers = [0.0]
+        valid = [False]
+        for value in self.dictionaries[idx][1:]:
+            try:
+                numbers.append(float(value))
+                valid.append(True)
+            except (TypeError, ValueError):
+                numbers.append(0.0)
+                valid.append(False)
+        return numbers, valid
+
+    def value_hits(self, idx, code, value):
+        # Whether each dictionary entry passes the condition, entry 0
+        # (absent cells) never does
+        values = self.dictionaries[idx]
+        if code in NUMERIC_OPERATORS:
+            try:
+                bound = float(value)
+            except ValueError:
+                return None
+            op = NUMERIC_OPERATORS[code]
+            numbers, valid = self.value_numbers(idx)
+            return [ok and op(number, bound) for number, ok in zip(numbers, valid)]
+        if code == "==":
+            return [False] + [cell_text(entry) == value for entry in values[1:]]
+        hits = [False] * len(values)
+        for entry in self.value_search(idx).select(value, negate=code == "not contains"):
+            hits[entry] = True
+        return hits
+
+    def value_search(self, idx):
+        # TextIndex over the dictionary, None standing for absent cells
+        view = self.search_views.get(idx)
+        if view is None:
+            view = TextIndex([None] + [cell_text(entry) for entry in self.dictionaries[idx][1:]], self.trigrams)
+            self.search_views[idx] = view
+            if self.charge is not None:
+                self.charge(view.size())
+        return view
+
+    def matching(self, idx, code, value, candidates=None):
+        if idx >= len(self.columns):
+            return []
+        hits = self.value_hits(idx, code, value)
+        if hits is None or not any(hits):
+            return []
+        codes = self.codes(idx)
+        if np is not None:
+            hits = np.asarray(hits, dtype=np.bool_)
+            if candidates is None:
+                return np.flatnonzero(hits[codes]).tolist()
+            picked = np.asarray(candidates, dtype=np.intp)
+            return picked[hits[codes[picked]]].tolist()
+        rows = range(len(codes)) if candidates is None else candidates
+        return [i for i in rows if hits[codes[i]]]
+
+
+def load_store(path, read_rows, cache_dir=None):
+    # The EncodedStore of a CSV or Excel file from "<file>.columns.idx",
+    # written by the first load and reused while the file's size and
+    # modification time are unchanged. read_rows(path) yields the header
+    # and then the data rows.
+    def build():
+        rows = read_rows(path)
+        header = next(rows, [])
+        return EncodedStore.build(header, rows)
+
+    return load_or_build(sidecar_paths(path, 'columns', cache_dir), file_stamp(path, format=FORMAT),
+                         EncodedStore.load, build)
+
+
+# pandas frames for app.py. Numeric, boolean and datetime columns are
+# stored as their raw arrays, the others dictionary-encoded like above.
+
+class FrameColumns:
+    def __init__(self, df):
+        self.df = df
+
+    def save(self, path, stamp):
+        import pandas as pd
+
+        kinds = []
+        parts = []
+        for _, series in self.df.items():
+            values = series.to_numpy()
+            if values.dtype.kind in 'biufmM':
+                kinds.append('array')
+                parts.append(np.ascontiguousarray(values))
+                continue
+            kinds.append('dict')
+            if pd.api.types.infer_dtype(values, skipna=False) == 'string':
+                # Plain text, the common case for CSV files: factorize in C
+                codes, uniques = pd.factorize(values)
+                codes = codes + 1
+                dictionary = [None] + uniques.tolist()
+            else:
+                encoder = ColumnEncoder()
+                for value in values:
+                    encoder.append(value)
+                codes, dictionary = encoder.finish()
+            parts.append(np.asarray(codes, dtype=np.min_scalar_type(len(dictionary))))
+            parts.append(array('B', dictionary_bytes(dictionary)))
+        write_column_file(path, stamp, {'columns': [encode_value(name) for name in self.df.columns],
+                                        'kinds': kinds, 'count': len(self.df)}, parts)
+
+    @classmethod
+    def load(cls, path, stamp):
+        import pandas as pd
+
+        result = read_column_file(path, stamp)
+        if result is None:
+            return None
+        info, parts = result
+        parts = iter(parts)
+        arrays = []
+        for kind in info['kinds']:
+            if kind == 'array':
+                arrays.append(next(parts))
+                continue
+            codes = next(parts)
+            entries = read_dictionary(next(parts))
+            dictionary = np.empty(len(entries), dtype=object)
+            dictionary[:] = entries
+            arrays.append(dictionary[codes])
+        df = pd.DataFrame(dict(enumerate(arrays)), index=pd.RangeIndex(info['count']))
+        df.columns = [decode_value(name) for name in info['columns']]
+        return cls(df)
+
+
+def load_frame(path, parse, folder, checksum):
+    # The frame parse(path) would return, from "<checksum>.frame.idx" in
+    # `folder` when the same content was loaded before. Keyed by content
+    # rather than path since every upload is stored under a new name.
+    cache_path = os.path.join(folder, f'{checksum}.frame.idx')
+    stamp = {'format': FORMAT, 'checksum': checksum}
+    os.makedirs(folder, exist_ok=True)
+    cached = load_or_build([cache_path], stamp, FrameColumns.load, lambda: FrameColumns(parse(path)))
+    try:
+        os.utime(cache_path)  # remove_stale_caches goes by last use
+    except OSError:
+        pass
+    return cached.df
+
+
+def remove_stale_caches(folder, max_age):
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return
+    now = time.time()
+    for name in names:
+        if not name.endswith(('.frame.idx', '.frame.idx.tmp')):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,163 @@
+from array import array
+
+from predicates import NUMERIC_OPERATORS, cell_text, condition_rank, filter_tests, numeric_series, series_text
+from text_search import TextIndex
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class ColumnStore:
+    # Row-major data as read from the file plus lazily built per-column views.
+    # Each view is derived once and reused by every later comparison:
+    #   text(idx)    - cell text, None where the row is too short
+    #   lower(idx)   - lowercased text
+    #   numeric(idx) - (values, valid) with float values and a validity
+    #                  bitmap; NumPy arrays when available, else array/bytearray
+    #   search(idx)  - TextIndex for contains / not contains, with trigram
+    #                  posting lists when `trigrams` is set
+    # A cached store gets `charge`, called with the size of each TextIndex
+    # built so the dataset cache counts it.
+    def __init__(self, header, rows, trigrams=False):
+        self.header = list(header)
+        self.rows = rows
+        self.trigrams = trigrams
+        self.charge = None
+        self.text_views = {}
+        self.lower_views = {}
+        self.numeric_views = {}
+        self.search_views = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def text(self, idx):
+        view = self.text_views.get(idx)
+        if view is None:
+            view = [cell_text(row[idx]) if idx < len(row) else None for row in self.rows]
+            self.text_views[idx] = view
+        return view
+
+    def lower(self, idx):
+        view = self.lower_views.get(idx)
+        if view is None:
+            view = [None if value is None else value.lower() for value in self.text(idx)]
+            self.lower_views[idx] = view
+        return view
+
+    def numeric(self, idx):
+        view = self.numeric_views.get(idx)
+        if view is None:
+            values = array('d')
+            valid = bytearray()
+            for row in self.rows:
+                try:
+                    values.append(float(row[idx]))
+                    valid.append(1)
+                except (IndexError, TypeError, ValueError):
+                    values.append(0.0)
+                    valid.append(0)
+            if np is not None:
+                view = (np.frombuffer(values, dtype=np.float64), np.frombuffer(bytes(valid), dtype=np.bool_))
+            else:
+                view = (values, valid)
+            self.numeric_views[idx] = view
+        return view
+
+    def search(self, idx):
+        view = self.search_views.get(idx)
+        if view is None:
+            view = TextIndex(self.text(idx), self.trigrams)
+            self.search_views[idx] = view
+            if self.charge is not None:
+                self.charge(view.size())
+        return view
+
+    def has_view(self, idx, code):
+        # Whether the view a condition on column `idx` needs is built
+        if code in NUMERIC_OPERATORS:
+            return idx in self.numeric_views
+        if code in ("contains", "not contains"):
+            return idx in self.search_views
+        return idx in self.text_views
+
+    def select(self, filters, candidates=None):
+        # Returns the indices of matching rows, narrowing the candidate set
+        # one condition at a time (None means every row), the cheapest and
+        # most selective conditions first
+        tests = filter_tests(self.header, filters)
+        if tests is None:
+            return []
+
+        tests.sort(key=lambda test: -condition_rank(test[1], self.has_view(test[0], test[1])))
+        for idx, code, value in tests:
+            candidates = self.matching(idx, code, value, candidates)
+            if not candidates:
+                return []
+        if candidates is None:
+            return list(range(len(self.rows)))
+        return candidates
+
+    def matching(self, idx, code, value, candidates=None):
+        if code in NUMERIC_OPERATORS:
+            return self.matching_numeric(idx, NUMERIC_OPERATORS[code], value, candidates)
+
+        rows = range(len(self.rows)) if candidates is None else candidates
+        if code == "==":
+            text = self.text(idx)
+            return [i for i in rows if text[i] == value]
+
+        return self.search(idx).select(value, candidates, negate=code == "not contains")
+
+    def matching_numeric(self, idx, op, value, candidates=None):
+        try:
+            bound = float(value)
+        except ValueError:
+            return []
+        values, valid = self.numeric(idx)
+
+        if np is not None:
+            if candidates is None:
+                return np.flatnonzero(valid & op(values, bound)).tolist()
+            picked = np.asarray(candidates, dtype=np.intp)
+            return picked[valid[picked] & op(values[picked], bound)].tolist()
+
+        rows = range(len(self.rows)) if candidates is None else candidates
+        return [i for i in rows if valid[i] and op(values[i], bound)]
+
+
+class FrameStore:
+    # pandas counterpart of ColumnStore for app.py: keeps the parsed
+    # DataFrame together with numeric and search views of its columns
+    def __init__(self, df, trigrams=False):
+        self.df = df
+        self.trigrams = trigrams
+        self.charge = None
+        self.numeric_views = {}
+        self.search_views = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def numeric(self, col):
+        view = self.numeric_views.get(col)
+        if view is None:
+            view = numeric_series(self.df[col])
+            self.numeric_views[col] = view
+        return view
+
+    def search(self, col):
+        view = self.search_views.get(col)
+        if view is None:
+            view = TextIndex(series_text(self.df[col]).tolist(), self.trigrams)
+            self.search_views[col] = view
+            if self.charge is not None:
+                self.charge(view.size())
+        return view
+
+    def has_view(self, col, code):
+        if code in NUMERIC_OPERATORS:
+            return col in self.numeric_views
+        return code in ("contains", "not contains") and col in self.search_views
@@ -2,22 +2,356 @@ import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import csv
 import os
+import queue
+import threading
+from array import array
+
+from column_cache import load_store as load_column_store
+from columnar import ColumnStore
+from dataset_cache import DatasetCache, estimate_rows_size, file_key
+from match_cache import MatchCache
+from predicates import CONDITIONS, compile_filters, filter_tests, is_active
+from mmap_reader import byte_filter, mmap_filter
+from parallel_scan import parallel_count, parallel_filter, parallel_offsets, should_scan_in_parallel
+from records import TEXT_ENCODING, iter_rows_with_offsets, parse_records, read_records_at
+from records import read_header as read_csv_header
+from row_index import load_row_index, paginate
+from sidecar_index import filter_with_index
+from update_engine import UpdatePlan
+from virtual_grid import IndexedRows, MappedRows, OffsetRows, RowIndexRows, ScannedRows, VirtualGrid
+from xlsx_reader import iter_xlsx_rows
+from xlsx_writer import write_xlsx
 
 try:
     import openpyxl
 except ImportError:
     openpyxl = None
 
-CONDITIONS = [
-    ("", ""),  # No filter
-    ("==", "Equals"),
-    (">", "Greater than"),
-    ("<", "Less than"),
-    (">=", "Greater or equal"),
-    ("<=", "Less or equal"),
-    ("contains", "Contains"),
-    ("not contains", "Not contains"),
-]
+class CountCancelled(Exception):
+    pass
+
+def cancellable(rows, cancelled, every=5000):
+    for i, row in enumerate(rows):
+        if cancelled is not None and i % every == 0 and cancelled():
+            raise CountCancelled()
+        yield row
+
+# Rough in-memory size of parsed rows per byte on disk, used to decide
+# whether a file is small enough to keep in the dataset cache
+ROW_EXPANSION = {".csv": 6, ".xlsx": 40}
+ENCODED_EXPANSION = {".csv": 3, ".xlsx": 20}  # the same for the column cache's dictionary-encoded form
+
+dataset_cache = DatasetCache()
+match_cache = MatchCache()
+use_column_cache = False  # set from the checkbox under the tabs
+
+def iter_file_rows(input_file):
+    ext = os.path.splitext(input_file)[1].lower()
+    if ext == ".csv":
+        with open(input_file, 'r', newline='', encoding=TEXT_ENCODING) as infile:
+            # Empty lines are not rows, as for pandas and the row index
+            yield from (row for row in csv.reader(infile) if row)
+    elif ext == ".xlsx":
+        yield from iter_xlsx_rows(input_file)
+
+def load_store(input_file):
+    rows = iter_file_rows(input_file)
+    header = next(rows)
+    return ColumnStore(header, list(rows))
+
+def set_column_cache(enabled):
+    global use_column_cache
+    use_column_cache = enabled
+    dataset_cache.invalidate()  # reload stores in the chosen form
+
+def read_store(input_file):
+    # Returns None when the file is too big to keep in memory. With the
+    # column cache on, every file is opened from its "<file>.columns.idx"
+    # copy, written by the first load; that form is compact enough for
+    # files about twice the size of those that fit as parsed rows.
+    ext = os.path.splitext(input_file)[1].lower()
+    expansion = (ENCODED_EXPANSION if use_column_cache else ROW_EXPANSION).get(ext, 1)
+    if not dataset_cache.fits(os.path.getsize(input_file) * expansion):
+        return None
+
+    def load(path):
+        store = load_column_store(path, iter_file_rows) if use_column_cache else load_store(path)
+        store.charge = lambda size: dataset_cache.charge(path, "rows", store, size)
+        return store
+
+    sizeof = (lambda store: store.size()) if use_column_cache else (lambda store: estimate_rows_size(store.rows))
+    return dataset_cache.get_or_load(input_file, "rows", load, sizeof)
+
+def read_rows(input_file):
+    store = read_store(input_file)
+    if store is not None:
+        return store.header, store.rows
+    rows = iter_file_rows(input_file)
+    return next(rows), rows
+
+def csv_row_index(input_file, persist=False):
+    # The row offset index of a CSV file, or None when literal quotes keep
+    # its records from being found by their bytes (records.RecordError);
+    # such files are read with csv.reader from the top instead
+    try:
+        return load_row_index(input_file, persist)
+    except csv.Error:
+        return None
+
+def count_rows(input_file, persist_index=False):
+    store = dataset_cache.get(input_file, "rows")
+    if store is not None:
+        return len(store)
+    row_index = None
+    if os.path.splitext(input_file)[1].lower() == ".csv":
+        row_index = csv_row_index(input_file, persist_index)
+    if row_index is not None:
+        return len(row_index)
+    store = read_store(input_file)
+    if store is not None:
+        return len(store)
+    return sum(1 for _ in read_rows(input_file)[1])
+
+def read_header(input_file):
+    cached = dataset_cache.get(input_file, "rows")
+    if cached is not None:
+        return cached.header
+    return next(iter_file_rows(input_file), [])
+
+def incremental_matches(input_file, filters, max_records=None, cancelled=None):
+    # The matches as row numbers of the cached store, or as byte offsets of
+    # the records of an uncached CSV file. When the filters only tighten
+    # the last complete result for the file, just its survivors are tested
+    # again, so refining a filter costs in proportion to the match count.
+    # Returns None for uncached Excel files and when no condition is set.
+    # Raises csv.Error for CSV files the byte-level readers cannot follow.
+    store = read_store(input_file)
+    if store is not None:
+        tests = filter_tests(store.header, filters)
+        if not tests:
+            return None
+        key = file_key(input_file) + ("rows",)
+        matches = store.select(filters, match_cache.base(key, tests))
+        match_cache.remember(key, tests, matches)
+        return matches
+
+    if os.path.splitext(input_file)[1].lower() != ".csv":
+        return None
+    header, start = read_csv_header(input_file)
+    tests = filter_tests(header, filters)
+    if not tests:
+        return None
+    key = file_key(input_file) + ("offsets",)
+    base = match_cache.base(key, tests)
+    limit = max_records if base is None else None
+    matches = compile_filters(header, filters)
+
+    # Same choice of scan as get_filtered_rows. An anchored byte search is
+    # cheap enough to run over the whole file even with survivors to
+    # narrow down; they then only limit which hits get parsed
+    parallel = should_scan_in_parallel(input_file)
+    result = mmap_filter(input_file, filters, limit, cancelled, require_anchor=parallel or base is not None,
+                         offsets=True, within=base)
+    if result is None and base is None and parallel:
+        result = parallel_offsets(input_file, filters, limit, cancelled=cancelled) or (None, None)
+    if result is not None:
+        offsets = result[1]
+        if offsets is None:
+            raise CountCancelled()
+    elif base is not None:
+        # Survivors are read back by offset, and only those passing the
+        # byte-level checks are parsed
+        records = cancellable(read_records_at(input_file, base), cancelled)
+        test = byte_filter(header, filters)
+        if test is not None:
+            records = (record for record in records if test(record[1]))
+        offsets = array('q', (offset for offset, row in parse_records(records) if matches(row)))
+    else:
+        offsets = array('q')
+        for offset, row in cancellable(iter_rows_with_offsets(input_file, start), cancelled):
+            if matches(row):
+                offsets.append(offset)
+                if limit is not None and len(offsets) >= limit:
+                    break
+    # Only a result that reached the end of the file can be refined later
+    if limit is None or len(offsets) < limit:
+        match_cache.remember(key, tests, offsets)
+    return offsets
+
+def get_filtered_rows(input_file, filters, max_records=None, cancelled=None, use_index=False, offset=0):
+    ext = os.path.splitext(input_file)[1].lower()
+    stop = None if max_records is None else offset + max_records
+    cached = dataset_cache.get(input_file, "rows")
+    if use_index and ext == ".csv" and cached is None:
+        # Seek straight to the indexed matches instead of loading the file
+        try:
+            result = filter_with_index(input_file, filters, stop)
+        except csv.Error:
+            result = None
+        if result is not None:
+            header, rows = result
+            return header, rows[offset:]
+    if offset and ext == ".csv" and cached is None and not any(is_active(c, v) for _, c, v in filters):
+        # Unfiltered window: jump to it through the row offset index
+        row_index = csv_row_index(input_file, use_index)
+        if row_index is not None:
+            return read_header(input_file), row_index.page(input_file, offset, max_records)
+
+    store = read_store(input_file)
+    if store is not None:
+        indices = store.select(filters)[offset:stop]
+        return store.header, [store.rows[i] for i in indices]
+
+    if ext == ".csv":
+        # Anchored byte search beats splitting the scan across processes,
+        # which in turn beats the plain byte-level prefilter
+        parallel = should_scan_in_parallel(input_file)
+        try:
+            result = mmap_filter(input_file, filters, stop, cancelled, require_anchor=parallel)
+            if result is None and parallel:
+                result = parallel_filter(input_file, filters, stop, cancelled=cancelled) or (None, None)
+        except csv.Error:
+            result = None  # read with csv.reader below
+        if result is not None:
+            header, rows = result
+            if rows is None:
+                raise CountCancelled()
+            return header, rows[offset:]
+
+    header, rows = read_rows(input_file)
+    matches = compile_filters(header, filters)
+    filtered_rows = (row for row in cancellable(rows, cancelled) if matches(row))
+    return header, list(paginate(filtered_rows, offset, max_records))
+
+def filtered_source(input_file, filters, max_records=None, cancelled=None, use_index=False):
+    # Returns (header, row source) for browsing the matches in a VirtualGrid.
+    # Cached files keep only the matching row numbers and CSV files only
+    # the byte offsets of the matches; the rows themselves are read back
+    # one screen at a time
+    store = read_store(input_file)
+    try:
+        matches = incremental_matches(input_file, filters, max_records, cancelled)
+        row_index = None
+        if store is None and matches is None and os.path.splitext(input_file)[1].lower() == ".csv":
+            row_index = load_row_index(input_file, use_index)
+    except csv.Error:
+        matches = row_index = None
+    else:
+        if store is not None:
+            if matches is None:
+                matches = store.select(filters)
+            return store.header, IndexedRows(store.rows, matches[:max_records])
+        if row_index is not None:
+            return read_header(input_file), RowIndexRows(input_file, row_index, max_records)
+        if matches is not None:
+            return read_header(input_file), OffsetRows(input_file, matches[:max_records])
+
+    # Excel files, and CSV files whose records cannot be found by their bytes
+    header = read_header(input_file)
+
+    def make_rows():
+        matches = compile_filters(header, filters)
+        rows = iter_file_rows(input_file)
+        next(rows, None)
+        return paginate((row for row in rows if matches(row)), 0, max_records)
+
+    return header, ScannedRows(make_rows, sum(1 for _ in cancellable(make_rows(), cancelled)))
+
+def get_updated_rows(input_file, updates, max_records=None, cancelled=None):
+    # Uncached files come back as a generator: rows are read and updated
+    # only as the writer consumes them, and reading stops at max_records
+    store = read_store(input_file)
+    if store is not None:
+        return store.header, UpdatePlan(store.header, updates).apply_store(store, max_records)
+
+    header, rows = read_rows(input_file)
+    plan = UpdatePlan(header, updates)
+    return header, (plan.apply(row) for row in paginate(cancellable(rows, cancelled), 0, max_records))
+
+def updated_source(input_file, updates, max_records=None, cancelled=None):
+    # Returns (header, row source) of the rows as they will be saved, with
+    # the updates applied to each screen of rows as it is shown
+    store = read_store(input_file)
+    row_index = None
+    if store is None and os.path.splitext(input_file)[1].lower() == ".csv":
+        row_index = csv_row_index(input_file)
+    if store is not None:
+        header, source = store.header, IndexedRows(store.rows[:max_records])
+    elif row_index is not None:
+        header = read_header(input_file)
+        source = RowIndexRows(input_file, row_index, max_records)
+    else:
+        header = read_header(input_file)
+        count = count_rows(input_file)
+
+        def make_rows():
+            rows = iter_file_rows(input_file)
+            next(rows, None)
+            return paginate(rows, 0, max_records)
+
+        source = ScannedRows(make_rows, count if max_records is None else min(count, max_records))
+    return header, MappedRows(source, UpdatePlan(header, updates).apply)
+
+class BackgroundCounter:
+    # Runs row counts off the Tk main thread. Each submit() supersedes the
+    # previous one: pending counts are debounced, in-flight counts notice
+    # the newer generation and stop, and only the latest result is shown.
+    def __init__(self, widget, delay=300, poll_interval=50):
+        self.widget = widget
+        self.delay = delay
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self.pending = None
+        self.active = 0
+        self.results = queue.Queue()
+
+    def submit(self, compute, callback, on_error=None):
+        # A failed compute shows as a result of 0 unless on_error is given,
+        # which then receives the exception instead
+        self.cancel()
+        generation = self.generation
+        self.pending = self.widget.after(self.delay, lambda: self._start(generation, compute, callback, on_error))
+
+    def cancel(self):
+        self.generation += 1
+        if self.pending is not None:
+            self.widget.after_cancel(self.pending)
+            self.pending = None
+
+    def _start(self, generation, compute, callback, on_error=None):
+        self.pending = None
+        cancelled = lambda: generation != self.generation
+
+        def run():
+            result = None
+            done = callback
+            try:
+                result = compute(cancelled)
+            except CountCancelled:
+                pass
+            except Exception as e:
+                if on_error is None:
+                    result = 0
+                else:
+                    result, done = e, on_error
+            self.results.put((generation, done, result))
+
+        self.active += 1
+        threading.Thread(target=run, daemon=True).start()
+        if self.active == 1:
+            self.widget.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                generation, callback, result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.active -= 1
+            if generation == self.generation and result is not None:
+                callback(result)
+        if self.active:
+            self.widget.after(self.poll_interval, self._poll)
 
 class FilterTab(ttk.Frame):
     def __init__(self, parent):
@@ -27,7 +361,11 @@ class FilterTab(ttk.Frame):
         self.all_columns = []
         self.selected_columns = []
         self.filter_widgets = []
+        self.index_var = tk.BooleanVar(value=False)
         self.count_var = tk.StringVar(value="Matching rows: 0")
+        self.counter = BackgroundCounter(self)
+        self.preview_var = tk.StringVar(value="")
+        self.previewer = BackgroundCounter(self, delay=0)
         self.setup_ui()
 
     def setup_ui(self):
@@ -39,6 +377,8 @@ class FilterTab(ttk.Frame):
         limit_entry = tk.Entry(self, textvariable=self.limit_var, width=15)
         limit_entry.grid(row=1, column=1, sticky="w")
         limit_entry.bind("<KeyRelease>", lambda e: self.update_count_label())
+        tk.Checkbutton(self, text="Use index files", variable=self.index_var,
+                       command=self.update_count_label).grid(row=1, column=2, sticky="w")
 
         tk.Label(self, text="Select Column:").grid(row=2, column=0, sticky="e")
         self.column_select = ttk.Combobox(self, values=self.all_columns, state="readonly", width=30)
@@ -52,6 +392,12 @@ class FilterTab(ttk.Frame):
         self.count_label.grid(row=5, column=0, columnspan=3, pady=5)
 
         tk.Button(self, text="Process", command=self.process_file).grid(row=4, column=1, pady=10)
+        tk.Button(self, text="Preview", command=self.show_preview).grid(row=4, column=2, pady=10)
+
+        self.grid_view = VirtualGrid(self)
+        self.grid_view.grid(row=6, column=0, columnspan=3, sticky="nsew", pady=5)
+        tk.Label(self, textvariable=self.preview_var).grid(row=7, column=0, columnspan=3)
+        self.rowconfigure(6, weight=1)
 
     def select_file(self):
         file_path = filedialog.askopenfilename(
@@ -67,22 +413,13 @@ class FilterTab(ttk.Frame):
                 messagebox.showerror("Error", "openpyxl is required for Excel files. Please install it with 'pip install openpyxl'.")
                 return
             self.file_var.set(file_path)
+            self.clear_preview()
             self.load_headers(file_path)
             self.reset_column_selection()
             self.update_count_label()
 
     def load_headers(self, file_path):
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == ".csv":
-            with open(file_path, 'r', newline='', encoding='utf-8') as infile:
-                reader = csv.reader(infile)
-                headers = next(reader)
-        elif ext == ".xlsx":
-            wb = openpyxl.load_workbook(file_path, read_only=True)
-            ws = wb.active
-            headers = [cell.value for cell in next(ws.iter_rows(max_row=1))]
-        else:
-            headers = []
+        headers = read_header(file_path)
         self.all_columns.clear()
         self.all_columns.extend(headers)
         self.column_select['values'] = self.all_columns
@@ -140,78 +477,35 @@ class FilterTab(ttk.Frame):
                 entry.bind("<KeyRelease>", lambda e: self.update_count_label())
             self.update_count_label()
 
-    def row_matches_filters(self, row, filters, header):
-        for col, cond_var, entry in filters:
-            if col not in header:
-                return False
-            idx = header.index(col)
-            value = row[idx]
-            cond_label = cond_var.get()
-            cond_code = ""
-            for code, label in CONDITIONS:
-                if label == cond_label:
-                    cond_code = code
-                    break
-            filter_value = entry.get().strip()
-            if not cond_code or not filter_value:
-                continue
-            try:
-                if cond_code == "==":
-                    if str(value) != filter_value:
-                        return False
-                elif cond_code == ">":
-                    if float(value) <= float(filter_value):
-                        return False
-                elif cond_code == "<":
-                    if float(value) >= float(filter_value):
-                        return False
-                elif cond_code == ">=":
-                    if float(value) < float(filter_value):
-                        return False
-                elif cond_code == "<=":
-                    if float(value) > float(filter_value):
-                        return False
-                elif cond_code == "contains":
-                    if filter_value.lower() not in str(value).lower():
-                        return False
-                elif cond_code == "not contains":
-                    if filter_value.lower() in str(value).lower():
-                        return False
-            except Exception:
-                return False
-        return True
-
-    def get_filtered_rows(self, input_file, filters, max_records=None):
-        ext = os.path.splitext(input_file)[1].lower()
-        if ext == ".csv":
-            with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-                reader = csv.reader(infile)
-                header = next(reader)
-                filtered_rows = (row for row in reader if self.row_matches_filters(row, filters, header))
-                if max_records is not None:
-                    limited_rows = [row for _, row in zip(range(max_records), filtered_rows)]
-                else:
-                    limited_rows = list(filtered_rows)
-        elif ext == ".xlsx":
-            wb = openpyxl.load_workbook(input_file, read_only=True)
-            ws = wb.active
-            rows = ws.iter_rows(values_only=True)
-            header = next(rows)
-            filtered_rows = (row for row in rows if self.row_matches_filters(row, filters, header))
-            if max_records is not None:
-                limited_rows = [row for _, row in zip(range(max_records), filtered_rows)]
-            else:
-                limited_rows = list(filtered_rows)
-        else:
-            header = []
-            limited_rows = []
-        return header, limited_rows
+    def get_filter_specs(self):
+        return [(col, cond_var.get(), entry.get().strip()) for col, cond_var, entry in self.filter_widgets]
+
+    def count_filtered_rows(self, input_file, filters, max_records=None, cancelled=None, use_index=False):
+        # Files the byte-level scans cannot follow (csv.Error) are counted
+        # by get_filtered_rows, which falls back to csv.reader
+        try:
+            if not use_index:
+                matches = incremental_matches(input_file, filters, max_records, cancelled)
+                if matches is not None:
+                    return len(matches) if max_records is None else min(len(matches), max_records)
+            ext = os.path.splitext(input_file)[1].lower()
+            if (ext == ".csv" and not use_index and dataset_cache.get(input_file, "rows") is None
+                    and read_store(input_file) is None and should_scan_in_parallel(input_file)):
+                # Workers only send back counts, not rows
+                count = parallel_count(input_file, filters, max_records, cancelled=cancelled)
+                if count is None:
+                    raise CountCancelled()
+                return count
+        except csv.Error:
+            pass
+        return len(get_filtered_rows(input_file, filters, max_records, cancelled, use_index)[1])
 
     def update_count_label(self, *args):
         input_file = self.file_var.get()
         limit = self.limit_var.get().strip()
         ext = os.path.splitext(input_file)[1].lower()
         if not input_file or not os.path.isfile(input_file) or ext not in [".csv", ".xlsx"]:
+            self.counter.cancel()
             self.count_var.set("Matching rows: 0")
             return
         if limit:
@@ -220,18 +514,54 @@ class FilterTab(ttk.Frame):
                 if max_records <= 0:
                     raise ValueError
             except ValueError:
+                self.counter.cancel()
                 self.count_var.set("Matching rows: 0")
                 return
         else:
             max_records = None
 
-        filters = self.filter_widgets
+        filters = self.get_filter_specs()
+        use_index = self.index_var.get()
+        self.count_var.set("Matching rows: counting...")
+        self.counter.submit(
+            lambda cancelled: self.count_filtered_rows(input_file, filters, max_records, cancelled, use_index),
+            lambda row_count: self.count_var.set(f"Matching rows: {row_count}")
+        )
+
+    def clear_preview(self):
+        self.previewer.cancel()
+        self.grid_view.clear()
+        self.preview_var.set("")
+
+    def show_preview(self):
+        # Matching rows are browsed in the grid instead of being saved first
+        input_file = self.file_var.get()
+        limit = self.limit_var.get().strip()
+        ext = os.path.splitext(input_file)[1].lower()
+        if not input_file or not os.path.isfile(input_file) or ext not in [".csv", ".xlsx"]:
+            messagebox.showerror("Error", "Please select a valid CSV (.csv) or Excel (.xlsx) file.")
+            return
         try:
-            header, filtered_rows = self.get_filtered_rows(input_file, filters, max_records)
-            row_count = len(filtered_rows)
-        except Exception:
-            row_count = 0
-        self.count_var.set(f"Matching rows: {row_count}")
+            max_records = int(limit) if limit else None
+            if max_records is not None and max_records <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid positive integer for the row limit, or leave blank for all.")
+            return
+
+        filters = self.get_filter_specs()
+        use_index = self.index_var.get()
+        self.preview_var.set("Loading preview...")
+        self.previewer.submit(
+            lambda cancelled: filtered_source(input_file, filters, max_records, cancelled, use_index),
+            self.set_preview,
+            lambda error: self.preview_var.set(f"Preview failed: {error}")
+        )
+
+    def set_preview(self, result):
+        header, source = result
+        self.grid_view.set_data(header, source)
+        self.preview_var.set(f"Previewing {len(source)} matching row(s)")
 
     def process_file(self):
         input_file = self.file_var.get()
@@ -254,10 +584,10 @@ class FilterTab(ttk.Frame):
         else:
             max_records = None
 
-        filters = self.filter_widgets
+        filters = self.get_filter_specs()
 
         try:
-            header, filtered_rows = self.get_filtered_rows(input_file, filters, max_records)
+            header, filtered_rows = get_filtered_rows(input_file, filters, max_records, use_index=self.index_var.get())
             row_count = len(filtered_rows)
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred while filtering:\n{e}")
@@ -306,6 +636,9 @@ class UpdateTab(ttk.Frame):
         self.selected_columns = []
         self.update_widgets = []
         self.count_var = tk.StringVar(value="Matching rows: 0")
+        self.counter = BackgroundCounter(self)
+        self.preview_var = tk.StringVar(value="")
+        self.previewer = BackgroundCounter(self, delay=0)
         self.setup_ui()
 
     def setup_ui(self):
@@ -330,6 +663,12 @@ class UpdateTab(ttk.Frame):
         self.count_label.grid(row=5, column=0, columnspan=3, pady=5)
 
         tk.Button(self, text="Process", command=self.process_file).grid(row=4, column=1, pady=10)
+        tk.Button(self, text="Preview", command=self.show_preview).grid(row=4, column=2, pady=10)
+
+        self.grid_view = VirtualGrid(self)
+        self.grid_view.grid(row=6, column=0, columnspan=3, sticky="nsew", pady=5)
+        tk.Label(self, textvariable=self.preview_var).grid(row=7, column=0, columnspan=3)
+        self.rowconfigure(6, weight=1)
 
     def select_file(self):
         file_path = filedialog.askopenfilename(
@@ -345,22 +684,13 @@ class UpdateTab(ttk.Frame):
                 messagebox.showerror("Error", "openpyxl is required for Excel files. Please install it with 'pip install openpyxl'.")
                 return
             self.file_var.set(file_path)
+            self.clear_preview()
             self.load_headers(file_path)
             self.reset_column_selection()
             self.update_count_label()
 
     def load_headers(self, file_path):
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == ".csv":
-            with open(file_path, 'r', newline='', encoding='utf-8') as infile:
-                reader = csv.reader(infile)
-                headers = next(reader)
-        elif ext == ".xlsx":
-            wb = openpyxl.load_workbook(file_path, read_only=True)
-            ws = wb.active
-            headers = [cell.value for cell in next(ws.iter_rows(max_row=1))]
-        else:
-            headers = []
+        headers = read_header(file_path)
         self.all_columns.clear()
         self.all_columns.extend(headers)
         self.column_select['values'] = self.all_columns
@@ -423,113 +753,18 @@ class UpdateTab(ttk.Frame):
                 filter_entry.bind("<KeyRelease>", lambda e: self.update_count_label())
             self.update_count_label()
 
-    def row_matches_filters(self, row, filters, header):
-        for col, cond_var, filter_entry, _ in filters:
-            if col not in header:
-                return False
-            idx = header.index(col)
-            value = row[idx]
-            cond_label = cond_var.get()
-            cond_code = ""
-            for code, label in CONDITIONS:
-                if label == cond_label:
-                    cond_code = code
-                    break
-            filter_value = filter_entry.get().strip()
-            if not cond_code or not filter_value:
-                continue
-            try:
-                if cond_code == "==":
-                    if str(value) != filter_value:
-                        return False
-                elif cond_code == ">":
-                    if float(value) <= float(filter_value):
-                        return False
-                elif cond_code == "<":
-                    if float(value) >= float(filter_value):
-                        return False
-                elif cond_code == ">=":
-                    if float(value) < float(filter_value):
-                        return False
-                elif cond_code == "<=":
-                    if float(value) > float(filter_value):
-                        return False
-                elif cond_code == "contains":
-                    if filter_value.lower() not in str(value).lower():
-                        return False
-                elif cond_code == "not contains":
-                    if filter_value.lower() in str(value).lower():
-                        return False
-            except Exception:
-                return False
-        return True
-
-    def get_updated_rows(self, input_file, updates, max_records=None):
-        ext = os.path.splitext(input_file)[1].lower()
-        if ext == ".csv":
-            with open(input_file, 'r', newline='', encoding='utf-8') as infile:
-                reader = csv.reader(infile)
-                header = next(reader)
-                rows = list(reader)
-        elif ext == ".xlsx":
-            wb = openpyxl.load_workbook(input_file, read_only=True)
-            ws = wb.active
-            rows = list(ws.iter_rows(values_only=True))
-            header = rows.pop(0)
-        else:
-            header = []
-            rows = []
-
-        updated_rows = []
-        for row in rows:
-            new_row = list(row)
-            for col, cond_var, filter_entry, value_entry in updates:
-                if col not in header:
-                    continue
-                idx = header.index(col)
-                value = row[idx]
-                cond_label = cond_var.get()
-                cond_code = ""
-                for code, label in CONDITIONS:
-                    if label == cond_label:
-                        cond_code = code
-                        break
-                filter_value = filter_entry.get().strip()
-                new_value = value_entry.get().strip()
-                if not cond_code or not filter_value:
-                    continue
-                try:
-                    should_update = False
-                    if cond_code == "==":
-                        should_update = str(value) == filter_value
-                    elif cond_code == ">":
-                        should_update = float(value) > float(filter_value)
-                    elif cond_code == "<":
-                        should_update = float(value) < float(filter_value)
-                    elif cond_code == ">=":
-                        should_update = float(value) >= float(filter_value)
-                    elif cond_code == "<=":
-                        should_update = float(value) <= float(filter_value)
-                    elif cond_code == "contains":
-                        should_update = filter_value.lower() in str(value).lower()
-                    elif cond_code == "not contains":
-                        should_update = filter_value.lower() not in str(value).lower()
-                    if should_update:
-                        new_row[idx] = new_value
-                except Exception:
-                    continue
-            updated_rows.append(new_row)
-
-        if max_records is not None:
-            updated_rows = updated_rows[:max_records]
-
-        return header, updated_rows
+    def get_update_specs(self):
+        return [
+            (col, cond_var.get(), filter_entry.get().strip(), value_entry.get().strip())
+            for col, cond_var, filter_entry, value_entry in self.update_widgets
+        ]
 
     def update_count_label(self, *args):
         input_file = self.file_var.get()
         limit = self.limit_var.get().strip()
         ext = os.path.splitext(input_file)[1].lower()
         if not input_file or not os.path.isfile(input_file) or ext not in [".csv", ".xlsx"]:
+            self.counter.cancel()
             self.count_var.set("Total rows: 0")
             return
         if limit:
@@ -538,17 +773,51 @@ class UpdateTab(ttk.Frame):
                 if max_records <= 0:
                     raise ValueError
             except ValueError:
+                self.counter.cancel()
                 self.count_var.set("Total rows: 0")
                 return
         else:
             max_records = None
 
+        self.count_var.set("Total rows: counting...")
+        self.counter.submit(
+            lambda cancelled: count_rows(input_file) if max_records is None else min(count_rows(input_file), max_records),
+            lambda row_count: self.count_var.set(f"Total rows: {row_count}")
+        )
+
+    def clear_preview(self):
+        self.previewer.cancel()
+        self.grid_view.clear()
+        self.preview_var.set("")
+
+    def show_preview(self):
+        # The rows as they will be saved, updated one screen at a time
+        input_file = self.file_var.get()
+        limit = self.limit_var.get().strip()
+        ext = os.path.splitext(input_file)[1].lower()
+        if not input_file or not os.path.isfile(input_file) or ext not in [".csv", ".xlsx"]:
+            messagebox.showerror("Error", "Please select a valid CSV (.csv) or Excel (.xlsx) file.")
+            return
         try:
-            header, updated_rows = self.get_updated_rows(input_file, self.update_widgets, max_records)
-            row_count = len(updated_rows)
-        except Exception:
-            row_count = 0
-        self.count_var.set(f"Total rows: {row_count}")
+            max_records = int(limit) if limit else None
+            if max_records is not None and max_records <= 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Please enter a valid positive integer for the row limit, or leave blank for all.")
+            return
+
+        updates = self.get_update_specs()
+        self.preview_var.set("Loading preview...")
+        self.previewer.submit(
+            lambda cancelled: updated_source(input_file, updates, max_records, cancelled),
+            self.set_preview,
+            lambda error: self.preview_var.set(f"Preview failed: {error}")
+        )
+
+    def set_preview(self, result):
+        header, source = result
+        self.grid_view.set_data(header, source)
+        self.preview_var.set(f"Previewing {len(source)} row(s)")
 
     def process_file(self):
         input_file = self.file_var.get()
@@ -572,8 +841,11 @@ class UpdateTab(ttk.Frame):
             max_records = None
 
         try:
-            header, updated_rows = self.get_updated_rows(input_file, self.update_widgets, max_records)
-            row_count = len(updated_rows)
+            header, updated_rows = get_updated_rows(input_file, self.get_update_specs(), max_records)
+            # Updates never add or drop rows, so the count comes from the file
+            row_count = count_rows(input_file)
+            if max_records is not None:
+                row_count = min(row_count, max_records)
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred while updating:\n{e}")
             return
@@ -619,27 +891,31 @@ def save_csv(header, rows, output_file):
         writer.writerows(rows)
 
 def save_xlsx(header, rows, output_file):
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.append(header)
-    for row in rows:
-        ws.append(row)
-    wb.save(output_file)
+    # Sheet XML is written straight from the rows, without openpyxl cells
+    write_xlsx(output_file, header, rows)
 
 # --- Tkinter UI setup ---
-root = tk.Tk()
-root.title("CSV/Excel Editor")
-
-# Create notebook (tabs)
-notebook = ttk.Notebook(root)
-notebook.pack(expand=True, fill='both', padx=5, pady=5)
-
-# Create tabs
-filter_tab = FilterTab(notebook)
-update_tab = UpdateTab(notebook)
-
-# Add tabs to notebook
-notebook.add(filter_tab, text='Filter Records')
-notebook.add(update_tab, text='Update Values')
-
-root.mainloop()
+# Guarded so the process pool used by parallel scans can re-import this
+# module on Windows without opening another window
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("CSV/Excel Editor")
+
+    # Create notebook (tabs)
+    notebook = ttk.Notebook(root)
+    notebook.pack(expand=True, fill='both', padx=5, pady=5)
+
+    # Create tabs
+    filter_tab = FilterTab(notebook)
+    update_tab = UpdateTab(notebook)
+
+    # Add tabs to notebook
+    notebook.add(filter_tab, text='Filter Records')
+    notebook.add(update_tab, text='Update Values')
+
+    column_cache_var = tk.BooleanVar(value=use_column_cache)
+    tk.Checkbutton(root, text="Keep a columnar copy of opened files for faster re-opening",
+                   variable=column_cache_var,
+                   command=lambda: set_column_cache(column_cache_var.get())).pack(anchor="w", padx=5, pady=(0, 5))
+
+    root.mainloop()
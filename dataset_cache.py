@@ -0,0 +1,141 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512MB of parsed data
+DEFAULT_MAX_ENTRIES = 8
+
+
+def file_key(path):
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+
+def estimate_rows_size(rows, sample=1000):
+    # Deep-sizing every cell is as slow as parsing, so extrapolate from a sample
+    if not rows:
+        return sys.getsizeof(rows)
+    step = max(1, len(rows) // sample)
+    picked = rows[::step]
+    per_row = sum(
+        sys.getsizeof(row) + sum(sys.getsizeof(cell) for cell in row) for row in picked
+    ) / len(picked)
+    return int(sys.getsizeof(rows) + per_row * len(rows))
+
+
+class DatasetCache:
+    # Parsed datasets keyed by (path, size, mtime) and a kind ("rows" for the
+    # Tk GUI, "frame" for the Flask app), evicted least-recently-used first
+    # once the memory budget or entry limit is exceeded. With a ttl, entries
+    # not used for that many seconds are dropped as well.
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=DEFAULT_MAX_ENTRIES, ttl=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.RLock()
+        self.loading = {}
+
+    def fits(self, size):
+        return size <= self.max_bytes
+
+    def get(self, path, kind):
+        try:
+            key = file_key(path) + (kind,)
+        except OSError:
+            return None
+        with self.lock:
+            self._expire()
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            self.entries.move_to_end(key)
+            self.entries[key] = entry[:2] + (time.monotonic(),)
+            return entry[0]
+
+    def put(self, path, kind, value, size, key=None):
+        if key is None:
+            key = file_key(path)
+        key = key + (kind,)
+        with self.lock:
+            self._expire()
+            self._discard(key)
+            # A newer version of the same file makes older entries unreachable
+            for old_key in [k for k in self.entries if k[0] == key[0] and k[3] == kind]:
+                self._discard(old_key)
+            if not self.fits(size):
+                return
+            self.entries[key] = (value, size, time.monotonic())
+            self.total_bytes += size
+            while self.entries and (
+                self.total_bytes > self.max_bytes or len(self.entries) > self.max_entries
+            ):
+                self._discard(next(iter(self.entries)))
+
+    def get_or_load(self, path, kind, loader, sizeof):
+        value = self.get(path, kind)
+        if value is not None:
+            return value
+        key = file_key(path)
+        # Concurrent callers for the same file wait for a single parse
+        with self.lock:
+            load_lock = self.loading.setdefault(key + (kind,), threading.Lock())
+        try:
+            with load_lock:
+                value = self.get(path, kind)
+                if value is None:
+                    value = loader(path)
+                    self.put(path, kind, value, sizeof(value), key=key)
+        finally:
+            with self.lock:
+                self.loading.pop(key + (kind,), None)
+        return value
+
+    def charge(self, path, kind, value, size):
+        # Adds `size` bytes built after loading, e.g. an index over one of
+        # the columns, to the entry holding `value`. Other entries are
+        # evicted to make room; an entry that no longer fits on its own is
+        # dropped, and callers holding the value keep using it.
+        path = os.path.abspath(path)
+        with self.lock:
+            for key, entry in self.entries.items():
+                if key[0] == path and key[3] == kind and entry[0] is value:
+                    break
+            else:
+                return
+            self.entries[key] = (value, entry[1] + size, entry[2])
+            self.entries.move_to_end(key)
+            self.total_bytes += size
+            if not self.fits(entry[1] + size):
+                self._discard(key)
+            while self.total_bytes > self.max_bytes:
+                self._discard(next(iter(self.entries)))
+
+    def invalidate(self, path=None):
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+                self.total_bytes = 0
+                return
+            path = os.path.abspath(path)
+            for key in [k for k in self.entries if k[0] == path]:
+                self._discard(key)
+
+    def _expire(self):
+        # Entries are kept in order of last use, so the expired ones are first
+        if self.ttl is None:
+            return
+        deadline = time.monotonic() - self.ttl
+        while self.entries:
+            key = next(iter(self.entries))
+            if self.entries[key][2] > deadline:
+                break
+            self._discard(key)
+
+    def _discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry[1]
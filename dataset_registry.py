@@ -0,0 +1,134 @@
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+DEFAULT_TTL = 6 * 60 * 60  # seconds an unused dataset is kept on disk
+DEFAULT_MAX_DATASETS = 200
+COLLECT_INTERVAL = 60  # seconds between garbage collection passes
+DATASET_ID = re.compile(r'[0-9a-f]{32}')
+
+
+class Dataset:
+    # An uploaded file stored as "<root>/<id>/<filename>". Outputs written
+    # for it go to the same folder, so they are removed together.
+    def __init__(self, dataset_id, filename, folder):
+        self.id = dataset_id
+        self.filename = filename
+        self.folder = folder
+        self.last_used = time.time()
+        self.pins = 0  # jobs still reading the file
+        self.removed = False  # deleted once the last pin is released
+
+    @property
+    def path(self):
+        return os.path.join(self.folder, self.filename)
+
+    def output_path(self, prefix):
+        return os.path.join(self.folder, f'{prefix}_{self.filename}')
+
+
+class DatasetRegistry:
+    # Uploaded datasets by id, so uploads with the same file name no longer
+    # share a path. Datasets not used for `ttl` seconds, and the least
+    # recently used ones beyond max_datasets, are deleted from disk by
+    # collect(); on_evict(dataset) is called for each so in-memory caches
+    # can drop it too. Folders left behind by an earlier run are unknown
+    # ids and are deleted once their modification time is past the ttl.
+    # A dataset pinned by queued or running jobs is never collected, and
+    # removing it only hides it until the last pin is released.
+    def __init__(self, root, ttl=DEFAULT_TTL, max_datasets=DEFAULT_MAX_DATASETS, on_evict=None):
+        self.root = root
+        self.ttl = ttl
+        self.max_datasets = max_datasets
+        self.on_evict = on_evict
+        self.datasets = {}
+        self.lock = threading.Lock()
+        self.last_collect = 0
+
+    def create(self, filename):
+        dataset_id = uuid.uuid4().hex
+        dataset = Dataset(dataset_id, filename, os.path.join(self.root, dataset_id))
+        os.makedirs(dataset.folder, exist_ok=True)
+        with self.lock:
+            self.datasets[dataset_id] = dataset
+        return dataset
+
+    def get(self, dataset_id):
+        with self.lock:
+            dataset = self.datasets.get(dataset_id)
+            if dataset is None or dataset.removed:
+                return None
+            dataset.last_used = time.time()
+            return dataset
+
+    def remove(self, dataset_id):
+        with self.lock:
+            dataset = self.datasets.get(dataset_id)
+            if dataset is None or dataset.removed:
+                return False
+            dataset.removed = True
+            if dataset.pins:
+                return True
+            del self.datasets[dataset_id]
+        self.delete(dataset)
+        return True
+
+    def pin(self, dataset):
+        with self.lock:
+            dataset.pins += 1
+
+    def unpin(self, dataset):
+        # The dataset counts as used until its last job ends
+        with self.lock:
+            dataset.pins -= 1
+            dataset.last_used = time.time()
+            deleted = dataset.removed and not dataset.pins
+            if deleted:
+                self.datasets.pop(dataset.id, None)
+        if deleted:
+            self.delete(dataset)
+
+    def delete(self, dataset):
+        if self.on_evict is not None:
+            self.on_evict(dataset)
+        shutil.rmtree(dataset.folder, ignore_errors=True)
+
+    def collect(self, force=False):
+        # Runs a collection pass at most every COLLECT_INTERVAL seconds unless
+        # forced. Returns whether a pass ran.
+        now = time.time()
+        with self.lock:
+            if not force and now - self.last_collect < COLLECT_INTERVAL:
+                return False
+            self.last_collect = now
+            by_use = sorted((dataset for dataset in self.datasets.values() if not dataset.pins),
+                            key=lambda dataset: dataset.last_used)
+            expired = [dataset for dataset in by_use if now - dataset.last_used > self.ttl]
+            kept = [dataset for dataset in by_use if now - dataset.last_used <= self.ttl]
+            expired += kept[:max(len(self.datasets) - len(expired) - self.max_datasets, 0)]
+            for dataset in expired:
+                del self.datasets[dataset.id]
+            known = set(self.datasets)
+        for dataset in expired:
+            self.delete(dataset)
+        self.remove_orphans(known, now)
+        return True
+
+    def remove_orphans(self, known, now):
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            folder = os.path.join(self.root, name)
+            if name in known or not DATASET_ID.fullmatch(name):
+                continue
+            try:
+                if now - os.path.getmtime(folder) <= self.ttl:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(folder, ignore_errors=True)
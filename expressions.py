@@ -0,0 +1,289 @@
+from predicates import (
+    CACHED_VIEW_DISCOUNT, CONDITION_COST, CONDITION_SELECTIVITY, cell_text, compile_condition, frame_views,
+    is_active, match_all, match_none, resolve_condition,
+)
+
+LIST_CONDITIONS = {"in", "not in"}  # the value is a list, or text separated by commas
+
+
+# Filter expressions. A request's "filters" is either the usual list of
+# [column, condition, value] triples, all of which must match, or a tree:
+#   {"and": [...]}, {"or": [...]}, {"not": expression}
+#   {"column": ..., "condition": ..., "value": ...} or [column, condition, value]
+# "in" and "not in" take a list of values. Conditions without a value are
+# left out, as in the filter rows of both UIs; an unknown condition is an
+# error.
+#
+# Every node can be evaluated on a parsed row (compile) or on a DataFrame
+# (mask). Groups order their children with the planner estimates from
+# predicates.py each time they are evaluated: cheap and selective
+# conditions first within "and", likely matches first within "or", and a
+# column view the FrameStore has already built makes a condition cheaper.
+# Masks are numpy arrays; `rows` limits a node to the rows still
+# undecided, so within "and" each child only tests the rows all earlier
+# ones passed and within "or" the rows no earlier one matched. key()
+# identifies an expression for caching what it matched.
+
+class Condition:
+    def __init__(self, column, code, value):
+        self.column = column
+        self.code = code
+        self.value = value  # frozenset of texts for "in" and "not in"
+
+    def cost(self, store=None):
+        return CONDITION_COST[self.code] * (CACHED_VIEW_DISCOUNT if self.cached(store) else 1)
+
+    def selectivity(self):
+        if self.code in LIST_CONDITIONS:
+            share = min(CONDITION_SELECTIVITY["=="] * len(self.value), 1)
+            return share if self.code == "in" else 1 - share
+        return CONDITION_SELECTIVITY[self.code]
+
+    def cached(self, store):
+        if store is None or self.column not in store.df.columns:
+            return False
+        return store.has_view(self.column, "==" if self.code in LIST_CONDITIONS else self.code)
+
+    def key(self):
+        return self.column, self.code, self.value
+
+    def as_filters(self):
+        if self.code in LIST_CONDITIONS:
+            return None
+        return [(self.column, self.code, self.value)]
+
+    def compile(self, header):
+        header = list(header)
+        if self.column not in header:
+            return match_none
+        idx = header.index(self.column)
+        if self.code == "in":
+            values = self.value
+            test = lambda cell: cell_text(cell) in values
+        elif self.code == "not in":
+            values = self.value
+            test = lambda cell: cell_text(cell) not in values
+        else:
+            test = compile_condition(self.code, self.value)
+        # A cell missing from a short row fails the condition
+        return lambda row: idx < len(row) and test(row[idx])
+
+    def mask(self, df, views, store=None, rows=None):
+        import numpy as np
+
+        if self.column not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        view = views(self.column)
+        if self.code in LIST_CONDITIONS:
+            text = view.text() if rows is None else view.text()[rows]
+            hits = text.isin(self.value).to_numpy()
+            if self.code == "not in":
+                hits = ~hits
+        else:
+            hits = view.mask(self.code, self.value, rows).to_numpy(dtype=bool)
+        if rows is None:
+            return hits
+        mask = np.zeros(len(df), dtype=bool)
+        mask[rows] = hits
+        return mask
+
+
+class Group:
+    def __init__(self, children):
+        self.children = children
+
+    def ordered(self, store=None):
+        return sorted(self.children, key=lambda child: -self.rank(child, store))
+
+    def cost(self, store=None):
+        return sum(child.cost(store) for child in self.children)
+
+    def key(self):
+        return type(self).__name__, tuple(child.key() for child in self.children)
+
+
+class AllOf(Group):
+    def rank(self, child, store):
+        return (1 - child.selectivity()) / child.cost(store)
+
+    def selectivity(self):
+        share = 1
+        for child in self.children:
+            share *= child.selectivity()
+        return share
+
+    def as_filters(self):
+        filters = []
+        for child in self.ordered():
+            if not isinstance(child, Condition) or child.as_filters() is None:
+                return None
+            filters.extend(child.as_filters())
+        return filters
+
+    def compile(self, header):
+        tests = [child.compile(header) for child in self.ordered()]
+        if not tests:
+            return match_all
+        return lambda row: all(test(row) for test in tests)
+
+    def mask(self, df, views, store=None, rows=None):
+        mask = rows
+        for child in self.ordered(store):
+            mask = child.mask(df, views, store, mask)
+            if not mask.any():
+                break
+        return mask
+
+
+class AnyOf(Group):
+    def rank(self, child, store):
+        return child.selectivity() / child.cost(store)
+
+    def selectivity(self):
+        share = 1
+        for child in self.children:
+            share *= 1 - child.selectivity()
+        return 1 - share
+
+    def as_filters(self):
+        if len(self.children) == 1:
+            return self.children[0].as_filters()
+        return None
+
+    def compile(self, header):
+        tests = [child.compile(header) for child in self.ordered()]
+        return lambda row: any(test(row) for test in tests)
+
+    def mask(self, df, views, store=None, rows=None):
+        mask = None
+        remaining = rows
+        for child in self.ordered(store):
+            hits = child.mask(df, views, store, remaining)
+            mask = hits if mask is None else mask | hits
+            remaining = ~mask if rows is None else rows & ~mask
+            if not remaining.any():
+                break
+        return mask
+
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def cost(self, store=None):
+        return self.child.cost(store)
+
+    def selectivity(self):
+        return 1 - self.child.selectivity()
+
+    def key(self):
+        return 'Not', self.child.key()
+
+    def as_filters(self):
+        return None
+
+    def compile(self, header):
+        test = self.child.compile(header)
+        return lambda row: not test(row)
+
+    def mask(self, df, views, store=None, rows=None):
+        mask = ~self.child.mask(df, views, store, rows)
+        return mask if rows is None else mask & rows
+
+
+class Expression:
+    # A parsed "filters" value; root is None when no condition is set
+    def __init__(self, root):
+        self.root = root
+
+    def is_empty(self):
+        return self.root is None
+
+    def key(self):
+        return None if self.root is None else self.root.key()
+
+    def as_filters(self):
+        # The same filter as [(column, code, value)] triples that must all
+        # match, in planned order, or None when it needs the full evaluator.
+        # Triples can use the byte-level scans and on-disk indexes.
+        if self.root is None:
+            return []
+        return self.root.as_filters()
+
+    def compile(self, header):
+        return match_all if self.root is None else self.root.compile(header)
+
+    def mask(self, df, store=None, search=True):
+        # Boolean Series over df. `store` is the FrameStore of df, whose
+        # numeric views are used and kept, as are its text indexes when
+        # `search` is set
+        import pandas as pd
+
+        if self.root is None:
+            return pd.Series(True, index=df.index)
+        views = frame_views(df, store and store.numeric, store.search if store and search else None)
+        return pd.Series(self.root.mask(df, views, store), index=df.index)
+
+
+def parse_filters(spec):
+    # Returns an Expression for a "filters" value, raising ValueError when
+    # it is malformed
+    if isinstance(spec, Expression):
+        return spec
+    if spec is None:
+        return Expression(None)
+    if not isinstance(spec, (list, tuple, dict)):
+        raise ValueError('Filters must be a list or an expression object')
+    return Expression(parse_node(spec))
+
+
+def parse_node(spec):
+    if isinstance(spec, (list, tuple)):
+        if is_triple(spec):
+            return parse_condition(*spec)
+        return group(AllOf, [parse_node(item) for item in spec])
+    if not isinstance(spec, dict):
+        raise ValueError(f'Invalid filter: {spec!r}')
+    if 'column' in spec:
+        return parse_condition(spec['column'], spec.get('condition'), spec.get('value'))
+    if len(spec) != 1:
+        raise ValueError(f'A filter group needs exactly one of "and", "or" or "not": {spec!r}')
+    (key, value), = spec.items()
+    if key in ('and', 'or'):
+        if not isinstance(value, (list, tuple)):
+            raise ValueError(f'"{key}" takes a list of filters')
+        return group(AllOf if key == 'and' else AnyOf, [parse_node(item) for item in value])
+    if key == 'not':
+        child = parse_node(value)
+        return None if child is None else Not(child)
+    raise ValueError(f'Unknown filter group "{key}"')
+
+
+def is_triple(spec):
+    return len(spec) == 3 and not any(isinstance(item, dict) for item in spec) and \
+        not isinstance(spec[0], (list, tuple)) and not isinstance(spec[1], (list, tuple))
+
+
+def group(kind, children):
+    children = [child for child in children if child is not None]
+    if not children:
+        return None
+    return children[0] if len(children) == 1 else kind(children)
+
+
+def parse_condition(column, condition, value):
+    code = condition if condition in LIST_CONDITIONS else resolve_condition(condition)
+    if condition and not code:
+        raise ValueError(f'Unknown condition "{condition}"')
+    if code in LIST_CONDITIONS:
+        if isinstance(value, str):
+            value = value.split(',')
+        elif not isinstance(value, (list, tuple)):
+            raise ValueError(f'"{code}" takes a list of values')
+        values = frozenset(text for text in (cell_text(item).strip() for item in value) if text)
+        return Condition(column, code, values) if values else None
+    if isinstance(value, (list, tuple, dict)):
+        raise ValueError(f'"{condition}" takes a single value')
+    if not is_active(code, value):
+        return None
+    return Condition(column, code, cell_text(value).strip())
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = 2
+DEFAULT_RETENTION = 60 * 60  # seconds a finished job and its result are kept
+DEFAULT_MAX_JOBS = 100  # finished jobs kept at most, oldest evicted first
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    # One filter or update run in the background. The task reports progress
+    # through update(), which is also where a cancelled job stops: the next
+    # progress report raises JobCancelled.
+    def __init__(self, job_id, kind, download_name, result_path):
+        self.id = job_id
+        self.kind = kind
+        self.download_name = download_name
+        self.result_path = result_path
+        self.status = 'queued'
+        self.error = None
+        self.created = time.time()
+        self.started = self.finished = None
+        self.total_rows = None  # estimate of the rows to scan, when known
+        self.rows_scanned = 0
+        self.matches = 0
+        self.cancelled = False
+        self.future = None
+
+    def update(self, rows_scanned=None, matches=None):
+        # rows_scanned=None means the whole file was scanned in one go
+        if self.cancelled:
+            raise JobCancelled()
+        if rows_scanned is None:
+            rows_scanned = max(self.rows_scanned, self.total_rows or 0)
+        self.rows_scanned = rows_scanned
+        if matches is not None:
+            self.matches = matches
+
+    @property
+    def done(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def eta(self):
+        # Seconds left, extrapolated from the scan rate so far
+        if self.status != 'running' or not self.rows_scanned or not self.total_rows:
+            return None
+        elapsed = time.time() - self.started
+        remaining = max(self.total_rows - self.rows_scanned, 0)
+        return round(elapsed * remaining / self.rows_scanned, 1)
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'type': self.kind,
+            'status': self.status,
+            'rows_scanned': self.rows_scanned,
+            'matches': self.matches,
+            'total_rows': self.total_rows,
+            'eta': self.eta(),
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    # Runs jobs on a fixed pool of worker threads, so at most max_workers
+    # scans run at once and further jobs wait their turn. Results are
+    # written to files in `folder`; finished jobs are evicted together with
+    # their result once they are older than `retention` seconds, or oldest
+    # first when more than max_jobs are kept.
+    def __init__(self, folder, max_workers=DEFAULT_WORKERS, retention=DEFAULT_RETENTION,
+                 max_jobs=DEFAULT_MAX_JOBS):
+        self.folder = folder
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+
+    def submit(self, kind, download_name, task, *args):
+        # Queues task(job, *args); the task writes its output to
+        # job.result_path and reports progress through job.update()
+        self.evict()
+        os.makedirs(self.folder, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        job = Job(job_id, kind, download_name, os.path.join(self.folder, f'{job_id}_{download_name}'))
+        with self.lock:
+            self.jobs[job_id] = job
+        job.future = self.executor.submit(self.run, job, task, args)
+        return job
+
+    def run(self, job, task, args):
+        if job.cancelled:
+            return
+        job.status = 'running'
+        job.started = time.time()
+        try:
+            task(job, *args)
+            if job.cancelled:
+                raise JobCancelled()  # discarded after its last progress report
+            job.status = 'done'
+        except JobCancelled:
+            job.status = 'cancelled'
+            remove_file(job.result_path)
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            remove_file(job.result_path)
+        finally:
+            job.finished = time.time()
+
+    def get(self, job_id):
+        self.evict()
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def discard(self, job_id):
+        # Cancels a queued or running job and deletes its result
+        with self.lock:
+            job = self.jobs.pop(job_id, None)
+        if job is None:
+            return False
+        job.cancelled = True
+        if job.future is not None and job.future.cancel():
+            job.status = 'cancelled'
+        elif job.done:
+            remove_file(job.result_path)
+        return True
+
+    def evict(self):
+        now = time.time()
+        with self.lock:
+            finished = sorted((job for job in self.jobs.values() if job.done and job.finished),
+                              key=lambda job: job.finished)
+            expired = [job for job in finished if now - job.finished > self.retention]
+            excess = len(finished) - len(expired) - self.max_jobs
+            if excess > 0:
+                expired += [job for job in finished if job not in expired][:excess]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            remove_file(job.result_path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
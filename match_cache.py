@@ -0,0 +1,36 @@
+import threading
+from collections import OrderedDict
+
+from predicates import refines
+
+DEFAULT_MAX_FILES = 4
+
+
+class MatchCache:
+    # The complete set of matches for the last filter state of each file,
+    # kept so that a tightened filter (an added condition, a longer contains
+    # value, a stricter bound) only re-tests the previous survivors. Keys
+    # name the file version and what the matches are (row numbers of a
+    # cached store or byte offsets of CSV records).
+    def __init__(self, max_files=DEFAULT_MAX_FILES):
+        self.max_files = max_files
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def base(self, key, tests):
+        # Matches to narrow down for `tests`, or None when they are not a
+        # refinement of the remembered state and everything must be scanned
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None or not refines(tests, entry[0]):
+            return None
+        return entry[1]
+
+    def remember(self, key, tests, matches):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (tests, matches)
+            while len(self.entries) > self.max_files:
+                self.entries.popitem(last=False)
@@ -0,0 +1,207 @@
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+
+from predicates import cell_text, compile_filters, is_active, resolve_condition
+from records import ENCODING, fill_row, is_blank, parse_record, read_header
+
+CHECK_EVERY = 10000
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+def byte_predicates(header, filters):
+    # Works out what can be tested on the raw bytes of a record before it is
+    # decoded. Returns (anchor, needles):
+    #   anchor  - bytes every matching record must contain verbatim
+    #             (== values and contains needles without cased letters)
+    #   needles - lowercased bytes every matching record must contain once
+    #             the record is ASCII-lowercased (other contains needles)
+    # Values with quotes are skipped because CSV escapes them on disk, and
+    # so are non-ASCII contains needles: str.lower() folds some non-ASCII
+    # letters to ASCII ones (the Kelvin sign to "k"), which bytes.lower()
+    # cannot follow. For the same reason needles are only tested on ASCII
+    # records.
+    anchors = []
+    needles = []
+    for col, condition, value in filters:
+        if not is_active(condition, value) or col not in header:
+            continue
+        code = resolve_condition(condition)
+        value = cell_text(value).strip()
+        if '"' in value:
+            continue
+        if code == "==":
+            anchors.append(value.encode(ENCODING))
+        elif code == "contains" and value.isascii():
+            needle = value.lower()
+            if needle == needle.upper():
+                anchors.append(needle.encode(ENCODING))
+            else:
+                needles.append(needle.encode(ENCODING))
+    anchor = max(anchors, key=len) if anchors else None
+    return anchor, needles
+
+
+def byte_filter(header, filters):
+    # A test on raw record bytes that every matching record passes, built
+    # from byte_predicates, or None when no condition can be checked
+    anchor, needles = byte_predicates(header, filters)
+    if anchor is None and not needles:
+        return None
+
+    def test(data):
+        if anchor is not None and anchor not in data:
+            return False
+        if needles and data.isascii():
+            lowered = data.lower()
+            return all(needle in lowered for needle in needles)
+        return True
+    return test
+
+
+def mmap_scan(path, filters, require_anchor=False, within=None, cancelled=None, pad=False):
+    # Filters a CSV file through a read-only memory map, decoding only the
+    # records that pass the byte-level checks. Returns (header, matches)
+    # where matches lazily yields (byte offset, row) for the matching
+    # records in file order, or None when no condition can be checked on
+    # raw bytes (or there is no anchor and require_anchor is set). `within`,
+    # an ascending array of record offsets, limits the records that are
+    # parsed and tested. The matches stop early once cancelled() is true.
+    # With pad set, records are tested and yielded as pandas reads them:
+    # blank ones are skipped and short ones padded to the header width.
+    # Iterating raises records.RecordError when a candidate record was cut
+    # out differently than csv.reader would read it.
+    header, start = read_header(path)
+    anchor, needles = byte_predicates(header, filters)
+    if anchor is None and (require_anchor or not needles):
+        return None
+    return header, scan_matches(path, start, header, filters, anchor, needles, within, cancelled, pad)
+
+
+def scan_matches(path, start, header, filters, anchor, needles, within, cancelled, pad):
+    if os.path.getsize(path) <= start:
+        return
+    matches = compile_filters(header, filters)
+    search = anchor if anchor is not None else max(needles, key=len)
+    position = 0  # search start in `within`; hits come in file order
+    with open(path, 'rb') as infile:
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for checked, (offset, data) in enumerate(candidate_records(mm, start, search, anchor is None)):
+                if cancelled is not None and checked % CHECK_EVERY == 0 and cancelled():
+                    return
+                if anchor is not None and anchor not in data:
+                    continue
+                if needles and data.isascii():
+                    lowered = data.lower()
+                    if not all(needle in lowered for needle in needles):
+                        continue
+                if within is not None:
+                    position = bisect_left(within, offset, position)
+                    if position == len(within) or within[position] != offset:
+                        continue
+                if pad and is_blank(data):
+                    continue
+                row = parse_record(data)
+                if pad:
+                    row = fill_row(row, len(header))
+                if matches(row):
+                    yield offset, row
+
+
+def mmap_filter(path, filters, max_records=None, cancelled=None, require_anchor=False, offsets=False,
+                within=None, pad=False):
+    # mmap_scan collected into (header, rows), or (header, None) when
+    # cancelled. With offsets=True the rows are replaced by an array of the
+    # byte offsets of the matching records.
+    scan = mmap_scan(path, filters, require_anchor, within, cancelled, pad)
+    if scan is None:
+        return None
+    header, matches = scan
+    rows = array('q') if offsets else []
+    for offset, row in matches:
+        rows.append(offset if offsets else row)
+        if max_records is not None and len(rows) >= max_records:
+            break
+    if cancelled is not None and cancelled():
+        return header, None
+    return header, rows
+
+
+def iter_blocks(mm, start):
+    # Slices the map into (offset, block) pairs, blocks of about BLOCK_SIZE
+    # that end on a record boundary: the cut is moved to the first newline
+    # after which the block's quote count is even, so no quoted field
+    # spans two blocks
+    position = start
+    size = len(mm)
+    while position < size:
+        end = min(position + BLOCK_SIZE, size)
+        block = mm[position:end]
+        if end < size:
+            quotes = block.count(b'"')
+            while True:
+                newline = mm.find(b'\n', end)
+                piece = mm[end:] if newline == -1 else mm[end:newline + 1]
+                block += piece
+                end += len(piece)
+                quotes += piece.count(b'"')
+                if newline == -1 or quotes % 2 == 0:
+                    break
+        yield position, block
+        position = end
+
+
+def record_end(block, start, position):
+    # First record boundary after `position`, given `start` is a boundary
+    quotes = block.count(b'"', start, position)
+    while True:
+        newline = block.find(b'\n', position)
+        if newline == -1:
+            return len(block)
+        quotes += block.count(b'"', position, newline)
+        if quotes % 2 == 0:
+            return newline + 1
+        position = newline + 1
+
+
+def record_start(block, start, position):
+    # Last record boundary at or before `position`, given `start` is one
+    newline = block.rfind(b'\n', start, position)
+    while newline != -1:
+        if block.count(b'"', start, newline + 1) % 2 == 0:
+            return newline + 1
+        newline = block.rfind(b'\n', start, newline)
+    return start
+
+
+def candidate_records(mm, start, search, lowercase):
+    # Yields (byte offset, raw record) for the records containing `search`
+    # (in the ASCII-lowercased block when `lowercase` is set). Hits are
+    # found with find() over whole blocks and only the record around each
+    # hit is cut out; quote parity is counted from the previous record
+    # boundary so quoted newlines stay inside their record. Lowercased
+    # searches cannot rule out records with non-ASCII text, so every
+    # record of a block that has any is yielded.
+    for position, block in iter_blocks(mm, start):
+        if lowercase and not block.isascii():
+            yield from block_records(block, position)
+            continue
+        haystack = block.lower() if lowercase else block
+        boundary = 0
+        while True:
+            hit = haystack.find(search, boundary)
+            if hit == -1:
+                break
+            begin = record_start(block, boundary, hit)
+            boundary = record_end(block, begin, hit)
+            yield position + begin, block[begin:boundary]
+
+
+def block_records(block, position):
+    # Every record of a block that starts and ends on record boundaries
+    begin = 0
+    while begin < len(block):
+        end = record_end(block, begin, begin)
+        yield position + begin, block[begin:end]
+        begin = end
@@ -0,0 +1,211 @@
+import atexit
+import os
+import threading
+from array import array
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from predicates import compile_filters
+from records import iter_frame_rows, iter_rows, iter_rows_with_offsets, read_header
+
+MIN_PARALLEL_BYTES = 64 * 1024 * 1024  # smaller files are faster to scan in-process
+BLOCK_SIZE = 16 * 1024 * 1024
+RANGES_PER_WORKER = 4
+MAX_RANGE_BYTES = 16 * 1024 * 1024  # the matches of one range are held in memory at once
+PENDING_PER_WORKER = 2  # ranges scanned ahead of the consumer
+
+pool = None  # shared by every scan, see shared_pool()
+pool_lock = threading.Lock()
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def shared_pool():
+    # One process pool for the whole program, started by the first scan
+    # and sized to the CPUs. Scans running at the same time share its
+    # processes instead of each starting their own.
+    global pool
+    with pool_lock:
+        if pool is None:
+            pool = Pool(default_workers())
+            atexit.register(pool.terminate)
+        return pool
+
+
+def should_scan_in_parallel(path, workers=None):
+    return (workers or default_workers()) > 1 and os.path.getsize(path) >= MIN_PARALLEL_BYTES
+
+
+def split_ranges(path, parts):
+    # Splits the data rows of a CSV file into about `parts` byte ranges that
+    # start and end on record boundaries. Quotes are counted from the first
+    # data row so a newline inside a quoted field is never used as a cut.
+    header, start = read_header(path)
+    size = os.path.getsize(path)
+    if parts <= 1 or size - start < parts:
+        return header, [(start, size)]
+
+    step = (size - start) // parts
+    targets = [start + step * i for i in range(1, parts)]
+    cuts = [start]
+    quotes = 0
+    position = start
+    with open(path, 'rb') as infile:
+        infile.seek(start)
+        for target in targets:
+            if target <= cuts[-1]:
+                continue
+            # Quote parity up to the target...
+            while position < target:
+                block = infile.read(min(BLOCK_SIZE, target - position))
+                if not block:
+                    break
+                quotes += block.count(b'"')
+                position += len(block)
+            # ...then forward to the first newline outside a quoted field
+            while True:
+                line = infile.readline()
+                if not line:
+                    break
+                quotes += line.count(b'"')
+                position += len(line)
+                if line.endswith(b'\n') and quotes % 2 == 0:
+                    break
+            if position >= size:
+                break
+            cuts.append(position)
+    cuts.append(size)
+    return header, [(a, b) for a, b in zip(cuts, cuts[1:]) if a < b]
+
+
+def scan_range(task):
+    # mode is "rows", "count" or "offsets" (byte offsets of the matches).
+    # With pad set, records are tested as pandas reads them: blank ones
+    # are skipped and short ones padded to the header width.
+    path, start, end, header, filters, limit, mode, pad = task
+    matches = compile_filters(header, filters)
+    if pad:
+        return scan_frame_rows(iter_frame_rows(path, start, end, len(header)), matches, limit, mode)
+    if mode == "count":
+        return sum(1 for row in iter_rows(path, start, end) if matches(row))
+    if mode == "offsets":
+        offsets = array('q')
+        for offset, row in iter_rows_with_offsets(path, start, end):
+            if matches(row):
+                offsets.append(offset)
+                if limit is not None and len(offsets) >= limit:
+                    break
+        return offsets
+    rows = []
+    for row in iter_rows(path, start, end):
+        if matches(row):
+            rows.append(row)
+            if limit is not None and len(rows) >= limit:
+                break
+    return rows
+
+
+def scan_frame_rows(rows, matches, limit, mode):
+    if mode == "count":
+        return sum(1 for _, row in rows if matches(row))
+    found = array('q') if mode == "offsets" else []
+    for offset, row in rows:
+        if matches(row):
+            found.append(offset if mode == "offsets" else row)
+            if limit is not None and len(found) >= limit:
+                break
+    return found
+
+
+def scan_ranges(path, filters, max_records, workers, mode, pad=False):
+    # Returns (header, results) where results lazily yields the result of
+    # each range in file order. Ranges are at most MAX_RANGE_BYTES and only
+    # PENDING_PER_WORKER ranges per worker are scanned ahead of the
+    # consumer, so memory stays bounded however big the file is. That is
+    # also all a scan has queued on the shared pool at any time.
+    workers = min(workers or default_workers(), default_workers())
+    parts = max(workers * RANGES_PER_WORKER, os.path.getsize(path) // MAX_RANGE_BYTES)
+    header, ranges = split_ranges(path, parts)
+    tasks = [(path, start, end, header, filters, max_records, mode, pad) for start, end in ranges]
+    return header, range_results(tasks, workers)
+
+
+def range_results(tasks, workers):
+    # Once the generator is closed no further ranges are queued; the few
+    # already pending finish in the pool and are dropped
+    pool = shared_pool()
+    tasks = iter(tasks)
+    pending = deque()
+    while True:
+        for task in tasks:
+            pending.append(pool.apply_async(scan_range, (task,)))
+            if len(pending) >= workers * PENDING_PER_WORKER:
+                break
+        if not pending:
+            return
+        yield pending.popleft().get()
+
+
+def run_scan(path, filters, max_records, workers, mode, cancelled, pad=False):
+    header, results = scan_ranges(path, filters, max_records, workers, mode, pad)
+    found = 0
+    collected = []
+    try:
+        for result in results:
+            if cancelled is not None and cancelled():
+                return header, None
+            collected.append(result)
+            found += result if mode == "count" else len(result)
+            if max_records is not None and found >= max_records:
+                break
+    finally:
+        results.close()
+    return header, collected
+
+
+def parallel_scan(path, filters, max_records=None, workers=None, pad=False):
+    # Returns (header, rows) where rows lazily yields the matching rows in
+    # file order, at most max_records of them. pad is as for scan_range.
+    header, results = scan_ranges(path, filters, max_records, workers, "rows", pad)
+    rows = (row for chunk in results for row in chunk)
+    return header, rows if max_records is None else islice(rows, max_records)
+
+
+def parallel_filter(path, filters, max_records=None, workers=None, cancelled=None):
+    # Returns (header, rows) in file order, or None if cancelled
+    header, results = run_scan(path, filters, max_records, workers, "rows", cancelled)
+    if results is None:
+        return None
+    rows = [row for chunk in results for row in chunk]
+    if max_records is not None:
+        rows = rows[:max_records]
+    return header, rows
+
+
+def parallel_count(path, filters, max_records=None, workers=None, cancelled=None):
+    # Returns the number of matching rows (capped at max_records), or None
+    # if cancelled
+    header, results = run_scan(path, filters, max_records, workers, "count", cancelled)
+    if results is None:
+        return None
+    count = sum(results)
+    if max_records is not None:
+        count = min(count, max_records)
+    return count
+
+
+def parallel_offsets(path, filters, max_records=None, workers=None, cancelled=None, pad=False):
+    # Returns (header, array of the byte offsets of the matching records) in
+    # file order, or None if cancelled
+    header, results = run_scan(path, filters, max_records, workers, "offsets", cancelled, pad)
+    if results is None:
+        return None
+    offsets = array('q')
+    for chunk in results:
+        offsets.extend(chunk)
+    if max_records is not None:
+        del offsets[max_records:]
+    return header, offsets
@@ -0,0 +1,266 @@
+import operator
+
+CONDITIONS = [
+    ("", ""),  # No filter
+    ("==", "Equals"),
+    (">", "Greater than"),
+    ("<", "Less than"),
+    (">=", "Greater or equal"),
+    ("<=", "Less or equal"),
+    ("contains", "Contains"),
+    ("not contains", "Not contains"),
+]
+
+CONDITION_CODES = {code for code, label in CONDITIONS}
+CONDITION_LABELS = {label: code for code, label in CONDITIONS}
+
+NUMERIC_OPERATORS = {
+    ">": operator.gt,
+    "<": operator.lt,
+    ">=": operator.ge,
+    "<=": operator.le,
+}
+
+# Planner estimates: relative cost of testing one cell, and the share of
+# cells expected to pass. "in" and "not in" only occur in expressions.
+CONDITION_COST = {"==": 1, "in": 1, "not in": 1, ">": 2, "<": 2, ">=": 2, "<=": 2,
+                  "contains": 4, "not contains": 4}
+CONDITION_SELECTIVITY = {"==": 0.05, "in": 0.2, "not in": 0.8, ">": 0.4, "<": 0.4, ">=": 0.4, "<=": 0.4,
+                         "contains": 0.2, "not contains": 0.8}
+CACHED_VIEW_DISCOUNT = 0.25  # cost factor when the column view a test needs is already built
+
+
+def resolve_condition(condition):
+    # The Tk GUI passes combobox labels, the web UI passes codes
+    if condition in CONDITION_CODES:
+        return condition
+    return CONDITION_LABELS.get(condition, "")
+
+
+def cell_text(value):
+    return "" if value is None else str(value)
+
+
+def match_all(row):
+    return True
+
+
+def match_none(row):
+    return False
+
+
+def is_active(condition, value):
+    return bool(resolve_condition(condition) and cell_text(value).strip())
+
+
+def condition_rank(code, cached=False):
+    # Share of rows a test rules out per unit of cost; conditions are
+    # evaluated highest rank first so cheap, selective ones narrow the
+    # rows before expensive ones run
+    cost = CONDITION_COST.get(code, 1) * (CACHED_VIEW_DISCOUNT if cached else 1)
+    return (1 - CONDITION_SELECTIVITY.get(code, 0.5)) / cost
+
+
+def compile_condition(condition, value):
+    if not is_active(condition, value):
+        return None
+    code = resolve_condition(condition)
+    value = cell_text(value).strip()
+
+    if code == "==":
+        return lambda cell: cell_text(cell) == value
+
+    if code in NUMERIC_OPERATORS:
+        op = NUMERIC_OPERATORS[code]
+        try:
+            bound = float(value)
+        except ValueError:
+            return match_none
+
+        def test(cell):
+            try:
+                return op(float(cell), bound)
+            except (TypeError, ValueError):
+                return False
+        return test
+
+    needle = value.lower()
+    if code == "contains":
+        return lambda cell: needle in cell_text(cell).lower()
+    return lambda cell: needle not in cell_text(cell).lower()
+
+
+def compile_filters(header, filters):
+    header = list(header)
+    tests = []
+    for col, condition, value in filters:
+        test = compile_condition(condition, value)
+        if test is None:
+            continue
+        if col not in header:
+            return match_none
+        tests.append((condition_rank(resolve_condition(condition)), header.index(col), test))
+
+    if not tests:
+        return match_all
+    tests = [(idx, test) for _, idx, test in sorted(tests, key=lambda entry: -entry[0])]
+
+    def matches(row):
+        try:
+            for idx, test in tests:
+                if not test(row[idx]):
+                    return False
+        except IndexError:
+            return False
+        return True
+    return matches
+
+
+def filter_tests(header, filters):
+    # Active conditions as (column index, code, value), or None when one
+    # names a column the file does not have, so that nothing can match
+    header = list(header)
+    tests = []
+    for col, condition, value in filters:
+        if not is_active(condition, value):
+            continue
+        if col not in header:
+            return None
+        tests.append((header.index(col), resolve_condition(condition), cell_text(value).strip()))
+    return tests
+
+
+def implies(new, old):
+    # Whether every cell passing test `new` also passes test `old`; both are
+    # (column index, code, value) as returned by filter_tests
+    idx, code, value = new
+    old_idx, old_code, old_value = old
+    if idx != old_idx:
+        return False
+    if (code, value) == (old_code, old_value):
+        return True
+    if code == "==":
+        # Only cells whose text is `value` pass, so test that text itself
+        return compile_condition(old_code, old_value)(value)
+    if code in NUMERIC_OPERATORS and old_code in NUMERIC_OPERATORS:
+        try:
+            bound = float(value)
+        except ValueError:
+            return True  # a non-numeric bound matches nothing
+        try:
+            old_bound = float(old_value)
+        except ValueError:
+            return False
+        if code[0] != old_code[0]:
+            return False
+        strict = code in (">", "<") or old_code in (">=", "<=")
+        if code[0] == ">":
+            return bound > old_bound or (bound == old_bound and strict)
+        return bound < old_bound or (bound == old_bound and strict)
+    if code == old_code == "contains":
+        return old_value.lower() in value.lower()
+    if code == old_code == "not contains":
+        return value.lower() in old_value.lower()
+    return False
+
+
+def refines(tests, old_tests):
+    # Whether the rows passing `tests` are a subset of those passing
+    # `old_tests`: every old condition is implied by one of the new ones
+    if tests is None or old_tests is None:
+        return False
+    return all(any(implies(new, old) for new in tests) for old in old_tests)
+
+
+# --- pandas (vectorized) evaluation, used by app.py ---
+
+def series_text(series):
+    return series.where(series.notna(), "").astype(str)
+
+
+def numeric_series(series):
+    import pandas as pd
+    return pd.to_numeric(series_text(series).str.strip(), errors='coerce')
+
+
+class SeriesViews:
+    # Text, lowercase and numeric views of one column, each built at most
+    # once however many conditions test the column. `load_numbers` may
+    # return a pre-parsed numeric view of the same series, `load_search` a
+    # TextIndex of it kept for contains filters.
+    def __init__(self, series, load_numbers=None, load_search=None):
+        self.series = series
+        self.load_numbers = load_numbers
+        self.load_search = load_search
+        self.text_view = None
+        self.lower_view = None
+        self.numeric_view = None
+
+    def text(self):
+        if self.text_view is None:
+            self.text_view = series_text(self.series)
+        return self.text_view
+
+    def lower(self):
+        if self.lower_view is None:
+            self.lower_view = self.text().str.lower()
+        return self.lower_view
+
+    def numeric(self):
+        if self.numeric_view is None:
+            if self.load_numbers is not None:
+                self.numeric_view = self.load_numbers()
+            else:
+                self.numeric_view = numeric_series(self.series)
+        return self.numeric_view
+
+    def mask(self, code, value, rows=None):
+        # With `rows`, a boolean array, only those rows are tested and the
+        # mask covers just them
+        pick = (lambda view: view) if rows is None else (lambda view: view[rows])
+        if code == "==":
+            return pick(self.text()) == value
+
+        if code in NUMERIC_OPERATORS:
+            import pandas as pd
+            try:
+                bound = float(value)
+            except ValueError:
+                return pd.Series(False, index=pick(self.series).index)
+            return NUMERIC_OPERATORS[code](pick(self.numeric()), bound)
+
+        if self.load_search is not None:
+            import pandas as pd
+            mask = self.load_search().mask(value, negate=code == "not contains")
+            return pick(pd.Series(mask, index=self.series.index))
+        # Lowercasing only the rows tested, unless the whole column already is
+        if rows is None or self.lower_view is not None:
+            lower = pick(self.lower())
+        else:
+            lower = self.text()[rows].str.lower()
+        mask = lower.str.contains(value.lower(), regex=False)
+        if code == "not contains":
+            mask = ~mask
+        return mask
+
+
+def condition_mask(series, condition, value, numbers=None):
+    # `numbers` is an optional pre-parsed numeric view of the same series
+    if not is_active(condition, value):
+        return None
+    views = SeriesViews(series, None if numbers is None else lambda: numbers)
+    return views.mask(resolve_condition(condition), cell_text(value).strip())
+
+
+def frame_views(df, numeric=None, search=None):
+    # Returns views(col), creating one SeriesViews per column on first use;
+    # `numeric(col)` and `search(col)` may supply pre-built views
+    views = {}
+
+    def get(col):
+        if col not in views:
+            load_numbers = None if numeric is None else lambda: numeric(col)
+            load_search = None if search is None else lambda: search(col)
+            views[col] = SeriesViews(df[col], load_numbers, load_search)
+        return views[col]
+    return get
@@ -0,0 +1,169 @@
+import codecs
+import csv
+import re
+
+ENCODING = 'utf-8'
+TEXT_ENCODING = 'utf-8-sig'  # for whole files read as text; drops a leading BOM
+BATCH_SIZE = 10000
+
+# A record in which every quote opens, closes or doubles inside a quoted
+# field. Quote parity and csv.reader always agree on where such a record
+# ends, so it needs no further check.
+WELL_QUOTED = re.compile(rb'(?:"(?:[^"]|"")*"|[^,"\r\n]*)(?:,(?:"(?:[^"]|"")*"|[^,"\r\n]*))*\r?\n?')
+
+
+class RecordError(csv.Error):
+    # Records are cut from the raw bytes by quote parity. A literal quote in
+    # an unquoted field (x"y) makes csv.reader end a record somewhere else;
+    # the byte-level readers raise this and callers fall back to reading
+    # the file with csv.reader or pandas from the top
+    pass
+
+
+def read_record(infile):
+    # Reads one CSV record from a binary file positioned at a record start,
+    # following quoted fields across line breaks
+    record = infile.readline()
+    quotes = record.count(b'"')
+    while quotes % 2 and record.endswith(b'\n'):
+        line = infile.readline()
+        if not line:
+            break
+        record += line
+        quotes += line.count(b'"')
+    return record
+
+
+def parse_record(record):
+    # Parses one raw record. Strict parsing fails whenever the record does
+    # not end where csv.reader would end it: a line break outside quotes, a
+    # quoted field still open at the end, or text after a closing quote.
+    try:
+        return next(csv.reader([record.decode(ENCODING)], strict=True), [])
+    except csv.Error as e:
+        raise RecordError(f'Record cannot be read on its own: {e}') from None
+
+
+def check_record(record):
+    # Raises RecordError unless `record` can be read on its own
+    if b'"' in record and not WELL_QUOTED.fullmatch(record):
+        parse_record(record)
+
+
+def iter_records(path, start=0, end=None):
+    # Yields (byte offset, raw record bytes) for every record starting in
+    # [start, end); `start` must be a record boundary
+    with open(path, 'rb') as infile:
+        infile.seek(start)
+        offset = start
+        while end is None or offset < end:
+            record = read_record(infile)
+            if not record:
+                break
+            yield offset, record
+            offset += len(record)
+
+
+def parse_records(records):
+    # Turns an iterable of (offset, raw bytes) into (offset, row) pairs,
+    # decoding and parsing in batches to keep csv.reader overhead low
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) >= BATCH_SIZE:
+            yield from parse_batch(batch)
+            batch = []
+    if batch:
+        yield from parse_batch(batch)
+
+
+def parse_batch(batch):
+    # Every record must give exactly one row; a record csv.reader does not
+    # finish would otherwise swallow the next one
+    texts = [record.decode(ENCODING) for _, record in batch]
+    rows = csv.reader(texts, strict=True)
+    try:
+        for number, ((offset, _), row) in enumerate(zip(batch, rows), 1):
+            if rows.line_num != number:
+                raise RecordError(f'Record at byte {offset} does not end where csv.reader ends it')
+            yield offset, row
+    except RecordError:
+        raise
+    except csv.Error as e:
+        raise RecordError(f'Record cannot be read on its own: {e}') from None
+
+
+def iter_rows_with_offsets(path, start=0, end=None):
+    return parse_records(iter_records(path, start, end))
+
+
+def is_blank(record):
+    # pandas skips lines holding nothing but spaces and tabs. csv.reader
+    # gives them as [] or ['  '] but a quoted " " as [' '], which pandas
+    # keeps, so blank records are told apart by their bytes.
+    return not record.strip(b' \t\r\n')
+
+
+def fill_row(row, width):
+    # A record shorter than the header, padded with '' as pandas does
+    return row + [''] * (width - len(row)) if len(row) < width else row
+
+
+def iter_frame_rows(path, start=0, end=None, width=0):
+    # (offset, row) for the records pandas reads as data rows: blank
+    # records are skipped and short ones padded to `width`
+    records = ((offset, record) for offset, record in iter_records(path, start, end) if not is_blank(record))
+    return ((offset, fill_row(row, width)) for offset, row in parse_records(records))
+
+
+def iter_lines(path, start=0, end=None):
+    with open(path, 'rb') as infile:
+        infile.seek(start)
+        position = start
+        for line in infile:
+            if end is not None and position >= end:
+                break
+            position += len(line)
+            yield line.decode(ENCODING)
+
+
+def iter_rows(path, start=0, end=None):
+    # Rows of the records in [start, end) without their offsets; both ends
+    # must be record boundaries. A range that ends inside a quoted field,
+    # because an earlier literal quote shifted the boundaries, raises
+    # csv.Error instead of returning a cut-off row.
+    return csv.reader(iter_lines(path, start, end), strict=True)
+
+
+def read_header(path):
+    # Returns (header, offset of the first data row). Names are as written,
+    # without the byte order mark Excel puts in front of UTF-8 files.
+    with open(path, 'rb') as infile:
+        record = read_record(infile)
+    if not record:
+        return [], 0
+    length = len(record)
+    if record.startswith(codecs.BOM_UTF8):
+        record = record[len(codecs.BOM_UTF8):]
+    return parse_record(record), length
+
+
+def read_records_at(path, offsets):
+    # Yields (offset, raw record bytes) for ascending record offsets,
+    # seeking only across the gaps between them
+    with open(path, 'rb') as infile:
+        position = None
+        for offset in offsets:
+            if offset != position:
+                infile.seek(offset)
+            record = read_record(infile)
+            position = offset + len(record)
+            yield offset, record
+
+
+def read_rows_at(path, offsets):
+    with open(path, 'rb') as infile:
+        for offset in offsets:
+            infile.seek(offset)
+            record = read_record(infile)
+            yield parse_record(record)
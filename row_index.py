@@ -0,0 +1,99 @@
+from array import array
+from itertools import islice
+
+from dataset_cache import DatasetCache
+from records import check_record, is_blank, iter_records, parse_records, read_header, read_record
+from sidecar_index import file_stamp, load_or_build, read_index_file, sidecar_paths, write_index_file
+
+STRIDE = 64  # one byte offset is kept for every STRIDE data rows
+
+row_indexes = DatasetCache(max_bytes=128 * 1024 * 1024)
+
+
+class RowIndex:
+    # Sparse byte-offset index of the data rows of a CSV file. Row n is
+    # reached by seeking to checkpoints[n // stride] and skipping at most
+    # stride - 1 records, so any window can be read without rescanning
+    # from the top and the row count is known without touching the file.
+    # Blank records are not rows, as for pandas.
+    # Building raises records.RecordError for files whose records cannot
+    # be found by quote parity.
+    def __init__(self, checkpoints, count, stride=STRIDE):
+        self.checkpoints = checkpoints
+        self.count = count
+        self.stride = stride
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def build(cls, path, stride=STRIDE):
+        checkpoints = array('q')
+        count = 0
+        header, offset = read_header(path)
+        with open(path, 'rb') as infile:
+            infile.seek(offset)
+            while True:
+                record = read_record(infile)
+                if not record:
+                    break
+                check_record(record)
+                if not is_blank(record):
+                    if count % stride == 0:
+                        checkpoints.append(offset)
+                    count += 1
+                offset += len(record)
+        return cls(checkpoints, count, stride)
+
+    def save(self, index_path, stamp):
+        write_index_file(index_path, stamp, [self.checkpoints, array('q', [self.count, self.stride])])
+
+    @classmethod
+    def load(cls, index_path, stamp):
+        parts = read_index_file(index_path, stamp)
+        if parts is None:
+            return None
+        checkpoints, (count, stride) = parts
+        return cls(checkpoints, count, stride)
+
+    def locate(self, row):
+        # Returns (byte offset of the nearest checkpoint, records to skip)
+        return self.checkpoints[row // self.stride], row % self.stride
+
+    def iter_records(self, path, start=0, stop=None):
+        # Yields (byte offset, raw bytes) for data rows [start, stop)
+        stop = self.count if stop is None else min(stop, self.count)
+        if start >= stop:
+            return
+        checkpoint, skip = self.locate(start)
+        records = (item for item in iter_records(path, checkpoint) if not is_blank(item[1]))
+        yield from islice(records, skip, skip + stop - start)
+
+    def record_offset(self, path, row):
+        # Byte offset of data row `row`, which must be below len(self)
+        return next(self.iter_records(path, row, row + 1))[0]
+
+    def rows(self, path, start=0, stop=None):
+        return (row for _, row in parse_records(self.iter_records(path, start, stop)))
+
+    def page(self, path, offset=0, limit=None):
+        stop = None if limit is None else offset + limit
+        return list(self.rows(path, offset, stop))
+
+
+def load_row_index(path, persist=False, index_dir=None):
+    # Memory-cached per file version; with persist=True it is also kept on
+    # disk as "<file>.rows.idx" so later sessions skip the build pass
+    def load(path):
+        if not persist:
+            return RowIndex.build(path)
+        return load_or_build(
+            sidecar_paths(path, 'rows', index_dir), file_stamp(path, stride=STRIDE),
+            RowIndex.load, lambda: RowIndex.build(path)
+        )
+    return row_indexes.get_or_load(path, 'rows', load, lambda index: index.checkpoints.itemsize * len(index.checkpoints))
+
+
+def paginate(rows, offset=0, limit=None):
+    stop = None if limit is None else offset + limit
+    return islice(rows, offset, stop)
@@ -0,0 +1,132 @@
+import csv
+import datetime
+import os
+from itertools import islice
+
+from records import TEXT_ENCODING, iter_records, parse_records, read_header
+from xlsx_reader import XlsxReader
+
+SAMPLE_BYTES = 1024 * 1024  # CSV bytes used to estimate the row count
+SAMPLE_ROWS = 1000  # rows after the header used to infer column types
+
+BOOLEAN_TEXT = {"true", "false"}
+
+
+def value_type(value):
+    # "integer", "number", "boolean", "date" or "text"; None for empty cells.
+    # Text is classified by what it parses as, so "12" is an integer.
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, (datetime.date, datetime.time)):
+        return "date"
+    text = str(value).strip()
+    if not text:
+        return None
+    try:
+        int(text)
+        return "integer"
+    except ValueError:
+        pass
+    try:
+        float(text)
+        return "number"
+    except ValueError:
+        pass
+    if text.lower() in BOOLEAN_TEXT:
+        return "boolean"
+    try:
+        datetime.datetime.fromisoformat(text)
+        return "date"
+    except ValueError:
+        return "text"
+
+
+def merge_types(types):
+    if not types:
+        return "empty"
+    if len(types) == 1:
+        return next(iter(types))
+    if types == {"integer", "number"}:
+        return "number"
+    return "text"
+
+
+def column_types(header, rows):
+    seen = [set() for _ in header]
+    for row in rows:
+        for types, value in zip(seen, row):
+            kind = value_type(value)
+            if kind is not None:
+                types.add(kind)
+    return [merge_types(types) for types in seen]
+
+
+def describe(header, rows, row_count, exact):
+    return {
+        'columns': [{'name': name, 'type': kind} for name, kind in zip(header, column_types(header, rows))],
+        'rows': row_count,
+        'exact': exact,
+    }
+
+
+def sniff_csv(path, sample_bytes=SAMPLE_BYTES, sample_rows=SAMPLE_ROWS):
+    # Types come from the first sample_rows records; the row count is exact
+    # when the first sample_bytes of data reach the end of the file and is
+    # otherwise extrapolated from their average record size
+    try:
+        header, start = read_header(path)
+        records = list(iter_records(path, start, start + sample_bytes))
+        rows = [row for _, row in parse_records(records[:sample_rows])]
+    except csv.Error:
+        return sniff_csv_text(path, sample_rows)
+    size = os.path.getsize(path)
+    if not records:
+        return describe(header, rows, 0, True)
+    offset, last = records[-1]
+    end = offset + len(last)
+    if end >= size:
+        return describe(header, rows, len(records), True)
+    per_row = (end - start) / len(records)
+    return describe(header, rows, round((size - start) / per_row), False)
+
+
+def sniff_csv_text(path, sample_rows=SAMPLE_ROWS):
+    # For files with literal quotes that keep records from being cut out by
+    # their bytes: the sample is read with csv.reader and the row count is
+    # left unknown
+    with open(path, 'r', newline='', encoding=TEXT_ENCODING) as infile:
+        rows = csv.reader(infile)
+        header = next(rows, [])
+        sample = list(islice(rows, sample_rows))
+    return describe(header, sample, None, False)
+
+
+def sniff_xlsx(path, sheet=None, sample_rows=SAMPLE_ROWS):
+    # Types come from the first sample_rows rows; the row count is exact for
+    # short sheets and otherwise taken from the sheet's <dimension>, or
+    # extrapolated from the share of the sheet XML parsed so far
+    reader = XlsxReader(path, sheet=sheet)
+    rows = reader.rows()
+    header = list(next(rows, ()))
+    sample = list(islice(rows, sample_rows + 1))
+    if len(sample) <= sample_rows:
+        return describe(header, sample, len(sample), True)
+    rows.close()
+    if reader.max_row is not None:
+        row_count = max(reader.max_row - 1, 0)
+    else:
+        row_count = round(reader.rows_parsed * reader.sheet_size / reader.bytes_parsed) - 1
+    return describe(header, sample[:sample_rows], row_count, False)
+
+
+def sniff_schema(path, sheet=None):
+    # Returns {'columns': [{'name', 'type'}], 'rows': count or None, 'exact': bool}
+    if os.path.splitext(path)[1].lower() == '.xlsx':
+        return sniff_xlsx(path, sheet)
+    return sniff_csv(path)
@@ -0,0 +1,230 @@
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from hashlib import sha1
+from itertools import islice
+
+from dataset_cache import DatasetCache
+from predicates import NUMERIC_OPERATORS, cell_text, compile_filters, is_active, resolve_condition
+from records import fill_row, iter_frame_rows, read_header, read_rows_at
+
+MAGIC = b'CSVIDX02'
+INDEXED_CONDITIONS = {"=="} | set(NUMERIC_OPERATORS)
+FALLBACK_DIR = os.path.join(tempfile.gettempdir(), 'csveditor-index')
+
+column_indexes = DatasetCache(max_bytes=256 * 1024 * 1024, max_entries=64)  # loaded ColumnIndexes
+
+
+def text_hash(value):
+    return zlib.crc32(value.encode('utf-8'))
+
+
+class ColumnIndex:
+    # Sidecar index for one CSV column:
+    #   hashes/hash_offsets     - crc32 of the cell text -> record byte offset,
+    #                             sorted by hash, used for ==
+    #   values/value_offsets    - numeric cells -> record byte offset, sorted
+    #                             by value, used for <, >, <=, >=
+    # Hash collisions are possible, so callers re-check fetched rows. Cells
+    # missing from short records are indexed as '', as pandas reads them,
+    # and blank records are left out.
+    def __init__(self, hashes, hash_offsets, values, value_offsets):
+        self.hashes = hashes
+        self.hash_offsets = hash_offsets
+        self.values = values
+        self.value_offsets = value_offsets
+
+    @classmethod
+    def build(cls, path, column):
+        text_entries = []
+        numeric_entries = []
+        header, start = read_header(path)
+        for offset, row in iter_frame_rows(path, start, width=column + 1):
+            value = row[column]
+            text_entries.append((text_hash(value), offset))
+            try:
+                number = float(value)
+            except ValueError:
+                continue
+            if not math.isnan(number):
+                numeric_entries.append((number, offset))
+        text_entries.sort()
+        numeric_entries.sort()
+        return cls(
+            array('I', [h for h, _ in text_entries]),
+            array('q', [o for _, o in text_entries]),
+            array('d', [v for v, _ in numeric_entries]),
+            array('q', [o for _, o in numeric_entries]),
+        )
+
+    def lookup(self, code, value):
+        if code == "==":
+            h = text_hash(value)
+            lo = bisect_left(self.hashes, h)
+            hi = bisect_right(self.hashes, h, lo)
+            return self.hash_offsets[lo:hi]
+        try:
+            bound = float(value)
+        except ValueError:
+            return array('q')
+        if code == ">":
+            return self.value_offsets[bisect_right(self.values, bound):]
+        if code == ">=":
+            return self.value_offsets[bisect_left(self.values, bound):]
+        if code == "<":
+            return self.value_offsets[:bisect_left(self.values, bound)]
+        return self.value_offsets[:bisect_right(self.values, bound)]
+
+    def parts(self):
+        return [self.hashes, self.hash_offsets, self.values, self.value_offsets]
+
+    def size(self):
+        return sum(part.itemsize * len(part) for part in self.parts())
+
+    def save(self, index_path, stamp):
+        write_index_file(index_path, stamp, self.parts())
+
+    @classmethod
+    def load(cls, index_path, stamp):
+        parts = read_index_file(index_path, stamp)
+        return None if parts is None else cls(*parts)
+
+
+def file_stamp(path, **extra):
+    stat = os.stat(path)
+    return dict(extra, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+
+def sidecar_paths(path, name, index_dir=None):
+    # Candidate locations for "<file>.<name>.idx", preferred first
+    path = os.path.abspath(path)
+    filename = f'{os.path.basename(path)}.{name}.idx'
+    if index_dir:
+        return [os.path.join(index_dir, filename)]
+    digest = sha1(path.encode('utf-8')).hexdigest()[:12]
+    return [
+        os.path.join(os.path.dirname(path), filename),
+        os.path.join(FALLBACK_DIR, f'{digest}.{filename}'),
+    ]
+
+
+def write_index_file(index_path, stamp, parts):
+    info = dict(stamp, byteorder=sys.byteorder,
+                typecodes=''.join(part.typecode for part in parts),
+                counts=[len(part) for part in parts])
+    encoded = json.dumps(info).encode('utf-8')
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as outfile:
+        outfile.write(MAGIC)
+        outfile.write(struct.pack('<I', len(encoded)))
+        outfile.write(encoded)
+        for part in parts:
+            part.tofile(outfile)
+    os.replace(tmp_path, index_path)
+
+
+def read_index_file(index_path, stamp):
+    # Returns the stored arrays, or None when the file is missing,
+    # unreadable or was written for a different version of the source
+    try:
+        with open(index_path, 'rb') as infile:
+            if infile.read(len(MAGIC)) != MAGIC:
+                return None
+            size, = struct.unpack('<I', infile.read(4))
+            info = json.loads(infile.read(size).decode('utf-8'))
+            if any(info.get(key) != value for key, value in stamp.items()):
+                return None
+            if info.get('byteorder') != sys.byteorder:
+                return None
+            parts = []
+            for typecode, count in zip(info['typecodes'], info['counts']):
+                part = array(typecode)
+                part.fromfile(infile, count)
+                parts.append(part)
+    except (OSError, ValueError, EOFError, KeyError, struct.error):
+        return None
+    return parts
+
+
+def load_or_build(paths, stamp, load, build):
+    # Loads the first valid index file, otherwise builds and saves it to
+    # the first writable location
+    for index_path in paths:
+        index = load(index_path, stamp)
+        if index is not None:
+            return index
+    index = build()
+    for index_path in paths:
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            index.save(index_path, stamp)
+            break
+        except OSError:
+            continue
+    return index
+
+
+class SidecarIndex:
+    # Per-file collection of column indexes, stored as
+    # "<file>.<column>.idx" next to the CSV (or in FALLBACK_DIR when the
+    # source folder is read-only) and rebuilt whenever the file changes.
+    # Loaded indexes stay in column_indexes for as long as the file is
+    # unchanged, so later scans do not read them from disk again.
+    def __init__(self, path, index_dir=None):
+        self.path = os.path.abspath(path)
+        self.index_dir = index_dir
+
+    def column(self, column):
+        def load(path):
+            return load_or_build(
+                sidecar_paths(path, str(column), self.index_dir), file_stamp(path, column=column),
+                ColumnIndex.load, lambda: ColumnIndex.build(path, column)
+            )
+        return column_indexes.get_or_load(self.path, ('column', column, self.index_dir), load, ColumnIndex.size)
+
+    def lookup(self, column, condition, value):
+        code = resolve_condition(condition)
+        if code not in INDEXED_CONDITIONS:
+            return None
+        return self.column(column).lookup(code, cell_text(value).strip())
+
+
+def index_scan(path, filters, index_dir=None, pad=False):
+    # Returns (header, rows) using sidecar indexes for every == and range
+    # condition, or None when no condition can use an index. Only the
+    # records found in the index are read back, lazily and in file order,
+    # and re-checked; with pad set, short ones are first padded to the
+    # header width as pandas reads them.
+    header, _ = read_header(path)
+    index = SidecarIndex(path, index_dir)
+    candidates = None
+    for col, condition, value in filters:
+        if not is_active(condition, value) or col not in header:
+            continue
+        offsets = index.lookup(header.index(col), condition, value)
+        if offsets is None:
+            continue
+        offsets = set(offsets)
+        candidates = offsets if candidates is None else candidates & offsets
+    if candidates is None:
+        return None
+    matches = compile_filters(header, filters)
+    rows = read_rows_at(path, sorted(candidates))
+    if pad:
+        rows = (fill_row(row, len(header)) for row in rows)
+    return header, (row for row in rows if matches(row))
+
+
+def filter_with_index(path, filters, max_records=None, index_dir=None):
+    # index_scan collected into (header, list of rows)
+    scan = index_scan(path, filters, index_dir)
+    if scan is None:
+        return None
+    header, rows = scan
+    return header, list(islice(rows, max_records))
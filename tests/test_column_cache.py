@@ -0,0 +1,45 @@
+import csv
+
+import pytest
+
+from column_cache import DecodedColumn, EncodedStore
+from columnar import ColumnStore
+
+HEADER = ['id', 'kind', 'text']
+ROWS = [[str(i), 'even' if i % 2 == 0 else 'odd', f'Item {i % 7}'] for i in range(50)] + [['50', 'odd']]
+
+
+@pytest.mark.parametrize('filters', [
+    [('kind', '==', 'odd')],
+    [('text', 'contains', 'item 3')],
+    [('text', 'not contains', 'item')],
+    [('id', '>=', '45'), ('kind', '==', 'odd')],
+])
+def test_encoded_store_matches_column_store(filters):
+    encoded = EncodedStore.build(HEADER, iter(ROWS))
+    assert encoded.select(filters) == ColumnStore(HEADER, ROWS).select(filters)
+
+
+def test_text_views_stay_dictionary_sized():
+    store = EncodedStore.build(HEADER, iter(ROWS))
+    text, lower = store.text(2), store.lower(2)
+    assert isinstance(text, DecodedColumn) and len(text.values) == 8  # seven texts and "absent"
+    assert list(text) == ColumnStore(HEADER, ROWS).text(2)
+    assert lower[3] == 'item 3' and lower[50] is None and len(lower) == len(ROWS)
+
+
+def test_gui_column_cache_keeps_the_size_gate(tmp_path, monkeypatch):
+    pytest.importorskip('tkinter')
+    gui = pytest.importorskip('csv_limiter_gui')
+    path = tmp_path / 'data.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as outfile:
+        csv.writer(outfile).writerows([HEADER] + ROWS)
+    path = str(path)
+    monkeypatch.setattr(gui, 'use_column_cache', True)
+    gui.dataset_cache.invalidate()
+    monkeypatch.setattr(gui.dataset_cache, 'max_bytes', 1024 * 1024)
+    assert isinstance(gui.read_store(path), EncodedStore)
+    gui.dataset_cache.invalidate()
+    monkeypatch.setattr(gui.dataset_cache, 'max_bytes', 100)
+    assert gui.read_store(path) is None
+    assert gui.get_filtered_rows(path, [('kind', '==', 'odd')])[1] == [row for row in ROWS if row[1] == 'odd']
@@ -0,0 +1,61 @@
+import pytest
+
+from columnar import ColumnStore
+from dataset_cache import DatasetCache
+
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name in 'abc':
+        path = tmp_path / f'{name}.csv'
+        path.write_text('x\n1\n', encoding='utf-8')
+        paths.append(str(path))
+    return paths
+
+
+def test_charges_count_towards_the_budget(files):
+    cache = DatasetCache(max_bytes=1000)
+    first, second = object(), object()
+    cache.put(files[0], 'rows', first, 300)
+    cache.put(files[1], 'rows', second, 300)
+    cache.charge(files[1], 'rows', second, 200)
+    assert cache.total_bytes == 800
+    cache.charge(files[1], 'rows', second, 300)  # evicts the older entry
+    assert cache.get(files[0], 'rows') is None and cache.get(files[1], 'rows') is second
+    assert cache.total_bytes == 800
+    cache.charge(files[1], 'rows', second, 500)  # no longer fits on its own
+    assert cache.get(files[1], 'rows') is None and cache.total_bytes == 0
+
+
+def test_charges_for_replaced_values_are_ignored(files):
+    cache = DatasetCache(max_bytes=1000)
+    cache.put(files[0], 'rows', object(), 100)
+    cache.charge(files[0], 'rows', object(), 500)
+    assert cache.total_bytes == 100
+
+
+def test_search_views_are_charged_to_their_store(files):
+    cache = DatasetCache(max_bytes=10 ** 9)
+    rows = [[f'value {i}'] for i in range(1000)]
+
+    def load(path):
+        store = ColumnStore(['x'], rows, trigrams=True)
+        store.charge = lambda size: cache.charge(path, 'rows', store, size)
+        return store
+
+    store = cache.get_or_load(files[0], 'rows', load, lambda store: 1000)
+    store.select([('x', 'contains', 'ue 99')])
+    assert cache.total_bytes == 1000 + store.search(0).size() > 1000
+
+
+def test_failed_loads_leave_nothing_behind(files):
+    cache = DatasetCache()
+
+    def fail(path):
+        raise ValueError('unreadable')
+
+    with pytest.raises(ValueError):
+        cache.get_or_load(files[0], 'rows', fail, len)
+    assert cache.loading == {}
+    assert cache.get_or_load(files[0], 'rows', lambda path: [1, 2], len) == [1, 2]
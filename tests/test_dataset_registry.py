@@ -0,0 +1,63 @@
+import os
+import time
+
+import pytest
+
+from dataset_registry import DatasetRegistry
+
+# Queued and running jobs read their dataset from disk, so a pinned dataset
+# must outlive both ttl and LRU eviction, and an explicit removal waits
+# for the last job.
+
+
+def make_dataset(registry, text='a,b\n1,2\n'):
+    dataset = registry.create('data.csv')
+    with open(dataset.path, 'w') as outfile:
+        outfile.write(text)
+    return dataset
+
+
+@pytest.mark.parametrize('ttl, max_datasets', [(0, 10), (3600, 0)])
+def test_pinned_datasets_are_not_collected(tmp_path, ttl, max_datasets):
+    registry = DatasetRegistry(str(tmp_path), ttl=ttl, max_datasets=max_datasets)
+    pinned, unpinned = make_dataset(registry), make_dataset(registry)
+    registry.pin(pinned)
+    time.sleep(0.01)
+    registry.collect(force=True)
+    assert os.path.exists(pinned.path) and registry.get(pinned.id) is pinned
+    assert not os.path.exists(unpinned.folder) and registry.get(unpinned.id) is None
+
+    registry.unpin(pinned)
+    pinned.last_used -= 1
+    registry.collect(force=True)
+    assert not os.path.exists(pinned.folder) and registry.get(pinned.id) is None
+
+
+def test_removal_waits_for_the_last_job(tmp_path):
+    registry = DatasetRegistry(str(tmp_path), ttl=0)
+    dataset = make_dataset(registry)
+    registry.pin(dataset)
+    registry.pin(dataset)
+    assert registry.remove(dataset.id)
+    assert registry.get(dataset.id) is None and not registry.remove(dataset.id)
+    registry.collect(force=True)  # nor is its folder taken for an orphan
+    registry.unpin(dataset)
+    assert os.path.exists(dataset.path)
+    registry.unpin(dataset)
+    assert not os.path.exists(dataset.folder)
+
+
+def test_jobs_pin_their_dataset(tmp_path, monkeypatch):
+    web = pytest.importorskip('app')
+    registry = DatasetRegistry(str(tmp_path))
+    monkeypatch.setattr(web, 'registry', registry)
+    dataset = make_dataset(registry)
+    response = web.app.test_client().post('/jobs', json={
+        'type': 'filter', 'dataset_id': dataset.id, 'filters': [{'column': 'a', 'condition': '==', 'value': '1'}]})
+    assert response.status_code == 202, response.get_json()
+    job = web.job_queue.get(response.get_json()['job_id'])
+    job.future.result(timeout=30)
+    deadline = time.time() + 5
+    while dataset.pins and time.time() < deadline:
+        time.sleep(0.01)
+    assert dataset.pins == 0
@@ -0,0 +1,69 @@
+import pytest
+
+from expressions import parse_filters
+
+
+@pytest.mark.parametrize('spec', [
+    [['a', 'equals', '1']],
+    {'column': 'a', 'condition': '=!', 'value': '1'},
+    {'or': [['a', '==', '1'], ['b', 'like', 'x']]},
+])
+def test_unknown_conditions_are_rejected(spec):
+    with pytest.raises(ValueError, match='Unknown condition'):
+        parse_filters(spec)
+
+
+def test_conditions_left_unset_are_skipped():
+    assert parse_filters([['a', '', '1'], ['b', None, 'x']]).is_empty()
+    assert parse_filters([['a', 'Equals', '1']]).as_filters() == [('a', '==', '1')]
+
+
+def test_preview_reports_unknown_conditions():
+    web = pytest.importorskip('app')
+    response = web.app.test_client().post('/preview', json={'filters': [['a', 'equals', '1']]})
+    assert response.status_code == 400
+    assert 'Unknown condition' in response.get_json()['error']
+
+
+pd = pytest.importorskip('pandas')
+
+from columnar import FrameStore
+from predicates import SeriesViews
+
+FRAME = {'a': ['1', '2', '3', '1', ''], 'n': ['5', 'x', '15', '25', '7'], 't': ['ax', 'B', 'xa', '', 'c']}
+
+
+@pytest.mark.parametrize('spec', [
+    {'or': [['a', '==', '1'], ['t', 'contains', 'x']]},
+    {'and': [['n', '>', '6'], {'not': ['t', 'contains', 'a']}]},
+    {'or': [{'and': [['a', 'in', '1,3'], ['n', '<', '20']]}, ['t', 'not in', ['B', 'c']]]},
+    {'not': {'or': [['a', '==', '2'], ['missing', '==', '1']]}},
+])
+def test_mask_agrees_with_compile(spec):
+    df = pd.DataFrame(FRAME)
+    expression = parse_filters(spec)
+    test = expression.compile(df.columns)
+    expected = [test(row) for row in df.values.tolist()]
+    assert expression.mask(df).tolist() == expected
+    assert expression.mask(df, FrameStore(df)).tolist() == expected
+
+
+def test_or_tests_only_rows_not_matched_yet(monkeypatch):
+    tested = []
+    mask = SeriesViews.mask
+    monkeypatch.setattr(SeriesViews, 'mask', lambda self, code, value, rows=None:
+                        tested.append(len(self.series) if rows is None else int(rows.sum()))
+                        or mask(self, code, value, rows))
+    df = pd.DataFrame(FRAME)
+    # "n > 20" is likelier to match and goes first; "a == 1" then skips row 3
+    parse_filters({'or': [['a', '==', '1'], ['n', '>', '20']]}).mask(df)
+    assert tested == [5, 4]
+
+
+def test_built_views_make_conditions_cheaper():
+    df = pd.DataFrame(FRAME)
+    store = FrameStore(df)
+    root = parse_filters([['t', 'contains', 'x'], ['n', '>', '6']]).root
+    assert [child.code for child in root.ordered(store)] == ['>', 'contains']
+    store.search('t')
+    assert [child.code for child in root.ordered(store)] == ['contains', '>']
@@ -0,0 +1,157 @@
+import csv
+import random
+
+import pytest
+
+from predicates import compile_filters, filter_tests, refines
+from records import iter_rows_with_offsets, read_header
+
+# A tightened filter is only evaluated over the previous matches. Whatever
+# refines() accepts must never match a row the old filters did not, and
+# incremental_matches must always give what a full compile_filters scan
+# of the file gives.
+
+HEADER = ['id', 'name', 'score', 'note']
+WORDS = ['apple', 'Apple pie', 'banana', 'BANANA split', 'cherry', 'x,y', 'multi\nline', '']
+NUMBERS = ['-3', '0', '2.5', '10', ' 7 ', '1e2', 'abc', '']
+CONDITIONS = ['==', '>', '<', '>=', '<=', 'contains', 'not contains', 'Equals', 'Contains', 'Greater than']
+
+
+def make_rows(rng, count=300):
+    rows = []
+    for i in range(count):
+        row = [str(i), rng.choice(WORDS), rng.choice(NUMBERS), rng.choice(WORDS + NUMBERS)]
+        if rng.random() < 0.05:
+            row = row[:rng.randint(1, 3)]  # short record
+        rows.append(row)
+    return rows
+
+
+def random_condition(rng):
+    column = rng.choice(HEADER)
+    condition = rng.choice(CONDITIONS)
+    if condition in ('contains', 'not contains', 'Contains'):
+        value = rng.choice(['a', 'an', 'P', 'e', 'x', ','])
+    else:
+        value = rng.choice(NUMBERS[:-1] + WORDS[:3] + [str(rng.randint(0, 300))])
+    return column, condition, value
+
+
+def edit(rng, filters):
+    # One edit a user makes while typing. Most narrow the match set; some
+    # look alike but widen it (a shorter contains value, a looser bound,
+    # ">=" for ">"), and refines() has to tell them apart
+    filters = list(filters)
+    if not filters or rng.random() < 0.25:
+        filters.append(random_condition(rng))
+        return filters
+    i = rng.randrange(len(filters))
+    column, condition, value = filters[i]
+    loosen = rng.random() < 0.2
+    if rng.random() < 0.1:
+        filters[i] = random_condition(rng)
+    elif condition in ('contains', 'Contains', 'not contains'):
+        if loosen == (condition == 'not contains'):
+            value = value + rng.choice('anpl e,')
+        else:
+            value = value[:-1] or value
+        filters[i] = (column, condition, value)
+    elif condition in ('>', '>=', 'Greater than', '<', '<='):
+        try:
+            bound = float(value)
+        except ValueError:
+            bound = 0
+        delta = rng.choice([0, 0.5, 1, 20]) * (-1 if loosen else 1)
+        if condition in ('<', '<='):
+            delta = -delta
+        if not delta:
+            condition = {'>': '>=', '>=': '>', 'Greater than': '>=', '<': '<=', '<=': '<'}[condition]
+        filters[i] = (column, condition, repr(bound + delta) if delta else value)
+    else:
+        filters[i] = (column, condition, value + rng.choice(['', 'a', '0']))
+    return filters
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as outfile:
+        writer = csv.writer(outfile)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_refines_never_gains_rows():
+    rng = random.Random(7)
+    rows = make_rows(rng)
+    accepted = 0
+    for _ in range(2000):
+        old = [random_condition(rng) for _ in range(rng.randint(0, 2))]
+        new = old
+        for _ in range(rng.randint(1, 3)):
+            new = edit(rng, new)
+        if not refines(filter_tests(HEADER, new), filter_tests(HEADER, old)):
+            continue
+        accepted += 1
+        old_test, new_test = compile_filters(HEADER, old), compile_filters(HEADER, new)
+        assert all(old_test(row) for row in rows if new_test(row)), (old, new)
+    assert accepted > 500
+
+
+@pytest.mark.parametrize('old, new, expected', [
+    ([('name', 'contains', 'an')], [('name', 'contains', 'ana')], True),
+    ([('name', 'contains', 'an')], [('name', 'contains', 'a')], False),
+    ([('note', 'not contains', 'pie')], [('note', 'not contains', 'pi')], True),
+    ([('score', '>', '2')], [('score', '>=', '2')], False),
+    ([('score', '>=', '2')], [('score', '>', '2')], True),
+    ([('score', '<', '10')], [('score', '<=', '9.5')], True),
+    ([('score', '>', '2')], [('score', '==', '10')], True),
+    ([('score', '>', '2')], [('score', '==', 'abc')], False),
+    ([('name', 'Contains', 'app')], [('name', 'contains', 'apple'), ('id', '>', '5')], True),
+    ([('name', 'contains', 'app')], [('note', 'contains', 'apple')], False),
+    ([('missing', '==', 'x')], [('missing', '==', 'x')], False),
+])
+def test_refines_cases(old, new, expected):
+    assert refines(filter_tests(HEADER, new), filter_tests(HEADER, old)) is expected
+
+
+@pytest.fixture
+def gui(monkeypatch):
+    pytest.importorskip('tkinter')
+    gui = pytest.importorskip('csv_limiter_gui')
+    from match_cache import MatchCache
+    monkeypatch.setattr(gui, 'match_cache', MatchCache())
+    monkeypatch.setattr(gui, 'use_column_cache', False)
+    gui.dataset_cache.invalidate()
+    yield gui
+    gui.dataset_cache.invalidate()
+
+
+@pytest.mark.parametrize('mode', ['rows', 'encoded', 'offsets'])
+def test_incremental_matches_equal_a_full_scan(tmp_path, gui, monkeypatch, mode):
+    rng = random.Random(11)
+    rows = make_rows(rng)
+    path = write_csv(tmp_path / 'data.csv', rows)
+    if mode == 'encoded':
+        monkeypatch.setattr(gui, 'use_column_cache', True)
+    if mode == 'offsets':
+        monkeypatch.setattr(gui.dataset_cache, 'max_bytes', 0)  # nothing fits, scan the file
+    header, start = read_header(path)
+    records = list(iter_rows_with_offsets(path, start))
+
+    narrowed = 0
+    for _ in range(20):
+        filters = []
+        for _ in range(8):
+            filters = edit(rng, filters)
+            tests = filter_tests(header, filters)
+            if not tests:
+                continue
+            key = gui.file_key(path) + ('offsets' if mode == 'offsets' else 'rows',)
+            narrowed += gui.match_cache.base(key, tests) is not None
+            test = compile_filters(header, filters)
+            if mode == 'offsets':
+                expected = [offset for offset, row in records if test(row)]
+            else:
+                expected = [i for i, (_, row) in enumerate(records) if test(row)]
+            assert list(gui.incremental_matches(path, filters)) == expected, filters
+    assert narrowed > 50
@@ -0,0 +1,53 @@
+import csv
+
+import pytest
+
+import parallel_scan
+from parallel_scan import parallel_count, parallel_filter, parallel_offsets, split_ranges
+from records import iter_rows, read_rows_at
+
+# Ranges are cut on newlines outside quoted fields, so reading each range
+# on its own must give the records csv.reader finds in the whole file
+
+
+@pytest.fixture
+def data(tmp_path):
+    # Quoted fields with newlines, CRLF line ends and escaped quotes
+    rows = [['id', 'kind', 'text']]
+    for i in range(500):
+        text = f'line {i}\nsecond "{i}"' if i % 4 == 0 else f'plain {i}, comma'
+        rows.append([str(i), 'even' if i % 2 == 0 else 'odd', text])
+    path = tmp_path / 'data.csv'
+    with open(path, 'w', newline='', encoding='utf-8') as outfile:
+        csv.writer(outfile).writerows(rows)
+    return str(path)
+
+
+def reader_rows(path):
+    with open(path, newline='', encoding='utf-8') as infile:
+        return list(csv.reader(infile))
+
+
+@pytest.mark.parametrize('parts', [1, 2, 3, 7, 16, 64, 499])
+def test_split_ranges_reads_like_csv_reader(data, parts):
+    header, ranges = split_ranges(data, parts)
+    expected = reader_rows(data)
+    assert header == expected[0]
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert [row for start, end in ranges for row in iter_rows(data, start, end)] == expected[1:]
+
+
+def test_parallel_scans_match_csv_reader(data):
+    filters = [('kind', '==', 'even'), ('text', 'contains', 'second')]
+    expected = [row for row in reader_rows(data)[1:] if row[1] == 'even' and 'second' in row[2]]
+    assert parallel_filter(data, filters, workers=2)[1] == expected
+    assert parallel_filter(data, filters, max_records=10, workers=2)[1] == expected[:10]
+    assert parallel_count(data, filters, workers=2) == len(expected)
+    assert list(read_rows_at(data, parallel_offsets(data, filters, workers=2)[1])) == expected
+
+
+def test_scans_share_one_pool(data):
+    parallel_filter(data, [('kind', '==', 'odd')], workers=2)
+    pool = parallel_scan.pool
+    parallel_count(data, [('kind', '==', 'odd')], workers=3)
+    assert pool is not None and parallel_scan.pool is pool
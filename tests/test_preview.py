@@ -0,0 +1,78 @@
+import pytest
+
+web = pytest.importorskip('app')
+import parallel_scan
+
+# Previews of CSV files too big to keep in memory scan the file once per
+# filter and read each page by the offsets of its records
+
+
+@pytest.fixture
+def data(tmp_path, monkeypatch):
+    monkeypatch.setitem(web.app.config, 'DATASET_WARM_BYTES', 0)
+    web.dataset_cache.invalidate()
+    web.match_offsets.invalidate()
+    lines = ['id,kind,text'] + [f'{i},{"m" if i % 3 else "n"},"t {i}, quoted"' for i in range(1, 300)]
+    path = tmp_path / 'data.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+
+def pandas_rows(path, filters):
+    df = web.pd.read_csv(path, dtype=str, keep_default_na=False)
+    return df[web.parse_filters(filters).mask(df)].values.tolist()
+
+
+@pytest.mark.parametrize('filters', [
+    [],
+    [['kind', '==', 'm'], ['id', '>', '100']],
+    [['text', 'contains', '7,']],
+    {'or': [['kind', '==', 'n'], {'not': ['id', '<', '250']}]},
+    [['id', 'in', ['3', '30', '300']]],
+])
+def test_pages_match_pandas(data, filters):
+    expected = pandas_rows(data, filters)
+    for offset in (0, 40, 80):
+        columns, rows, total = web.preview_page(data, web.parse_filters(filters), offset, 40)
+        assert columns == ['id', 'kind', 'text']
+        assert rows == expected[offset:offset + 40]
+        assert total == len(expected)
+
+
+@pytest.mark.parametrize('filters', [
+    [['kind', '==', 'm'], ['text', 'not contains', '1']],
+    [['text', 'not contains', 't']],
+    {'or': [['kind', '==', 'n'], ['text', 'not contains', '5']]},
+])
+@pytest.mark.parametrize('parallel', [False, True])
+def test_short_rows_page_like_pandas(tmp_path, data, monkeypatch, filters, parallel):
+    if parallel:
+        monkeypatch.setattr(parallel_scan, 'MIN_PARALLEL_BYTES', 0)
+        monkeypatch.setitem(web.app.config, 'PARALLEL_WORKERS', 2)
+    lines = ['id,kind,text'] + [f'{i},m' if i % 5 == 0 else '' if i % 9 == 0 else f'{i},n,t {i}'
+                                for i in range(1, 200)]
+    path = tmp_path / 'short.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    expected = pandas_rows(str(path), filters)
+    columns, rows, total = web.preview_page(str(path), web.parse_filters(filters), 10, 40)
+    assert rows == expected[10:50]
+    assert total == len(expected)
+
+
+def test_later_pages_do_not_rescan(data, monkeypatch):
+    scans = []
+    scan = web.mmap_filter
+    monkeypatch.setattr(web, 'mmap_filter', lambda *args, **kwargs: scans.append(args) or scan(*args, **kwargs))
+    filters = web.parse_filters([['kind', '==', 'm']])
+    pages = [web.preview_page(data, filters, offset, 50)[1] for offset in (0, 50, 100)]
+    assert len(scans) == 1
+    assert sum(pages, []) == pandas_rows(data, [['kind', '==', 'm']])[:150]
+
+
+def test_unreadable_records_page_through_pandas(data):
+    with open(data, 'a', encoding='utf-8') as outfile:
+        outfile.write('400,m,x"y\n')
+    expected = pandas_rows(data, [['kind', '==', 'm']])
+    columns, rows, total = web.preview_page(data, web.parse_filters([['kind', '==', 'm']]), 190, 20)
+    assert rows == expected[190:210]
+    assert total == len(expected) == 201
@@ -0,0 +1,195 @@
+import csv
+
+import pytest
+
+from mmap_reader import mmap_filter
+from parallel_scan import parallel_filter
+from predicates import compile_filters
+from records import RecordError, check_record, iter_rows, iter_rows_with_offsets, parse_record, read_header
+from row_index import RowIndex
+from schema import sniff_schema
+
+# Records are cut from the bytes of a CSV file by quote parity. A literal
+# quote in an unquoted field (x"y) is read as text by csv.reader and pandas,
+# so the byte-level readers must refuse such files instead of merging records.
+
+STRAY_QUOTE = 'a,b\n1,x"y\n2,z\n3,w\n'
+
+
+def write(tmp_path, text, name='data.csv'):
+    path = tmp_path / name
+    path.write_bytes(text.encode('utf-8'))
+    return str(path)
+
+
+def reader_rows(path):
+    with open(path, newline='', encoding='utf-8') as infile:
+        return list(csv.reader(infile))
+
+
+def test_parse_record_matches_csv_reader():
+    assert parse_record(b'1,"a\nb",c\r\n') == ['1', 'a\nb', 'c']
+    assert parse_record(b'"a""b",x"y\n') == ['a"b', 'x"y']
+    assert parse_record(b'3,x"y') == ['3', 'x"y']
+
+
+@pytest.mark.parametrize('record', [b'1,x"y\n2,z\n', b'1,x"y,"ab\n', b'1,"a"b\n'])
+def test_parse_record_rejects_records_csv_reader_ends_elsewhere(record):
+    with pytest.raises(RecordError):
+        parse_record(record)
+    with pytest.raises(csv.Error):
+        check_record(record)
+
+
+def test_check_record_accepts_well_quoted_records():
+    for record in [b'1,2\n', b'"a,b","c""d"\r\n', b'"multi\nline",x\n', b'x"y\n']:
+        check_record(record)
+
+
+def test_mmap_filter_refuses_stray_quote(tmp_path):
+    path = write(tmp_path, STRAY_QUOTE)
+    with pytest.raises(csv.Error):
+        mmap_filter(path, [('a', '==', '3')])
+
+
+@pytest.mark.parametrize('needle', ['k', 'KM', 'i', 'ok,', 'İ', 'é'])
+def test_mmap_filter_folds_case_like_str_lower(tmp_path, needle):
+    # str.lower() turns the Kelvin sign into "k" and "İ" into "i̇"; such
+    # records must be found by contains like any other. Non-ASCII needles
+    # are left to the callers' csv.reader or pandas scans.
+    lines = ['a,b', '1,Km', '2,"İx\ny"', '3,plain', '4,Ok,', '5,café', '6,"ok,"']
+    path = write(tmp_path, '\n'.join(lines) + '\n')
+    filters = [('b', 'contains', needle)]
+    matches = compile_filters(['a', 'b'], filters)
+    result = mmap_filter(path, filters)
+    if not needle.isascii():
+        assert result is None
+    else:
+        assert result[1] == [row for row in reader_rows(path)[1:] if matches(row)]
+
+
+def test_offsets_refuse_stray_quote(tmp_path):
+    path = write(tmp_path, STRAY_QUOTE)
+    with pytest.raises(csv.Error):
+        list(iter_rows_with_offsets(path, 4))
+    with pytest.raises(csv.Error):
+        RowIndex.build(path)
+
+
+def test_ranges_cut_inside_a_field_are_refused(tmp_path):
+    # Line 50 opens a field that csv.reader closes on line 51, yet quote
+    # parity allows a cut between them. Every split of the data rows at a
+    # line end must either read like csv.reader or raise csv.Error.
+    lines = ['a,b'] + [f'{i},v{i}' for i in range(100)]
+    lines[50] = '49,x"y,"ab'
+    lines[51] = 'cd",z'
+    text = '\n'.join(lines) + '\n'
+    path = write(tmp_path, text)
+    expected = reader_rows(path)[1:]
+    start = len(lines[0]) + 1
+    cuts = [i + 1 for i, char in enumerate(text) if char == '\n' and start < i + 1 < len(text)]
+    refused = 0
+    for cut in cuts:
+        try:
+            rows = list(iter_rows(path, start, cut)) + list(iter_rows(path, cut))
+        except csv.Error:
+            refused += 1
+            continue
+        assert rows == expected
+    assert refused
+
+
+def test_parallel_filter_matches_csv_reader_or_refuses(tmp_path):
+    lines = ['a,b'] + [f'{i},v{i}' for i in range(200)]
+    lines[50] = '49,x"y,"ab'
+    lines[51] = 'cd",z'
+    path = write(tmp_path, '\n'.join(lines) + '\n')
+    try:
+        header, rows = parallel_filter(path, [('b', 'contains', 'z')], workers=2)
+    except csv.Error:
+        return
+    assert rows == [row for row in reader_rows(path)[1:] if 'z' in row[1]]
+
+
+def test_schema_of_stray_quote_file(tmp_path):
+    schema = sniff_schema(write(tmp_path, STRAY_QUOTE))
+    assert [column['name'] for column in schema['columns']] == ['a', 'b']
+    assert schema['rows'] is None
+
+
+def test_web_filter_falls_back_to_pandas(tmp_path):
+    web = pytest.importorskip('app')
+    path = write(tmp_path, STRAY_QUOTE)
+    columns, chunks = web.filtered_chunks(path, [['a', '==', '3']])
+    rows = [row for chunk in chunks for row in (chunk.values.tolist() if hasattr(chunk, 'values') else chunk)]
+    assert list(columns) == ['a', 'b']
+    assert rows == [['3', 'w']]
+
+    client = web.app.test_client()
+    with open(path, 'rb') as infile:
+        dataset = client.post('/upload', data={'file': (infile, 'quotes.csv')}).get_json()
+    response = client.post('/filter', json={'dataset_id': dataset['dataset_id'], 'filters': [['a', '==', '3']]})
+    assert response.status_code == 200
+    assert list(csv.reader(response.data.decode('utf-8').splitlines())) == [['a', 'b'], ['3', 'w']]
+
+
+@pytest.mark.parametrize('filters', [[('a', '==', '3')], [('b', 'contains', 'y')], [('a', '>', '1')]])
+def test_gui_filter_falls_back_to_csv_reader(tmp_path, filters):
+    pytest.importorskip('tkinter')
+    gui = pytest.importorskip('csv_limiter_gui')
+    from predicates import compile_filters
+
+    path = write(tmp_path, STRAY_QUOTE)
+    header, *rows = reader_rows(path)
+    matches = compile_filters(header, filters)
+    expected = [row for row in rows if matches(row)]
+    gui.dataset_cache.invalidate()
+    gui.dataset_cache.max_bytes, limit = 0, gui.dataset_cache.max_bytes  # take the uncached paths
+    try:
+        assert gui.get_filtered_rows(path, filters)[1] == expected
+        assert gui.count_rows(path) == len(rows)
+        header, source = gui.filtered_source(path, filters)
+        assert source.window(0, len(source)) == expected
+    finally:
+        gui.dataset_cache.max_bytes = limit
+
+
+# Column names: a UTF-8 byte order mark is not part of the first name, and
+# the web app's filters use pandas' names for duplicate columns
+
+BOM_FILE = '\ufeffid,name\n1,a\n2,b\n1,c\n'
+DUPLICATES = 'a,a,b\n1,x,2\n1,y,2\n3,x,4\n'
+
+
+def filtered(web, path, filters):
+    columns, chunks = web.filtered_chunks(path, filters)
+    rows = [row for chunk in chunks for row in (chunk.values.tolist() if hasattr(chunk, 'values') else chunk)]
+    return list(columns), rows
+
+
+def test_read_header_drops_bom(tmp_path):
+    header, start = read_header(write(tmp_path, BOM_FILE))
+    assert header == ['id', 'name']
+    assert start == len('\ufeffid,name\n'.encode('utf-8'))
+
+
+@pytest.mark.parametrize('text, filters, expected', [
+    (BOM_FILE, [['name', '==', 'a'], ['id', '==', '1']], (['id', 'name'], [['1', 'a']])),
+    (DUPLICATES, [['b', '==', '2'], ['a.1', '==', 'x']], (['a', 'a.1', 'b'], [['1', 'x', '2']])),
+])
+def test_web_filter_uses_pandas_names(tmp_path, text, filters, expected):
+    web = pytest.importorskip('app')
+    assert filtered(web, write(tmp_path, text), filters) == expected
+
+
+def test_gui_filter_of_bom_file(tmp_path):
+    pytest.importorskip('tkinter')
+    gui = pytest.importorskip('csv_limiter_gui')
+    path = write(tmp_path, BOM_FILE)
+    gui.dataset_cache.invalidate()
+    gui.dataset_cache.max_bytes, limit = 0, gui.dataset_cache.max_bytes
+    try:
+        assert gui.read_header(path) == ['id', 'name']
+        assert gui.get_filtered_rows(path, [('name', '==', 'a'), ('id', '==', '1')]) == (['id', 'name'], [['1', 'a']])
+    finally:
+        gui.dataset_cache.max_bytes = limit
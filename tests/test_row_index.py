@@ -0,0 +1,43 @@
+import pytest
+
+from row_index import RowIndex
+
+# Blank lines are not data rows for pandas, so the row index must not
+# count them either: offsets into the output seek through it.
+
+BLANK_LINES = 'a,b\n1,"x\ny"\n\n2,p\n3,"q\nr"\n\n4,s\n  \n5,t\n6,u\n'
+ROWS = [['1', 'x\ny'], ['2', 'p'], ['3', 'q\nr'], ['4', 's'], ['5', 't'], ['6', 'u']]
+
+
+@pytest.fixture
+def data(tmp_path):
+    path = tmp_path / 'blank.csv'
+    path.write_bytes(BLANK_LINES.encode('utf-8'))
+    return str(path)
+
+
+@pytest.mark.parametrize('stride', [1, 2, 64])
+def test_blank_records_are_not_rows(data, stride):
+    index = RowIndex.build(data, stride)
+    assert len(index) == len(ROWS)
+    for offset in range(len(ROWS) + 1):
+        assert index.page(data, offset, 2) == ROWS[offset:offset + 2]
+
+
+def test_offsets_skip_blank_lines_like_pandas(data):
+    web = pytest.importorskip('app')
+    web.dataset_cache.invalidate()
+    web.row_indexes.invalidate()
+    for offset in range(len(ROWS) + 1):
+        for chunked in (web.filtered_chunks, web.updated_chunks):
+            columns, chunks = chunked(data, [], offset=offset, chunksize=2)
+            assert [row for chunk in chunks for row in chunk.values.tolist()] == ROWS[offset:]
+
+
+@pytest.mark.parametrize('route', ['/filter', '/update', '/jobs'])
+@pytest.mark.parametrize('window', [{'offset': -1}, {'offset': '2'}, {'max_records': -5}, {'max_records': 1.5}])
+def test_bad_windows_are_rejected(route, window):
+    web = pytest.importorskip('app')
+    response = web.app.test_client().post(route, json=dict(window, type='filter'))
+    assert response.status_code == 400
+    assert 'whole numbers' in response.get_json()['error']
@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import sidecar_index
+from sidecar_index import ColumnIndex, column_indexes, filter_with_index
+
+
+@pytest.fixture
+def data(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('id,kind\n' + ''.join(f'{i},{"ab"[i % 2]}\n' for i in range(100)), encoding='utf-8')
+    column_indexes.invalidate()
+    return str(path)
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    # Index files read from disk
+    reads = []
+    read = sidecar_index.read_index_file
+    monkeypatch.setattr(sidecar_index, 'read_index_file', lambda *args: reads.append(args[0]) or read(*args))
+    return reads
+
+
+def test_loaded_indexes_are_reused(data, tmp_path, reads):
+    index_dir = str(tmp_path / 'idx')
+    filters = [('id', '>=', '90'), ('kind', '==', 'a')]
+    expected = [[str(i), 'a'] for i in range(90, 100, 2)]
+    assert filter_with_index(data, filters, index_dir=index_dir)[1] == expected
+    assert filter_with_index(data, filters, index_dir=index_dir)[1] == expected
+    assert len(os.listdir(index_dir)) == 2
+    assert len(reads) == 2  # one miss per column before the build, none afterwards
+
+
+def test_changed_files_are_indexed_again(data, tmp_path, reads):
+    index_dir = str(tmp_path / 'idx')
+    assert filter_with_index(data, [('id', '==', '5')], index_dir=index_dir)[1] == [['5', 'b']]
+    with open(data, 'a', encoding='utf-8') as outfile:
+        outfile.write('5,c\n')
+    assert filter_with_index(data, [('id', '==', '5')], index_dir=index_dir)[1] == [['5', 'b'], ['5', 'c']]
+    assert isinstance(column_indexes.get(data, ('column', 0, index_dir)), ColumnIndex)
+
+
+def test_missing_cells_are_indexed_as_blank(tmp_path):
+    # pandas reads the cells missing from a short record as '' and skips
+    # blank lines
+    path = tmp_path / 'short.csv'
+    path.write_bytes(b'id,kind\n1,a\n2\n\n  \n3,\n')
+    index = ColumnIndex.build(str(path), 1)
+    assert list(index.lookup('==', '')) == [12, 18]
+    assert list(index.lookup('==', 'a')) == [8]
+    assert len(ColumnIndex.build(str(path), 0).hashes) == 3
@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+tk = pytest.importorskip('tkinter')
+from virtual_grid import PLACEHOLDER, ScannedRows, VirtualGrid
+
+
+@pytest.fixture
+def root():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip('no display')
+    yield root
+    root.destroy()
+
+
+class SlowRows:
+    # Records the thread each window is read on; every read waits for `go`
+    def __init__(self, count):
+        self.count = count
+        self.threads = []
+        self.go = threading.Event()
+
+    def __len__(self):
+        return self.count
+
+    def window(self, start, stop):
+        self.threads.append(threading.current_thread())
+        self.go.wait(5)
+        return [[str(i), f'v{i}'] for i in range(start, stop)]
+
+
+def shown(grid):
+    return [grid.tree.item(item, 'values') for item in grid.tree.get_children()]
+
+
+def pump(root, until, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not until() and time.monotonic() < deadline:
+        root.update()
+        time.sleep(0.01)
+    return until()
+
+
+def test_windows_are_read_off_the_main_thread(root):
+    grid = VirtualGrid(root, height=3)
+    source = SlowRows(100)
+    grid.set_data(['a', 'b'], source)
+    assert pump(root, lambda: shown(grid) == [(PLACEHOLDER, PLACEHOLDER)] * 3)
+    grid.scroll_to(50)  # while the first read is still in flight
+    source.go.set()
+    assert pump(root, lambda: shown(grid) == [('50', 'v50'), ('51', 'v51'), ('52', 'v52')])
+    assert threading.main_thread() not in source.threads
+
+
+def test_scanned_rows_windows():
+    source = ScannedRows(lambda: ([str(i)] for i in range(2000)), 2000)
+    assert source.window(1200, 1203) == [['1200'], ['1201'], ['1202']]
+    assert source.window(5, 7) == [['5'], ['6']]
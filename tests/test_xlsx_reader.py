@@ -0,0 +1,100 @@
+import datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from xlsx_reader import XlsxReader, read_column_names, read_frame
+from xlsx_writer import write_xlsx
+
+# The streaming reader must give the values of openpyxl's read-only
+# iter_rows(values_only=True), and read_frame the frame of pd.read_excel,
+# for workbooks written by openpyxl and by xlsx_writer.
+
+HEADER = ['int', 'mix', None, 'numstr', 'date', 'stamp', 'bool', 'boolish', 'err', 'dup', 'dup', 'natext',
+          'duration', 'percent', 'big']
+ROWS = [
+    [1, 1.5, 'x', '1', datetime.datetime(2024, 1, 2), datetime.datetime(2024, 1, 2, 3, 4), True, 'false',
+     '#N/A', 'a', 'b', 'NA', datetime.timedelta(hours=30), 0.25, 2 ** 40],
+    [2, 2, 'y', '2.5', datetime.datetime(2024, 1, 3, 5, 6), None, False, False, 'ok', 'c', 'd', 'n/a',
+     datetime.timedelta(minutes=5), 0.5, 1e20],
+    [3, 3.25, None, '3', datetime.date(2024, 2, 2), datetime.datetime(2025, 1, 1), None, 0, None, 'e', 'f',
+     'text', datetime.timedelta(0), 1, -5],
+]
+
+
+def openpyxl_workbook(tmp_path):
+    path = str(tmp_path / 'openpyxl.xlsx')
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row in ROWS:
+        sheet.append(row)
+    sheet['I2'].data_type = 'e'
+    for cell in sheet['F'][1:]:
+        cell.number_format = 'yyyy-mm-dd hh:mm'  # a custom date format
+    for cell in sheet['M'][1:]:
+        cell.number_format = '[h]:mm:ss'
+    for cell in sheet['N'][1:]:
+        cell.number_format = '0.00%'
+    sheet['A6'] = 'after a gap'
+    workbook.save(path)
+    return path
+
+
+def written_workbook(tmp_path, shared_strings):
+    path = str(tmp_path / f'written-{shared_strings}.xlsx')
+    write_xlsx(path, HEADER, ROWS + [[' padded ', 'x<y&z', 'é', '']], shared_strings=shared_strings)
+    return path
+
+
+@pytest.fixture(params=['openpyxl', 'inline strings', 'shared strings'])
+def workbook(request, tmp_path):
+    if request.param == 'openpyxl':
+        return openpyxl_workbook(tmp_path)
+    return written_workbook(tmp_path, request.param == 'shared strings')
+
+
+def openpyxl_rows(path, data_only):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=data_only)
+    try:
+        return list(workbook.worksheets[0].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+@pytest.mark.parametrize('data_only', [False, True])
+def test_rows_match_openpyxl(workbook, data_only):
+    assert list(XlsxReader(workbook, sheet=0, data_only=data_only)) == openpyxl_rows(workbook, data_only)
+
+
+def test_read_frame_matches_pandas(workbook):
+    pd.testing.assert_frame_equal(read_frame(workbook), pd.read_excel(workbook))
+    assert read_column_names(workbook) == pd.read_excel(workbook, nrows=0).columns.tolist()
+
+
+@pytest.mark.parametrize('header, rows', [
+    (['a', 'a', '', 'a.1', ''], [[1, 2, 3, 4, 5]]),
+    (['b', 'c', 'd'], [['false', 1, 'TRUE'], [False, 'TRUE', 0], [-0.0, None, None]]),
+    (['n', 's', 't'], [['1', ' 3 ', 'NULL'], [2.5, 'x', 'None'], ['1e3', 'inf', '#N/A']]),
+    (['only'], []),
+    # Error cells are NaN, not empty: a column or row holding only errors
+    # is kept, and error names are deduplicated as "nan.1"
+    (['a', 'b', 'c'], [[1, 'x', '#N/A'], [2, None, '#DIV/0!']]),
+    (['a', 'b'], [[1, 'x', '#N/A'], [2, 'y']]),
+    (['a', '#REF!', 'c', '#N/A'], [[1, 2, 3], [None, '#NULL!', 'y', True], ['#VALUE!']]),
+    (['a', 'b'], [[1.5, True], ['#N/A', 'false'], [3, '#N/A']]),
+])
+def test_read_frame_types_like_pandas(tmp_path, header, rows):
+    path = str(tmp_path / 'types.xlsx')
+    workbook = openpyxl.Workbook()
+    workbook.active.append(header)
+    for row in rows:
+        workbook.active.append(row)
+    for row in workbook.active.iter_rows():
+        for cell in row:
+            if isinstance(cell.value, str) and cell.value.startswith('#'):
+                cell.data_type = 'e'
+    workbook.save(path)
+    pd.testing.assert_frame_equal(read_frame(path), pd.read_excel(path))
+    pd.testing.assert_index_equal(pd.Index(read_column_names(path)), pd.read_excel(path, nrows=0).columns)
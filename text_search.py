@@ -0,0 +1,154 @@
+import sys
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+SEPARATOR = "\x00"  # between cells of the joined text; no needle spans it
+VERIFY_RATIO = 16  # candidates are checked one by one when fewer than 1/16 of the rows
+DENSE_RATIO = 25  # needles found in more than 1/25 of the rows are tested cell by cell
+DENSE_MIN_HITS = 1000  # hits seen before deciding a needle is dense
+GRAM = 3
+
+
+class TextIndex:
+    # Substring search over one column. The lowercased cells are joined
+    # into a single string, so a contains filter is a loop of str.find()
+    # calls that jumps from one matching row to the next, instead of a
+    # lowercase and `in` test per row. With trigrams=True a posting list
+    # of rows is also kept for every three-character sequence, and a
+    # search only verifies the rows in the shortest list of the needle's
+    # trigrams. Needles that turn out to occur in many rows are tested cell
+    # by cell over a list of the lowercased cells instead, since jumping
+    # between hits only pays off when they are sparse. None cells
+    # never match, not even "not contains".
+    def __init__(self, texts, trigrams=False):
+        texts = list(texts)
+        self.count = len(texts)
+        self.missing = {i for i, text in enumerate(texts) if text is None}
+        cells = ["" if text is None else text for text in texts]
+        joined = SEPARATOR.join(cells)
+        lowered = joined.lower()
+        if len(lowered) == len(joined):
+            lengths = map(len, cells)
+        else:
+            # Lowercasing changed some lengths (e.g. "İ"), so lower each cell
+            cells = [cell.lower() for cell in cells]
+            lowered = SEPARATOR.join(cells)
+            lengths = map(len, cells)
+        self.text = lowered
+        # starts[i] is where row i begins; starts[count] is one past the end
+        self.starts = array('q', accumulate((length + 1 for length in lengths), initial=0))
+        # The lowercased cells themselves, for dense needles; split straight
+        # from the joined text unless a cell contains the separator
+        self.cells = lowered.split(SEPARATOR) if lowered.count(SEPARATOR) == self.count - 1 else None
+        self.postings = self.build_postings() if trigrams else None
+
+    def __len__(self):
+        return self.count
+
+    def size(self):
+        # Rough memory use, charged to the cached dataset the index belongs to
+        total = sys.getsizeof(self.text) + self.starts.itemsize * len(self.starts) + sys.getsizeof(self.missing)
+        if self.cells is not None:
+            total += sys.getsizeof(self.cells) + sys.getsizeof("") * self.count + len(self.text)
+        if self.postings is not None:
+            total += sys.getsizeof(self.postings) + sum(
+                sys.getsizeof(gram) + sys.getsizeof(rows) for gram, rows in self.postings.items())
+        return total
+
+    def cell(self, row):
+        return self.text[self.starts[row]:self.starts[row + 1] - 1]
+
+    def lower_cells(self):
+        if self.cells is None:
+            self.cells = [self.cell(row) for row in range(self.count)]  # a cell contains SEPARATOR
+        return self.cells
+
+    def build_postings(self):
+        postings = {}
+        for row in range(self.count):
+            cell = self.cell(row)
+            for gram in {cell[i:i + GRAM] for i in range(len(cell) - GRAM + 1)}:
+                rows = postings.get(gram)
+                if rows is None:
+                    rows = postings[gram] = array('I')
+                rows.append(row)
+        return postings
+
+    def candidates(self, needle):
+        # Rows that may contain `needle`: those with its rarest trigram
+        rarest = None
+        for i in range(len(needle) - GRAM + 1):
+            rows = self.postings.get(needle[i:i + GRAM])
+            if rows is None:
+                return []
+            if rarest is None or len(rows) < len(rarest):
+                rarest = rows
+        return rarest
+
+    def find(self, needle):
+        # Rows containing the lowercase `needle`, in ascending order
+        if SEPARATOR in needle:
+            return self.scan(needle, 0)
+        if self.postings is not None and len(needle) >= GRAM:
+            candidates = self.candidates(needle)
+            if len(candidates) * DENSE_RATIO > self.count:
+                return self.scan(needle, 0)
+            return self.verify(needle, candidates)
+        rows = []
+        starts = self.starts
+        find = self.text.find
+        position = find(needle)
+        row = 0
+        while position != -1:
+            row = bisect_right(starts, position, row) - 1
+            rows.append(row)
+            row += 1
+            if len(rows) >= DENSE_MIN_HITS and len(rows) * DENSE_RATIO > row:
+                rows.extend(self.scan(needle, row))
+                break
+            position = find(needle, starts[row])
+        return rows
+
+    def scan(self, needle, start):
+        # Rows from `start` on containing `needle`, tested cell by cell
+        cells = self.lower_cells()
+        missing = self.missing
+        return [row for row in range(start, self.count) if needle in cells[row] and row not in missing]
+
+    def verify(self, needle, candidates, negate=False):
+        text = self.text
+        starts = self.starts
+        missing = self.missing
+        return [
+            row for row in candidates
+            if row not in missing and (needle in text[starts[row]:starts[row + 1] - 1]) != negate
+        ]
+
+    def select(self, needle, candidates=None, negate=False):
+        # Rows (of `candidates`, if given) that contain `needle`, or with
+        # negate=True the ones that do not
+        needle = needle.lower()
+        if candidates is not None and len(candidates) * VERIFY_RATIO < self.count:
+            return self.verify(needle, candidates, negate)
+        hits = self.find(needle)
+        if candidates is None and not negate:
+            return hits
+        hits = set(hits)
+        if candidates is None:
+            candidates = range(self.count)
+        if negate:
+            return [row for row in candidates if row not in hits and row not in self.missing]
+        return [row for row in candidates if row in hits]
+
+    def mask(self, needle, negate=False):
+        # NumPy boolean mask over all rows
+        import numpy as np
+
+        mask = np.zeros(self.count, dtype=np.bool_)
+        mask[self.find(needle.lower())] = True
+        if negate:
+            mask = ~mask
+            if self.missing:
+                mask[list(self.missing)] = False
+        return mask
@@ -0,0 +1,123 @@
+import math
+
+from predicates import NUMERIC_OPERATORS, cell_text, frame_views, is_active, resolve_condition
+
+
+class UpdatePlan:
+    # Update rules compiled once and grouped by column. Every rule is tested
+    # against the original cell values; when several rules hit the same cell
+    # the one listed last wins. A cell's text, lowercase and float forms are
+    # worked out at most once however many rules test its column.
+    def __init__(self, header, updates):
+        self.header = list(header)
+        columns = {}
+        for col, condition, filter_value, new_value in updates:
+            if not is_active(condition, filter_value) or col not in self.header:
+                continue
+            code = resolve_condition(condition)
+            value = cell_text(filter_value).strip()
+            operand = compile_operand(code, value)
+            if operand is None:
+                continue  # a non-numeric bound never matches
+            rule = (code, value, operand, cell_text(new_value).strip())
+            columns.setdefault(self.header.index(col), []).append(rule)
+        # (column index, rules in the order they were given)
+        self.rules = sorted(columns.items())
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def apply(self, row):
+        # Returns the updated copy of `row`, or `row` itself when no rule hits
+        updated = None
+        for idx, rules in self.rules:
+            if idx >= len(row):
+                continue
+            new_value = first_hit(reversed(rules), row[idx])
+            if new_value is not None:
+                if updated is None:
+                    updated = list(row)
+                updated[idx] = new_value
+        return row if updated is None else updated
+
+    def apply_store(self, store, max_records=None):
+        # Vectorized pass over a ColumnStore: each rule is matched against the
+        # cached column views and only the rows that change are copied
+        rows = store.rows if max_records is None else store.rows[:max_records]
+        candidates = None if max_records is None else list(range(len(rows)))
+        changes = {}
+        for idx, rules in self.rules:
+            for code, value, operand, new_value in rules:
+                for i in store.matching(idx, code, value, candidates):
+                    changes.setdefault(i, {})[idx] = new_value
+        if not changes:
+            return list(rows)
+        updated_rows = []
+        for i, row in enumerate(rows):
+            cells = changes.get(i)
+            if cells is not None:
+                row = list(row)
+                for idx, new_value in cells.items():
+                    row[idx] = new_value
+            updated_rows.append(row)
+        return updated_rows
+
+    def apply_frame(self, df, numeric=None):
+        # pandas form used by app.py. Returns a frame with the changed columns
+        # replaced; `df` itself is never modified, so cached frames are safe
+        views = frame_views(df, numeric)
+        replaced = {}
+        for idx, rules in self.rules:
+            col = self.header[idx]
+            values = None
+            for code, value, operand, new_value in rules:
+                mask = views(col).mask(code, value).to_numpy(dtype=bool)
+                if mask.any():
+                    if values is None:
+                        values = df[col].to_numpy(dtype=object, copy=True)
+                    values[mask] = new_value
+            if values is not None:
+                replaced[col] = values
+        if not replaced:
+            return df
+        df = df.copy(deep=False)
+        for col, values in replaced.items():
+            df[col] = values
+        return df
+
+
+def compile_operand(code, value):
+    # What a cell is compared with: the text for ==, the float bound for
+    # numeric operators and the lowercased needle for contains
+    if code in NUMERIC_OPERATORS:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    if code == "==":
+        return value
+    return value.lower()
+
+
+def first_hit(rules, cell):
+    # New value of the first rule that matches `cell`, else None
+    text = cell_text(cell)
+    lower = None
+    number = None
+    for code, value, operand, new_value in rules:
+        if code == "==":
+            hit = text == operand
+        elif code in NUMERIC_OPERATORS:
+            if number is None:
+                try:
+                    number = float(cell)
+                except (TypeError, ValueError):
+                    number = math.nan  # compares false with every bound
+            hit = NUMERIC_OPERATORS[code](number, operand)
+        else:
+            if lower is None:
+                lower = text.lower()
+            hit = (operand in lower) == (code == "contains")
+        if hit:
+            return new_value
+    return None
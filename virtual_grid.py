@@ -0,0 +1,251 @@
+import queue
+import threading
+from array import array
+from collections import OrderedDict
+from itertools import islice
+from tkinter import ttk
+
+from records import read_rows_at
+
+BLOCK_SIZE = 500  # rows fetched at once by ScannedRows
+CACHED_BLOCKS = 8
+FETCH_POLL = 30  # ms between checks for a window read in the background
+PLACEHOLDER = "..."  # shown in every cell until a slow window arrives
+
+
+# Row sources: len() is the number of rows and window(start, stop) returns
+# rows [start, stop) as lists. Only the windows asked for are materialized.
+
+class IndexedRows:
+    # Selected rows of an in-memory row list, e.g. a cached ColumnStore
+    def __init__(self, rows, indices=None):
+        self.rows = rows
+        self.indices = None if indices is None else array('q', indices)
+
+    def __len__(self):
+        return len(self.rows) if self.indices is None else len(self.indices)
+
+    def window(self, start, stop):
+        if self.indices is None:
+            return self.rows[start:stop]
+        return [self.rows[i] for i in self.indices[start:stop]]
+
+
+class OffsetRows:
+    # CSV rows read back from their byte offsets, 8 bytes kept per row
+    def __init__(self, path, offsets):
+        self.path = path
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def window(self, start, stop):
+        return list(read_rows_at(self.path, self.offsets[start:stop]))
+
+
+class RowIndexRows:
+    # The first `count` data rows of a CSV file through its RowIndex
+    def __init__(self, path, row_index, count=None):
+        self.path = path
+        self.row_index = row_index
+        self.count = len(row_index) if count is None else min(count, len(row_index))
+
+    def __len__(self):
+        return self.count
+
+    def window(self, start, stop):
+        return self.row_index.page(self.path, start, min(stop, self.count) - start)
+
+
+class ScannedRows:
+    # Rows that can only be produced in order, such as those of an Excel
+    # sheet too big to cache. make_rows() starts a new pass; the current
+    # pass is continued when scrolling forward and restarted when scrolling
+    # back past the blocks still cached.
+    def __init__(self, make_rows, count):
+        self.make_rows = make_rows
+        self.count = count
+        self.blocks = OrderedDict()
+        self.rows = None
+        self.position = 0
+
+    def __len__(self):
+        return self.count
+
+    def block(self, number):
+        rows = self.blocks.get(number)
+        if rows is not None:
+            self.blocks.move_to_end(number)
+            return rows
+        start = number * BLOCK_SIZE
+        if self.rows is None or self.position > start:
+            self.rows = iter(self.make_rows())
+            self.position = 0
+        for _ in islice(self.rows, start - self.position):
+            pass
+        rows = list(islice(self.rows, BLOCK_SIZE))
+        self.position = start + len(rows)
+        self.blocks[number] = rows
+        if len(self.blocks) > CACHED_BLOCKS:
+            self.blocks.popitem(last=False)
+        return rows
+
+    def window(self, start, stop):
+        stop = min(stop, self.count)
+        if stop <= start:
+            return []
+        rows = []
+        for number in range(start // BLOCK_SIZE, (stop - 1) // BLOCK_SIZE + 1):
+            block = self.block(number)
+            first = number * BLOCK_SIZE
+            rows.extend(block[max(start - first, 0):stop - first])
+        return rows
+
+
+class MappedRows:
+    # Another source with `transform` applied to each row of a window
+    def __init__(self, source, transform):
+        self.source = source
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.source)
+
+    def window(self, start, stop):
+        return [self.transform(row) for row in self.source.window(start, stop)]
+
+
+class VirtualGrid(ttk.Frame):
+    # A Treeview that only ever holds the rows on screen. The scrollbar is
+    # driven by hand over the full row count, and scrolling refills the
+    # same items from source.window(), so memory and redraw cost do not
+    # depend on the number of rows. Scroll events are coalesced into one
+    # refresh per idle cycle. The frame keeps its given width so files with
+    # many columns scroll sideways instead of widening the window.
+    #
+    # Windows are read on a worker thread, one at a time, so a source that
+    # has to re-read a file (ScannedRows going back) never blocks Tk. Rows
+    # not there by the first poll show as placeholders; scrolling on
+    # meanwhile fetches the latest position once the read in flight ends.
+    def __init__(self, parent, height=12, width=640, column_width=120):
+        rowheight = int(ttk.Style(parent).lookup("Treeview", "rowheight") or 20)
+        super().__init__(parent, width=width, height=rowheight * (height + 1) + 24)
+        self.grid_propagate(False)
+        self.height = height
+        self.column_width = column_width
+        self.source = None
+        self.first = 0
+        self.pending = None
+        self.fetching = False
+        self.fetched = queue.Queue()
+        self.tree = ttk.Treeview(self, height=height, selectmode="browse")
+        self.tree.column("#0", width=70, stretch=False, anchor="e")
+        self.tree.heading("#0", text="#")
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        xscrollbar = ttk.Scrollbar(self, orient="horizontal", command=self.tree.xview)
+        self.tree.configure(xscrollcommand=xscrollbar.set)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        xscrollbar.grid(row=1, column=0, sticky="ew")
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(0, weight=1)
+
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_by(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3))
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-self.height))
+        self.tree.bind("<Next>", lambda e: self.scroll_by(self.height))
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0))
+        self.tree.bind("<End>", lambda e: self.scroll_to(len(self.source or ())))
+        self.tree.bind("<Up>", lambda e: self.scroll_by(-1))
+        self.tree.bind("<Down>", lambda e: self.scroll_by(1))
+
+    def set_data(self, header, source):
+        self.source = source
+        columns = [f"c{i}" for i in range(len(header))]
+        self.tree.delete(*self.tree.get_children())
+        self.tree["columns"] = columns
+        for column, name in zip(columns, header):
+            self.tree.heading(column, text=name)
+            self.tree.column(column, width=self.column_width, stretch=False)
+        self.first = 0
+        self.refresh()
+
+    def clear(self):
+        self.set_data([], None)
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.source or ())))
+        elif action == "scroll":
+            step = self.height if unit == "pages" else 1
+            self.scroll_by(int(amount) * step)
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.first + rows)
+        return "break"
+
+    def scroll_to(self, first):
+        total = len(self.source or ())
+        self.first = max(0, min(first, total - self.height))
+        if self.pending is None:
+            self.pending = self.after_idle(self.refresh)
+        return "break"
+
+    def refresh(self):
+        self.pending = None
+        source, first = self.source, self.first
+        total = len(source or ())
+        self.set_scrollbar(total)
+        if self.fetching:
+            return  # poll() refreshes again when the read in flight is done
+        if not total:
+            self.show(first, [])
+            return
+
+        def run():
+            try:
+                rows = source.window(first, min(first + self.height, total))
+            except Exception as e:
+                rows = e
+            self.fetched.put((source, first, rows))
+
+        self.fetching = True
+        threading.Thread(target=run, daemon=True).start()
+        self.after(FETCH_POLL, lambda: self.poll(True))
+
+    def poll(self, first_poll=False):
+        try:
+            source, first, rows = self.fetched.get_nowait()
+        except queue.Empty:
+            if first_poll:
+                count = min(self.height, len(self.source or ()) - self.first)
+                self.show(self.first, [[PLACEHOLDER] * len(self.tree["columns"])] * count)
+            self.after(FETCH_POLL, self.poll)
+            return
+        self.fetching = False
+        if source is self.source and first == self.first:
+            if isinstance(rows, Exception):
+                raise rows
+            self.show(first, rows)
+        else:
+            self.refresh()
+
+    def show(self, first, rows):
+        items = self.tree.get_children()
+        for i, row in enumerate(rows):
+            values = ["" if value is None else value for value in row]
+            text = str(first + i + 1)
+            if i < len(items):
+                self.tree.item(items[i], text=text, values=values)
+            else:
+                self.tree.insert("", "end", text=text, values=values)
+        if len(items) > len(rows):
+            self.tree.delete(*items[len(rows):])
+
+    def set_scrollbar(self, total):
+        if total:
+            self.scrollbar.set(self.first / total, min(self.first + self.height, total) / total)
+        else:
+            self.scrollbar.set(0, 1)
@@ -0,0 +1,469 @@
+import math
+import posixpath
+import zipfile
+from collections import defaultdict
+from xml.etree.ElementTree import fromstring
+from xml.parsers import expat
+
+try:
+    from openpyxl.formula.translate import Translator
+    from openpyxl.styles.numbers import builtin_format_code, is_date_format
+    from openpyxl.utils.cell import range_boundaries
+    from openpyxl.utils.datetime import CALENDAR_MAC_1904, WINDOWS_EPOCH, from_excel, from_ISO8601
+except ImportError:
+    Translator = None
+
+READ_SIZE = 64 * 1024
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+# Element names as reported by expat with namespace_separator='}'
+DIMENSION = MAIN_NS + '}dimension'
+ROW = MAIN_NS + '}row'
+CELL = MAIN_NS + '}c'
+VALUE = MAIN_NS + '}v'
+FORMULA = MAIN_NS + '}f'
+INLINE_STRING = MAIN_NS + '}is'
+SHARED_STRING = MAIN_NS + '}si'
+TEXT = MAIN_NS + '}t'
+PHONETIC = MAIN_NS + '}rPh'
+
+
+class XlsxReader:
+    # Streams one worksheet of an .xlsx file straight from the sheet XML with
+    # expat, without building openpyxl cell objects or an element tree.
+    # Shared strings are resolved into a plain list, read only as far as the
+    # rows consumed so far need, and rows are yielded lazily as value tuples.
+    #
+    # Values match openpyxl's read-only iter_rows(values_only=True): numbers
+    # come back as int or float, date-formatted numbers as datetimes and
+    # formulas as "=..." text unless data_only is set. With use_dimensions
+    # the sheet's <dimension> pads rows to its width and stops at its last
+    # row, as openpyxl does; without it rows end at their last cell.
+    # keep_errors=False turns error cells (#N/A, ...) into NaN, as pandas
+    # reads them.
+    def __init__(self, path, sheet=None, data_only=False, use_dimensions=True, keep_errors=True):
+        if Translator is None:
+            raise ImportError("openpyxl is required for Excel files")
+        self.path = path
+        self.data_only = data_only
+        self.use_dimensions = use_dimensions
+        self.keep_errors = keep_errors
+        with zipfile.ZipFile(path) as archive:
+            parts = workbook_parts(archive, sheet)
+            self.sheet_path, self.epoch, self.strings_path, styles_path = parts
+            self.date_styles = read_date_styles(archive, styles_path)
+        self.max_row = None  # last row in the sheet's <dimension>, once seen
+        # Progress of the current pass, used to estimate the row count
+        self.sheet_size = self.bytes_parsed = self.rows_parsed = 0
+
+    def __iter__(self):
+        return self.rows()
+
+    def rows(self):
+        with zipfile.ZipFile(self.path) as archive:
+            strings = SharedStrings(archive, self.strings_path)
+            try:
+                self.sheet_size = archive.getinfo(self.sheet_path).file_size
+                with archive.open(self.sheet_path) as source:
+                    yield from self.parse_rows(source, strings)
+            finally:
+                strings.close()
+
+    def parse_rows(self, source, strings):
+        sheet = SheetParser(self, strings)
+        width = max_row = None
+        expected = 1  # next row number to yield
+        self.bytes_parsed = self.rows_parsed = 0
+        while True:
+            chunk = source.read(READ_SIZE)
+            sheet.parser.Parse(chunk, not chunk)
+            self.bytes_parsed += len(chunk)
+            self.rows_parsed += len(sheet.rows)
+            if sheet.dimension is not None:
+                if self.use_dimensions:
+                    try:
+                        _, _, width, max_row = range_boundaries(sheet.dimension)
+                    except (TypeError, ValueError):
+                        pass
+                    self.max_row = max_row
+                sheet.dimension = None
+            rows, sheet.rows = sheet.rows, []
+            for row_number, cells in rows:
+                if max_row is not None and row_number > max_row:
+                    # Rows past the dimension are dropped, the gap before
+                    # them is still filled in
+                    while expected <= max_row:
+                        expected += 1
+                        yield (None,) * (width or 0)
+                    return
+                # Rows missing from the XML come back empty
+                while expected < row_number:
+                    expected += 1
+                    yield (None,) * (width or 0)
+                if expected == row_number:
+                    expected += 1
+                    yield pad_row(cells, width)
+            if not chunk:
+                break
+
+    def cell_value(self, data_type, value, inline, style, strings):
+        # `inline` is the text of an <is> element, None when there is none
+        if data_type == 'inlineStr':
+            return inline
+        if value is None:
+            return None
+        if data_type == 'n':
+            if '.' in value or 'e' in value or 'E' in value:
+                number = float(value)
+            else:
+                number = int(value)
+            if style and int(style) in self.date_styles:
+                try:
+                    return from_excel(number, self.epoch)
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return number
+        if data_type == 's':
+            return strings[int(value)]
+        if data_type == 'b':
+            return bool(int(value))
+        if data_type == 'd':
+            return from_ISO8601(value)
+        if data_type == 'e' and not self.keep_errors:
+            return math.nan
+        return value
+
+
+class SheetParser:
+    # expat callbacks for a worksheet part. Completed rows are collected in
+    # `rows` as (row number, [(column number, value)]) and handed out by
+    # XlsxReader.parse_rows after every chunk fed to `parser`.
+    def __init__(self, reader, strings):
+        self.reader = reader
+        self.strings = strings
+        self.rows = []
+        self.dimension = None
+        self.row_number = 0
+        self.cells = []
+        self.column = 0
+        self.columns = {}  # column letters -> number
+        self.ref = self.data_type = self.style = None
+        self.value = self.formula = self.inline = None
+        self.text = None  # character data of the open <v>, <f> or <t>
+        self.phonetic = False
+        self.formulas = {}
+        self.parser = expat.ParserCreate(namespace_separator='}')
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+        self.parser.CharacterDataHandler = self.data
+
+    def start(self, name, attrs):
+        if name == CELL:
+            self.ref = attrs.get('r')
+            if self.ref:
+                letters = self.ref.rstrip('0123456789')
+                column = self.columns.get(letters)
+                if column is None:
+                    column = self.columns[letters] = column_number(letters)
+                self.column = column
+            else:
+                self.column += 1
+            self.data_type = attrs.get('t', 'n')
+            self.style = attrs.get('s')
+            self.value = self.formula = self.inline = None
+        elif name == VALUE:
+            self.text = []
+        elif name == TEXT:
+            if self.inline is not None and not self.phonetic:
+                self.text = []
+        elif name == ROW:
+            number = attrs.get('r')
+            self.row_number = int(float(number)) if number else self.row_number + 1
+            self.column = 0
+            self.cells = []
+        elif name == FORMULA:
+            self.formula = (attrs, [])
+            self.text = self.formula[1]
+        elif name == INLINE_STRING:
+            self.inline = []
+        elif name == PHONETIC:
+            self.phonetic = True
+        elif name == DIMENSION:
+            self.dimension = attrs.get('ref', '')
+
+    def data(self, text):
+        if self.text is not None:
+            self.text.append(text)
+
+    def end(self, name):
+        if name == CELL:
+            if self.formula is not None and not self.reader.data_only:
+                attrs, text = self.formula
+                value = formula_text("".join(text), attrs, self.ref, self.formulas)
+            else:
+                inline = None if self.inline is None else "".join(self.inline)
+                value = self.reader.cell_value(self.data_type, self.value or None, inline, self.style, self.strings)
+            self.cells.append((self.column, value))
+        elif name == VALUE:
+            self.value = "".join(self.text)
+            self.text = None
+        elif name == TEXT:
+            if self.text is not None:
+                self.inline.append("".join(self.text))
+                self.text = None
+        elif name == ROW:
+            self.rows.append((self.row_number, self.cells))
+        elif name == FORMULA:
+            self.text = None
+        elif name == PHONETIC:
+            self.phonetic = False
+
+
+class SharedStrings:
+    # The shared string table, parsed from its part only as far as the
+    # highest index looked up so far. Rich-text runs are joined and phonetic
+    # hints left out, as openpyxl does.
+    def __init__(self, archive, path):
+        self.strings = []
+        self.source = None if path is None else archive.open(path)
+        self.parts = []
+        self.text = None
+        self.phonetic = False
+        self.parser = expat.ParserCreate(namespace_separator='}')
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.start
+        self.parser.EndElementHandler = self.end
+        self.parser.CharacterDataHandler = self.data
+
+    def __getitem__(self, index):
+        while index >= len(self.strings) and self.source is not None:
+            chunk = self.source.read(READ_SIZE)
+            self.parser.Parse(chunk, not chunk)
+            if not chunk:
+                self.close()
+        return self.strings[index]
+
+    def close(self):
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+
+    def start(self, name, attrs):
+        if name == TEXT and not self.phonetic:
+            self.text = []
+        elif name == PHONETIC:
+            self.phonetic = True
+
+    def data(self, text):
+        if self.text is not None:
+            self.text.append(text)
+
+    def end(self, name):
+        if name == TEXT and self.text is not None:
+            self.parts.append("".join(self.text))
+            self.text = None
+        elif name == SHARED_STRING:
+            self.strings.append("".join(self.parts).replace('x005F_', ''))
+            self.parts = []
+        elif name == PHONETIC:
+            self.phonetic = False
+
+
+def iter_xlsx_rows(path, **options):
+    return XlsxReader(path, **options).rows()
+
+
+def column_number(ref):
+    # 1-based column of a cell reference such as "AB12"
+    number = 0
+    for char in ref:
+        if char.isdigit():
+            break
+        number = number * 26 + ord(char) - 64
+    return number
+
+
+def pad_row(cells, width=None):
+    if not cells and not width:
+        return ()
+    width = width or cells[-1][0]
+    row = [None] * width
+    for column, value in cells:
+        if 1 <= column <= width:
+            row[column - 1] = value
+    return tuple(row)
+
+
+def formula_text(text, attrs, ref, formulas):
+    # Formula source as openpyxl shows it; shared formulas are translated
+    # from the cell that defines them
+    text = "=" + text
+    if attrs.get('t') == 'shared':
+        key = attrs.get('si')
+        if key in formulas:
+            return formulas[key].translate_formula(ref)
+        if text != "=":
+            formulas[key] = Translator(text, ref)
+    return text
+
+
+def read_relationships(archive, part):
+    # {relationship id: (type, part name)} for the given package part
+    folder, name = posixpath.split(part)
+    try:
+        tree = fromstring(archive.read(posixpath.join(folder, '_rels', name + '.rels')))
+    except KeyError:
+        return {}
+    relationships = {}
+    for rel in tree.iter(f'{{{PACKAGE_REL_NS}}}Relationship'):
+        target = rel.get('Target', '')
+        if target.startswith('/'):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(folder, target))
+        relationships[rel.get('Id')] = (rel.get('Type', '').rsplit('/', 1)[-1], target)
+    return relationships
+
+
+def workbook_parts(archive, sheet=None):
+    # Returns (sheet part, date epoch, shared strings part, styles part) for
+    # the sheet at index `sheet`, or the active sheet when it is None
+    workbook_path = 'xl/workbook.xml'
+    for rel_type, target in read_relationships(archive, '').values():
+        if rel_type == 'officeDocument':
+            workbook_path = target
+    workbook = fromstring(archive.read(workbook_path))
+    relationships = read_relationships(archive, workbook_path)
+    ns = f'{{{MAIN_NS}}}'
+
+    properties = workbook.find(ns + 'workbookPr')
+    date1904 = properties is not None and properties.get('date1904') in ('1', 'true')
+    epoch = CALENDAR_MAC_1904 if date1904 else WINDOWS_EPOCH
+
+    if sheet is None:
+        view = workbook.find(f'{ns}bookViews/{ns}workbookView')
+        sheet = int(view.get('activeTab', 0)) if view is not None else 0
+    sheets = workbook.findall(f'{ns}sheets/{ns}sheet')
+    if not sheets:
+        raise ValueError("Workbook has no sheets")
+    entry = sheets[sheet] if 0 <= sheet < len(sheets) else sheets[0]
+    sheet_path = relationships[entry.get(f'{{{REL_NS}}}id')][1]
+
+    parts = {rel_type: target for rel_type, target in relationships.values()}
+    return sheet_path, epoch, parts.get('sharedStrings'), parts.get('styles')
+
+
+def read_date_styles(archive, path):
+    # Indexes of the cell styles whose number format is a date, by the same
+    # rules as openpyxl
+    dates = set()
+    if path is None:
+        return dates
+    styles = fromstring(archive.read(path))
+    ns = f'{{{MAIN_NS}}}'
+    custom = {int(fmt.get('numFmtId')): fmt.get('formatCode') for fmt in styles.iterfind(f'{ns}numFmts/{ns}numFmt')}
+    for index, style in enumerate(styles.iterfind(f'{ns}cellXfs/{ns}xf')):
+        number_format = int(style.get('numFmtId', 0))
+        code = custom[number_format] if number_format in custom else builtin_format_code(number_format)
+        if is_date_format(code):
+            dates.add(index)
+    return dates
+
+
+# --- DataFrames as pd.read_excel builds them ---
+
+# Texts read as missing or as booleans (read_csv's default na_values,
+# true_values and false_values)
+NA_TEXT = {
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+}
+TRUE_TEXT = {'True', 'TRUE', 'true'}
+FALSE_TEXT = {'False', 'FALSE', 'false'}
+
+
+def frame_row(values):
+    # Cells as pandas' openpyxl engine converts them: empty cells become ""
+    # and are trimmed from the end, whole floats become ints and error
+    # cells stay NaN
+    row = ["" if value is None else int(value) if isinstance(value, float) and value.is_integer() else value
+           for value in values]
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def column_names(header):
+    # Blank names become "Unnamed: n" and repeated ones get ".1", ".2", ...
+    # suffixes, named columns first
+    names = [f'Unnamed: {i}' if name == '' else name for i, name in enumerate(header)]
+    unnamed = [i for i, name in enumerate(header) if name == '']
+    counts = defaultdict(int)
+    for i in [i for i in range(len(names)) if i not in unnamed] + unnamed:
+        name = original = names[i]
+        count = counts[name]
+        while count > 0:
+            counts[original] = count + 1
+            name = f'{original}.{count}'
+            count = count + 1 if name in names else counts[name]
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+
+def typed_column(cells):
+    # One column typed as pandas types it: numbers when every cell
+    # converts, booleans when every cell is one, objects otherwise. Equal
+    # values share the first one seen, so a 0 below a False reads as False,
+    # as with pandas' parser.
+    import numpy as np
+    import pandas as pd
+
+    values = pd.Series([np.nan if isinstance(cell, str) and cell in NA_TEXT else cell for cell in cells],
+                       dtype=object)
+    if values.empty:
+        return values
+    try:
+        return pd.to_numeric(values)
+    except (ValueError, TypeError):
+        pass
+    first = {}
+    values = values.map(lambda value: first.setdefault(value, value))
+    if all(isinstance(value, bool) or value in TRUE_TEXT or value in FALSE_TEXT for value in values.dropna()):
+        values = values.map(lambda value: value in TRUE_TEXT if isinstance(value, str) else value)
+    return values.infer_objects()
+
+
+def read_frame(path, sheet=0):
+    # Same DataFrame as pd.read_excel(path, sheet), read with the streaming
+    # reader instead of openpyxl cell objects
+    import pandas as pd
+
+    rows = []
+    last_row_with_data = -1
+    for values in iter_xlsx_rows(path, sheet=sheet, data_only=True, use_dimensions=False, keep_errors=False):
+        row = frame_row(values)
+        if row:
+            last_row_with_data = len(rows)
+        rows.append(row)
+    rows = rows[:last_row_with_data + 1]
+    if not rows:
+        return pd.DataFrame()
+    width = max(len(row) for row in rows)
+    header, data = rows[0] + [""] * (width - len(rows[0])), rows[1:]
+    columns = {i: typed_column([row[i] if i < len(row) else "" for row in data]) for i in range(width)}
+    return pd.DataFrame(columns).set_axis(column_names(header), axis=1)
+
+
+def read_column_names(path, sheet=0):
+    # Column names read_frame would give, from the first sheet row only.
+    # Data rows wider than the header get "Unnamed: n" columns once fully
+    # read.
+    rows = iter_xlsx_rows(path, sheet=sheet, data_only=True, use_dimensions=False, keep_errors=False)
+    row = frame_row(next(rows, ()))
+    rows.close()
+    return column_names(row) if row else []
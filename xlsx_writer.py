@@ -0,0 +1,276 @@
+import datetime
+import math
+import numbers
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+FLUSH_ROWS = 1000  # rows of sheet XML buffered between writes
+
+# Characters XML 1.0 cannot carry; openpyxl refuses them, they are dropped here
+ILLEGAL_CHARACTERS = re.compile(r'[\000-\010\013\014\016-\037]')
+
+EPOCH = datetime.datetime(1899, 12, 30)
+
+# Cell style indexes in STYLES below
+DATETIME_STYLE = 1
+DATE_STYLE = 2
+TIME_STYLE = 3
+HEADER_STYLE = 4
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{shared_strings}'
+    '</Types>'
+)
+SHARED_STRINGS_TYPE = (
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '{shared_strings}'
+    '</Relationships>'
+)
+SHARED_STRINGS_REL = (
+    '<Relationship Id="rId3" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+    'Target="sharedStrings.xml"/>'
+)
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="3">'
+    '<numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/>'
+    '<numFmt numFmtId="165" formatCode="yyyy-mm-dd"/>'
+    '<numFmt numFmtId="166" formatCode="hh:mm:ss"/>'
+    '</numFmts>'
+    '<fonts count="2">'
+    '<font><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/><family val="2"/></font>'
+    '</fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="5">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="166" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+SHEET_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetData>'
+)
+SHEET_END = '</sheetData></worksheet>'
+
+
+class XlsxWriter:
+    # Writes a single-sheet .xlsx file row by row. The sheet XML is built as
+    # text and streamed into the zip archive as it grows, so memory use does
+    # not depend on the row count and no cell objects are created.
+    #
+    # Values are written the way openpyxl writes them: numbers and booleans
+    # as such, dates and times as serial numbers with a date format, text
+    # starting with "=" as a formula and everything else as text. None and
+    # NaN leave the cell empty. Text goes inline unless shared_strings is
+    # set, which keeps each distinct string in memory once but makes files
+    # with many repeated values smaller.
+    def __init__(self, path, sheet_name="Sheet1", shared_strings=False, compresslevel=None):
+        self.archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel)
+        self.sheet_name = sheet_name
+        self.strings = {} if shared_strings else None
+        self.string_count = 0
+        self.sheet = self.archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self.sheet.write(SHEET_START.encode('utf-8'))
+        self.pending = []
+        self.row_number = 0
+        self.columns = []  # column letters by index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is None:
+            self.close()
+        else:
+            self.archive.close()
+
+    def append(self, values, style=0):
+        self.row_number += 1
+        number = str(self.row_number)
+        cells = []
+        for idx, value in enumerate(values):
+            cell = self.cell(value, style)
+            if cell is None:
+                continue
+            if idx >= len(self.columns):
+                self.columns.extend(column_letter(i) for i in range(len(self.columns), idx + 1))
+            attrs, content = cell
+            cells.append(f'<c r="{self.columns[idx]}{number}"{attrs}>{content}</c>')
+        self.pending.append(f'<row r="{number}">{"".join(cells)}</row>')
+        if len(self.pending) >= FLUSH_ROWS:
+            self.flush()
+
+    def cell(self, value, style=0):
+        # Returns (attributes, inner XML) of a cell, or None to leave it empty
+        style_attr = f' s="{style}"' if style else ''
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return self.text_cell(value, style_attr)
+        if isinstance(value, bool):
+            return f' t="b"{style_attr}', f'<v>{int(value)}</v>'
+        if isinstance(value, numbers.Integral):
+            return style_attr, f'<v>{int(value)}</v>'
+        if isinstance(value, numbers.Real):
+            value = float(value)
+            if not math.isfinite(value):
+                return None
+            return style_attr, f'<v>{value!r}</v>'
+        if isinstance(value, (datetime.date, datetime.time)):
+            serial = excel_serial(value)
+            if serial is None:
+                return None
+            if isinstance(value, datetime.datetime):
+                style = style or DATETIME_STYLE
+            elif isinstance(value, datetime.date):
+                style = style or DATE_STYLE
+            else:
+                style = style or TIME_STYLE
+            return f' s="{style}"', f'<v>{serial!r}</v>'
+        if value != value:
+            return None  # NaN-like values such as pandas' NA
+        return self.text_cell(str(value), style_attr)
+
+    def text_cell(self, text, style_attr):
+        if not text:
+            return None
+        text = ILLEGAL_CHARACTERS.sub('', text)
+        if text.startswith('=') and len(text) > 1:
+            return style_attr, f'<f>{escape(text[1:])}</f><v></v>'
+        if self.strings is not None:
+            index = self.strings.get(text)
+            if index is None:
+                index = self.strings[text] = len(self.strings)
+            self.string_count += 1
+            return f' t="s"{style_attr}', f'<v>{index}</v>'
+        return f' t="inlineStr"{style_attr}', f'<is>{text_element(text)}</is>'
+
+    def flush(self):
+        if self.pending:
+            self.sheet.write("".join(self.pending).encode('utf-8'))
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.sheet.write(SHEET_END.encode('utf-8'))
+        self.sheet.close()
+        shared = self.strings is not None
+        self.archive.writestr('[Content_Types].xml',
+                              CONTENT_TYPES.format(shared_strings=SHARED_STRINGS_TYPE if shared else ''))
+        self.archive.writestr('_rels/.rels', ROOT_RELS)
+        self.archive.writestr('xl/workbook.xml', WORKBOOK.format(name=escape(self.sheet_name, {'"': '&quot;'})))
+        self.archive.writestr('xl/_rels/workbook.xml.rels',
+                              WORKBOOK_RELS.format(shared_strings=SHARED_STRINGS_REL if shared else ''))
+        self.archive.writestr('xl/styles.xml', STYLES)
+        if shared:
+            self.write_shared_strings()
+        self.archive.close()
+
+    def write_shared_strings(self):
+        with self.archive.open('xl/sharedStrings.xml', 'w', force_zip64=True) as part:
+            part.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+                f'count="{self.string_count}" uniqueCount="{len(self.strings)}">'
+            ).encode('utf-8'))
+            batch = []
+            for text in self.strings:
+                batch.append(f'<si>{text_element(text)}</si>')
+                if len(batch) >= FLUSH_ROWS:
+                    part.write("".join(batch).encode('utf-8'))
+                    batch = []
+            batch.append('</sst>')
+            part.write("".join(batch).encode('utf-8'))
+
+
+def write_xlsx(path, header, rows, bold_header=False, **options):
+    # Writes `header` and then every row of the iterable `rows`; returns the
+    # number of data rows written
+    count = 0
+    with XlsxWriter(path, **options) as writer:
+        writer.append(header, HEADER_STYLE if bold_header else 0)
+        for row in rows:
+            writer.append(row)
+            count += 1
+    return count
+
+
+def text_element(text):
+    if text != text.strip():
+        return f'<t xml:space="preserve">{escape(text)}</t>'
+    return f'<t>{escape(text)}</t>'
+
+
+def column_letter(index):
+    # 0 -> "A", 25 -> "Z", 26 -> "AA"
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def excel_serial(value):
+    # Days since 1899-12-30 as Excel counts them, or None for NaT
+    if isinstance(value, datetime.time):
+        return (value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6) / 86400
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value != value:
+        return None
+    delta = value.replace(tzinfo=None) - EPOCH
+    days = delta.days
+    if 0 < days <= 60:
+        days -= 1  # Excel's serials include the non-existent 1900-02-29
+    fraction = (delta.seconds + delta.microseconds / 1e6) / 86400
+    return days + fraction if fraction else days